@@ -0,0 +1,53 @@
+"""
+Benchmark accommodation_search against the local Booking stand-in.
+
+Usage (from backend/, with benchmarks.fake_booking_server running on :8900):
+    BOOKING_API_BASE=http://127.0.0.1:8900/api/v1 python -m benchmarks.accommodation_search --days 5
+"""
+import os
+import sys
+import argparse
+import asyncio
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from benchmarks.fixtures import sample_itinerary
+from config import config
+import services.booking_client as booking
+from models import ItineraryPlanning
+from nodes.tools import accommodation_search
+
+
+async def run(days: int, concurrency: int, runs: int):
+    stats_url = config["booking"]["base_url"].split("/api/")[0] + "/stats"
+    itinerary = sample_itinerary("文化", days)
+    latencies = []
+    async with httpx.AsyncClient() as http:
+        await http.post(stats_url + "/reset")
+        for _ in range(runs):
+            booking._booking_client = booking.BookingClient(max_concurrency=concurrency)
+            start = time.perf_counter()
+            result = ItineraryPlanning.model_validate_json(
+                await accommodation_search.ainvoke({"input": {"num_peoples": 2, "itinerary": itinerary}})
+            )
+            latencies.append(time.perf_counter() - start)
+            await booking._booking_client.aclose()
+        calls = (await http.get(stats_url)).json()
+    print(f"[concurrency={concurrency}] runs={runs} avg={sum(latencies) / runs:.2f}s "
+          f"nights_assigned={sum(1 for d in result.days if d.accommodation)} calls/run={ {k: v // runs for k, v in calls.items()} }")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--concurrency", default="1,8")
+    args = parser.parse_args()
+    for concurrency in map(int, args.concurrency.split(",")):
+        asyncio.run(run(args.days, concurrency, args.runs))
+
+
+if __name__ == "__main__":
+    main()
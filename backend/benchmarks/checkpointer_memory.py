@@ -0,0 +1,96 @@
+"""
+Memory benchmark for conversation checkpointers.
+
+Simulates N conversation threads against a small graph and samples the
+process heap every `--step` threads, comparing the unbounded MemorySaver
+with the durable checkpointer + ThreadEvictor.
+
+Usage (from backend/):
+    python -m benchmarks.checkpointer_memory --threads 10000 --max-threads 500
+"""
+import os
+import sys
+import argparse
+import asyncio
+import tempfile
+import tracemalloc
+
+_tmp = tempfile.mkdtemp(prefix="ckpt_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.db")
+os.environ.setdefault("CHECKPOINTER_SQLITE_PATH", f"{_tmp}/checkpoints.db")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")  # 不會實際呼叫 LLM
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage
+from langgraph.graph import StateGraph, END
+from checkpointer import open_checkpointer, ThreadEvictor
+from database import engine
+from models import TravelAssistantState
+from schema import Base
+
+
+async def _echo_node(state: TravelAssistantState):
+    # 模擬一輪對話: 一則 AI 回覆 + 一份偏好狀態
+    return {
+        "messages": [AIMessage(content="好的，" + state["messages"][-1].content * 20)],
+        "user_preferences": {"prefs": None, "preference_history": "東京 5天4夜 美食", "complete": False},
+    }
+
+
+def _build_graph(checkpointer):
+    builder = StateGraph(TravelAssistantState)
+    builder.add_node("echo", _echo_node)
+    builder.set_entry_point("echo")
+    builder.add_edge("echo", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return float("nan")
+
+
+async def run(backend: str, threads: int, step: int, max_threads: int, evict: bool):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with open_checkpointer(backend) as checkpointer:
+        graph = _build_graph(checkpointer)
+        evictor = ThreadEvictor(checkpointer, max_threads=max_threads)
+
+        tracemalloc.start()
+        print(f"\n[{backend}{' + eviction' if evict else ''}]")
+        print(f"{'threads':>8} {'heap MB':>10} {'rss MB':>10}")
+        for i in range(1, threads + 1):
+            thread_id = f"user{i}@plan{i}"
+            await graph.ainvoke(
+                {"messages": [f"我想去東京玩 #{i}"]},
+                config={"configurable": {"thread_id": thread_id}},
+            )
+            if evict:
+                await evictor.touch(thread_id)
+            if i % step == 0:
+                if evict:
+                    await evictor.sweep()
+                heap, _ = tracemalloc.get_traced_memory()
+                print(f"{i:>8} {heap / 2**20:>10.1f} {_rss_mb():>10.1f}")
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=10000)
+    parser.add_argument("--step", type=int, default=1000)
+    parser.add_argument("--max-threads", type=int, default=500)
+    parser.add_argument("--backends", default="memory,sqlite")
+    args = parser.parse_args()
+
+    for backend in args.backends.split(","):
+        asyncio.run(run(backend, args.threads, args.step, args.max_threads, evict=backend != "memory"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Local stand-in for the Booking.com RapidAPI endpoints used by accommodation_search.
+
+Run (from backend/):
+    uvicorn benchmarks.fake_booking_server:app --port 8900
+    BOOKING_API_BASE=http://127.0.0.1:8900/api/v1 python -m benchmarks.accommodation_search
+
+Latency per request is FAKE_BOOKING_LATENCY seconds (default 0.3);
+GET /stats returns the number of calls per endpoint.
+"""
+from collections import Counter
+from fastapi import FastAPI
+import asyncio
+import hashlib
+import os
+
+LATENCY = float(os.getenv("FAKE_BOOKING_LATENCY", 0.3))
+HOTELS_PER_SEARCH = int(os.getenv("FAKE_BOOKING_HOTELS", 10))
+
+app = FastAPI()
+calls = Counter()
+
+
+def _num(text: str, mod: int) -> int:
+    return int(hashlib.md5(str(text).encode()).hexdigest(), 16) % mod
+
+
+@app.get("/api/v1/hotels/searchDestination")
+async def search_destination(query: str):
+    calls["searchDestination"] += 1
+    await asyncio.sleep(LATENCY)
+    dest_id = -_num(query, 10**6)
+    return {"status": True, "data": [{
+        "dest_id": str(dest_id),
+        "search_type": "district",
+        "dest_type": "district",
+        "name": query,
+        "latitude": 35.6 + _num(query, 100) / 1000,
+        "longitude": 139.7 + _num(query + "lon", 100) / 1000,
+    }]}
+
+
+@app.get("/api/v1/hotels/searchHotels")
+async def search_hotels(dest_id: str, search_type: str = "district", adults: int = 1,
+                        arrival_date: str = None, departure_date: str = None):
+    calls["searchHotels"] += 1
+    await asyncio.sleep(LATENCY)
+    hotels = []
+    for i in range(HOTELS_PER_SEARCH):
+        hotel_id = abs(int(dest_id)) * 100 + i
+        hotels.append({"hotel_id": hotel_id, "property": {
+            "name": f"Hotel {hotel_id}",
+            "reviewScore": 6 + _num(hotel_id, 40) / 10,
+            "reviewCount": 50 + _num(f"{hotel_id}c", 3000),
+            "latitude": 35.6 + _num(f"{hotel_id}lat", 100) / 1000,
+            "longitude": 139.7 + _num(f"{hotel_id}lon", 100) / 1000,
+            "priceBreakdown": {"grossPrice": {"value": 2000 + _num(f"{hotel_id}p", 8000) * adults, "currency": "TWD"}},
+        }})
+    return {"status": True, "data": {"hotels": hotels}}
+
+
+@app.get("/api/v1/hotels/getHotelDetails")
+async def get_hotel_details(hotel_id: int, adults: int = 1, arrival_date: str = None, departure_date: str = None):
+    calls["getHotelDetails"] += 1
+    await asyncio.sleep(LATENCY)
+    return {"status": True, "data": {
+        "hotel_id": hotel_id,
+        "hotel_name": f"Hotel {hotel_id}",
+        "url": f"https://www.booking.com/hotel/jp/{hotel_id}.html",
+        "address": f"{_num(hotel_id, 9) + 1}-{_num(hotel_id, 30)} Chome",
+        "city": "Tokyo",
+        "country_trans": "日本",
+        "review_nr": 50 + _num(f"{hotel_id}c", 3000),
+        "arrival_date": arrival_date,
+        "departure_date": departure_date,
+        "composite_price_breakdown": {"gross_amount_hotel_currency": {"value": 2000 + _num(f"{hotel_id}p", 8000) * adults, "currency": "TWD"}},
+    }}
+
+
+@app.get("/stats")
+async def stats():
+    return dict(calls)
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    calls.clear()
+    return {}
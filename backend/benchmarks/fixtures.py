@@ -0,0 +1,46 @@
+"""Synthetic itineraries shared by the benchmarks."""
+from datetime import date, timedelta
+from models import ItineraryPlanning, DailyItinerary, TimeSegment, Activity
+
+_SPOTS = {
+    "美食": [("築地場外市場", "築地"), ("一蘭拉麵", "澀谷"), ("阿美橫丁小吃", "上野"), ("月島文字燒", "月島"), ("銀座壽司", "銀座")],
+    "文化": [("淺草寺", "淺草"), ("明治神宮", "原宿"), ("東京國立博物館", "上野"), ("皇居外苑", "丸之內"), ("根津神社", "根津")],
+    "自然": [("新宿御苑", "新宿"), ("高尾山", "高尾"), ("井之頭公園", "吉祥寺"), ("代代木公園", "代代木"), ("台場海濱公園", "台場")],
+}
+_SLOTS = ["上午 (09:00-12:00)", "中午 (12:00-13:30)", "下午 (13:30-17:00)", "晚上 (18:00-22:00)"]
+
+
+def sample_itinerary(theme: str = "美食", num_days: int = 5, start: date = date(2025, 3, 14)) -> ItineraryPlanning:
+    spots = _SPOTS.get(theme, _SPOTS["美食"])
+    days = []
+    for i in range(num_days):
+        segments = []
+        for j, slot in enumerate(_SLOTS):
+            name, area = spots[(i + j) % len(spots)]
+            segments.append(TimeSegment(time_slot=slot, activities=[Activity(
+                activity_name=name,
+                type="Restaurant" if theme == "美食" else "Attraction",
+                activity_location=area,
+                description=f"{theme}主題: 前往{area}的{name}。",
+                estimated_duration="2 hours",
+                notes="",
+            )]))
+        days.append(DailyItinerary(
+            daily_theme=f"第{i + 1}天 {theme}探索",
+            itinerary_location="東京",
+            day=start + timedelta(days=i),
+            segments=segments,
+            transportation="地鐵與步行",
+        ))
+    return ItineraryPlanning(
+        travel_theme=f"東京{theme}之旅",
+        description=f"以{theme}為主題的東京{num_days}日遊",
+        departure_location="台北",
+        destination="日本 東京",
+        num_peoples=2,
+        duration=f"{num_days}天{num_days - 1}夜",
+        start_date=start,
+        end_date=start + timedelta(days=num_days - 1),
+        features=f"{theme}體驗",
+        days=days,
+    )
@@ -0,0 +1,96 @@
+"""
+Prompt tokens and latency of the chat / intent / preference prompts at turn
+5, 50 and 200: the full history versus the token-budgeted window plus the
+rolling summary (see history.py). The conversation is replayed turn by turn
+so the summary is folded exactly as chat_node would fold it.
+
+Usage (from backend/):
+    python -m benchmarks.history_window --fake            # FakeChatModel，延遲隨提示詞 token 數增加
+    python -m benchmarks.history_window --runs 3          # 需要可用的 LLM
+"""
+import os
+import sys
+import argparse
+import asyncio
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config, get_llm
+from langchain_core.messages import AIMessage, HumanMessage
+from llm_scheduler import estimate_tokens
+from prompts import CHAT_PROMPT, INTENT_PROMPT, PREF_PROMPT
+import history
+
+TURNS = [5, 50, 200]
+_QUESTIONS = ["東京三月的天氣如何？", "淺草寺附近有什麼好吃的？", "新幹線到京都要多久？", "哪裡可以買到便宜的藥妝？", "晚上去哪裡看夜景比較好？"]
+_ANSWER = "好的！{q}這個問題很常見，建議你可以先查看當地交通資訊，再依照行程安排時間，有需要我也可以幫你規劃。"
+
+
+async def _conversation(turns: int):
+    messages, summary = [], None
+    for i in range(turns):
+        question = f"{_QUESTIONS[i % len(_QUESTIONS)]} (第{i + 1}輪)"
+        messages.append(HumanMessage(content=question, id=f"h{i}"))
+        if i == turns - 1:
+            break
+        summary = await history.fold(messages, summary) or summary
+        messages.append(AIMessage(content=_ANSWER.format(q=question), id=f"a{i}"))
+    return messages, summary
+
+
+async def _latency(model, prompt_messages, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await model.ainvoke(prompt_messages)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+async def run(runs: int, fake: bool):
+    config["cache"]["llm_nodes"] = []
+    if fake:
+        from fake_llm import CannedChatModel, FakeChatModel
+        history.llm = CannedChatModel(latency_seconds=0, latency_sigma=0)
+        model = FakeChatModel(latency_seconds=0.3, latency_sigma=0, seconds_per_input_token=0.0002, seed=0)
+    else:
+        model = get_llm("chat")
+
+    for turns in TURNS:
+        messages, summary = await _conversation(turns)
+        message = messages[-1].content
+        preference_history = "\n".join(m.content for m in messages if m.type == "human")
+        prompts = {
+            "chat": (
+                CHAT_PROMPT.format_messages(history=messages, message=message),
+                CHAT_PROMPT.format_messages(history=history.window(messages, summary, "chat"), message=message),
+            ),
+            "intent_router": (
+                INTENT_PROMPT.format_messages(history=messages, message=message),
+                INTENT_PROMPT.format_messages(history=history.window(messages, summary, "intent_router"), message=message),
+            ),
+            "collect_preferences": (
+                PREF_PROMPT.format_messages(prefs="{}", history=preference_history),
+                PREF_PROMPT.format_messages(prefs="{}", history=history.tail(preference_history, "collect_preferences")),
+            ),
+        }
+        print(f"turn {turns}: summary={len(summary.text) if summary else 0} chars")
+        for node, (full, windowed) in prompts.items():
+            full_latency = await _latency(model, full, runs)
+            windowed_latency = await _latency(model, windowed, runs)
+            print(f"  {node:<20} tokens {estimate_tokens(full):>6} -> {estimate_tokens(windowed):>5}  "
+                  f"latency {full_latency:.2f}s -> {windowed_latency:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--fake", action="store_true", help="use FakeChatModel with per-prompt-token latency")
+    args = parser.parse_args()
+    asyncio.run(run(args.runs, args.fake))
+
+
+if __name__ == "__main__":
+    main()
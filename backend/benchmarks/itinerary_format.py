@@ -0,0 +1,111 @@
+"""
+Prompt tokens with the previous itinerary rendering (pydantic repr / full
+model_dump JSON) versus nodes.itinerary_format, per prompt, plus a
+round-trip check of compact_json and a coverage check of the report table.
+
+Usage (from backend/):
+    python -m benchmarks.itinerary_format --days 3,5,10
+"""
+import os
+import sys
+import argparse
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from models import ItineraryPlanning, Accommodation, UserPreferences
+from llm_scheduler import estimate_tokens
+from prompts import ITINERARY_MERGE_PROMPT, ITINERARY_MODIFY_PROMPT, ITINERARY_DAY_MODIFY_PROMPT, ITINERARY_REPORT_PROMPT
+from benchmarks.fixtures import sample_itinerary
+from nodes.itinerary_format import compact_json, render_itinerary
+from nodes.itinerary_patch import render_overview, render_targets
+
+REQUEST = "第二天下午想改去秋葉原"
+
+
+def _with_hotels(itinerary: ItineraryPlanning) -> ItineraryPlanning:
+    for i, daily in enumerate(itinerary.days):
+        daily.accommodation = Accommodation(
+            hotel_id=1000 + i, name="東京車站大飯店", url="https://www.booking.com/hotel/jp/sample.html",
+            address="東京都千代田區丸之內1-9-1", price=5200.0, currency="TWD", review_score=8.6, review_count=1532,
+            arrival_date=daily.day, departure_date=daily.day,
+        )
+    return itinerary
+
+
+def _old_targets(itinerary: ItineraryPlanning, days, slots) -> str:
+    from nodes.itinerary_merge import slot_of
+    return json.dumps([{
+        "day_index": i + 1, "day": str(itinerary.days[i].day), "daily_theme": itinerary.days[i].daily_theme,
+        "itinerary_location": itinerary.days[i].itinerary_location, "transportation": itinerary.days[i].transportation,
+        "segments": [s.model_dump() for s in itinerary.days[i].segments if not slots or slot_of(s) in slots],
+    } for i in days], ensure_ascii=False)
+
+
+def _values(value):
+    if isinstance(value, dict):
+        for v in value.values():
+            yield from _values(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from _values(v)
+    elif value not in (None, ""):
+        yield str(value)
+
+
+def _check(itinerary: ItineraryPlanning):
+    restored = ItineraryPlanning.model_validate_json(compact_json(itinerary))
+    assert restored == itinerary, "compact_json round trip changed the itinerary"
+    table = render_itinerary(itinerary)
+    ignored = {"hotel_id", "review_count", "arrival_date", "departure_date", "currency"}
+    dump = itinerary.model_dump(mode="json")
+    for daily in dump["days"]:
+        for key in ignored:
+            (daily.get("accommodation") or {}).pop(key, None)
+    # 數值在表格中以 :g 格式呈現 (5200.0 -> 5200)
+    missing = [v for v in _values(dump) if v not in table and not (v.replace(".", "", 1).isdigit() and f"{float(v):g}" in table)]
+    assert not missing, f"report table dropped values: {missing[:5]}"
+
+
+def _tokens(prompt, **inputs) -> int:
+    return estimate_tokens(prompt.format_messages(**inputs))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", default="3,5,10")
+    args = parser.parse_args()
+
+    prefs = UserPreferences(destination="東京", departure_location="台北", num_peoples=2, duration="5天4夜", interests=["美食", "文化"])
+    for num_days in map(int, args.days.split(",")):
+        drafts = [_with_hotels(sample_itinerary(theme, num_days)) for theme in ("美食", "文化", "自然")]
+        itinerary = drafts[1]
+        for draft in drafts:
+            _check(draft)
+
+        rows = {
+            "merge": (
+                _tokens(ITINERARY_MERGE_PROMPT, prefs=prefs, drafts="\n---\n".join(f"第{i}個草案:\n{d}" for i, d in enumerate(drafts, 1))),
+                _tokens(ITINERARY_MERGE_PROMPT, prefs=prefs, drafts="\n---\n".join(f"第{i}個草案:\n{render_itinerary(d)}" for i, d in enumerate(drafts, 1))),
+            ),
+            "modify": (
+                _tokens(ITINERARY_MODIFY_PROMPT, current_itinerary=itinerary, itinerary_changes_requested=REQUEST),
+                _tokens(ITINERARY_MODIFY_PROMPT, current_itinerary=compact_json(itinerary), itinerary_changes_requested=REQUEST),
+            ),
+            "day_modify": (
+                _tokens(ITINERARY_DAY_MODIFY_PROMPT, overview=render_overview(itinerary), targets=_old_targets(itinerary, [1], []), itinerary_changes_requested=REQUEST),
+                _tokens(ITINERARY_DAY_MODIFY_PROMPT, overview=render_overview(itinerary), targets=render_targets(itinerary, [1], []), itinerary_changes_requested=REQUEST),
+            ),
+            "report": (
+                _tokens(ITINERARY_REPORT_PROMPT, intent="plan_trip", itinerary=itinerary),
+                _tokens(ITINERARY_REPORT_PROMPT, intent="plan_trip", itinerary=render_itinerary(itinerary)),
+            ),
+        }
+        print(f"{num_days} days (round trip ok, report table covers all fields):")
+        for name, (before, after) in rows.items():
+            print(f"  {name:<11} {before:>6} -> {after:>6} tokens ({(1 - after / before) * 100:.0f}% fewer)")
+
+
+if __name__ == "__main__":
+    main()
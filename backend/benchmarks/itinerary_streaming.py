@@ -0,0 +1,64 @@
+"""
+Time to the first complete day versus total generation time of a streamed
+itinerary draft (nodes.itinerary_stream.stream_structured), per trip length.
+Before streaming, nothing reached the client until the whole JSON was
+generated and parsed.
+
+Usage (from backend/):
+    python -m benchmarks.itinerary_streaming --fake --days 3,5,10   # FakeChatModel，逐 token 延遲
+    python -m benchmarks.itinerary_streaming --days 3               # 需要可用的 LLM
+"""
+import os
+import sys
+import argparse
+import asyncio
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config, get_llm
+from models import ItineraryPlanning, UserPreferences
+from prompts import ITINERARY_PLANNER_PROMPT
+from nodes.itinerary_stream import stream_structured
+from nodes.json_repair import RepairingOutputParser
+
+
+async def _run(model, num_days: int):
+    prefs = UserPreferences(destination="東京", departure_location="台北", num_peoples=2, duration=f"{num_days}天", interests=["美食", "文化"])
+    start, days = time.perf_counter(), []
+
+    def on_day(index, day):
+        days.append(time.perf_counter() - start)
+
+    itinerary = await stream_structured(
+        ITINERARY_PLANNER_PROMPT | model, {"prefs": prefs, "theme": "美食"}, RepairingOutputParser(pydantic_object=ItineraryPlanning), on_day, "draft",
+    )
+    total = time.perf_counter() - start
+    assert len(days) == len(itinerary.days), f"streamed {len(days)} of {len(itinerary.days)} days"
+    return days, total
+
+
+async def run(days_list, fake: bool):
+    config["cache"]["llm_nodes"] = []
+    if fake:
+        from fake_llm import CannedChatModel
+        model = CannedChatModel(latency_seconds=0.5, latency_sigma=0, seconds_per_token=0.002, seed=0)
+    else:
+        model = get_llm("planning_draft")
+
+    for num_days in days_list:
+        days, total = await _run(model, num_days)
+        print(f"{num_days:>2} days: first day {days[0]:.2f}s, total {total:.2f}s "
+              f"({days[0] / total * 100:.0f}%), days at " + ", ".join(f"{t:.2f}" for t in days))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", default="3,5,10")
+    parser.add_argument("--fake", action="store_true", help="use CannedChatModel with per-output-token latency")
+    args = parser.parse_args()
+    asyncio.run(run([int(d) for d in args.days.split(",")], args.fake))
+
+
+if __name__ == "__main__":
+    main()
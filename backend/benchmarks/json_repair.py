@@ -0,0 +1,108 @@
+"""
+Malformed itinerary outputs (trailing commas, truncation, "" in numeric
+fields, fences, Python literals, ...): how many the strict
+PydanticOutputParser accepts, how many nodes.json_repair fixes locally, and
+what a re-ask / full re-generation would have cost instead.
+
+Usage (from backend/):
+    python -m benchmarks.json_repair --days 5
+"""
+import os
+import sys
+import argparse
+import asyncio
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import AIMessage
+from langchain_core.output_parsers import PydanticOutputParser
+from models import ItineraryPlanning, UserPreferences
+from llm_scheduler import estimate_tokens
+from prompts import ITINERARY_PLANNER_PROMPT, JSON_REPAIR_PROMPT
+from benchmarks.fixtures import sample_itinerary
+from nodes.json_repair import RepairingOutputParser
+
+
+def _with_hotel(data: dict, **hotel) -> dict:
+    data = json.loads(json.dumps(data))
+    data["days"][0]["accommodation"] = {"name": "東京車站大飯店", "address": "東京都千代田區", **hotel}
+    return data
+
+
+def _cases(itinerary: ItineraryPlanning) -> dict:
+    data = itinerary.model_dump(mode="json")
+    text = json.dumps(data, ensure_ascii=False)
+    pretty = json.dumps(data, ensure_ascii=False, indent=2)
+    return {
+        "valid": text,
+        "markdown fence + prose": f"好的，以下是行程：\n```json\n{pretty}\n```\n祝旅途愉快！",
+        "trailing commas": pretty.replace("\n  }", ",\n  }").replace("\n    }", ",\n    }"),
+        "missing final brace": text[:-1],
+        "truncated mid-day": text[:len(text) * 3 // 4],
+        "price \"\"": json.dumps(_with_hotel(data, price="", review_score="", hotel_id=""), ensure_ascii=False),
+        "price with unit": json.dumps(_with_hotel(data, price="NT$5,200", review_score="8.6分"), ensure_ascii=False),
+        "num_peoples \"2人\"": text.replace('"num_peoples": 2', '"num_peoples": "2人"'),
+        "date 2025/03/14": text.replace('"start_date": "2025-03-14"', '"start_date": "2025/03/14"'),
+        "Python None": text.replace("null", "None"),
+        "comment line": pretty.replace('\n  "features"', '\n  // 特色\n  "features"'),
+        "raw newline in string": text.replace("主題: ", "主題:\n", 1),
+        "unquoted value": text.replace('"type": "Restaurant"', '"type": Restaurant', 1),
+        "unquoted CJK value": text.replace('"departure_location": "台北"', '"departure_location": 台北', 1),
+    }
+
+
+async def run(num_days: int):
+    config["cache"]["llm_nodes"] = []
+    from fake_llm import CannedChatModel
+    llm = CannedChatModel(latency_seconds=1.0, latency_sigma=0, seconds_per_token=0.01, seed=0)
+
+    itinerary = sample_itinerary("美食", num_days)
+    strict = PydanticOutputParser(pydantic_object=ItineraryPlanning)
+    local = RepairingOutputParser(pydantic_object=ItineraryPlanning, node="benchmark")
+    reask = RepairingOutputParser(pydantic_object=ItineraryPlanning, node="benchmark.reask", llm=llm)
+
+    results = {"strict": 0, "local": 0}
+    print(f"{'case':<24} strict  ms       repaired  ms      days")
+    cases = _cases(itinerary)
+    for name, text in cases.items():
+        row, parsed = [], None
+        for label, parser in (("strict", strict), ("local", local)):
+            start = time.perf_counter()
+            try:
+                parsed = parser.parse(text)
+                results[label] += 1
+                row.append("ok")
+            except OutputParserException:
+                row.append("-")
+            row.append(f"{(time.perf_counter() - start) * 1000:.1f}")
+        print(f"{name:<24} {row[0]:<7} {row[1]:<8} {row[2]:<9} {row[3]:<7} {len(parsed.days) if row[2] == 'ok' else '-'}")
+    print(f"accepted: strict {results['strict']}/{len(cases)}, with local repair {results['local']}/{len(cases)}")
+
+    # 本地修不好時的代價: 重新詢問 LLM (附原始輸出) 或整份重新生成
+    broken = "行程生成失敗，輸出不是 JSON"
+    reask_prompt = JSON_REPAIR_PROMPT.format_messages(
+        schema=ItineraryPlanning.model_json_schema(), error="Invalid json output", output=cases["truncated mid-day"])
+    prefs = UserPreferences(destination="東京", departure_location="台北", num_peoples=2, duration=f"{num_days}天")
+    regenerate_prompt = ITINERARY_PLANNER_PROMPT.format_messages(prefs=prefs, theme="美食")
+    output_tokens = estimate_tokens([AIMessage(content=cases["valid"])])
+
+    start = time.perf_counter()
+    await reask.ainvoke(broken)
+    reask_latency = time.perf_counter() - start
+    print(f"re-ask:      {estimate_tokens(reask_prompt):>6} prompt + {output_tokens} output tokens, {reask_latency:.2f}s (fake model)")
+    print(f"re-generate: {estimate_tokens(regenerate_prompt):>6} prompt + {output_tokens} output tokens")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.days))
+
+
+if __name__ == "__main__":
+    main()
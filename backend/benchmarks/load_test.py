@@ -0,0 +1,115 @@
+"""
+Load test for POST /api/travel/chat/stream with N concurrent simulated users.
+
+Each user runs a scripted session (chat -> preference collection -> planning ->
+scoped modification) on its own plan_id. Reports requests/sec, time to first
+byte, time to first AI message and full response time per turn, plus per-node
+latency percentiles from GET /api/travel/metrics.
+
+Usage (from backend/):
+    # 伺服器使用假模型，不需 OpenAI API key
+    LLM_PROVIDER=fake LANGCHAIN_TRACING_V2=false CHECKPOINTER_BACKEND=memory CACHE_BACKEND=memory \\
+        DATABASE_URL=sqlite+aiosqlite:///./load_test.db uvicorn main:app --port 8000
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --users 20
+
+    # 錄製一次真實會話，之後以 CASSETTE_MODE=replay 重播 (CASSETTE_TIME_SCALE=0 不等待原始延遲)
+    CASSETTE_MODE=record CASSETTE_PATH=cassettes/session.jsonl uvicorn main:app --port 8000
+    CASSETTE_MODE=replay CASSETTE_PATH=cassettes/session.jsonl CASSETTE_TIME_SCALE=0 uvicorn main:app --port 8000
+"""
+import os
+import sys
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+SCRIPT = [
+    ("chat", "你好，今天天氣真好"),
+    ("plan", "我想去東京玩"),
+    ("collect", "從台北出發，2025-03-14出發，5天4夜，2個人，喜歡美食和文化"),
+    ("modify", "第二天下午想改去秋葉原"),
+]
+
+
+def _pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))] if samples else 0.0
+
+
+async def _turn(client: httpx.AsyncClient, user_id: str, plan_id: str, message: str) -> dict:
+    start = time.perf_counter()
+    ttfb = first_message = None
+    async with client.stream("POST", "/api/travel/chat/stream", json={"user_id": user_id, "plan_id": plan_id, "message": message}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+            if first_message is None and line.startswith("data: {"):
+                data = json.loads(line[len("data: "):])
+                content = data.get("message")
+                if isinstance(content, dict) and content.get("content"):
+                    first_message = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return {"ttfb": ttfb or total, "first_message": first_message or total, "total": total}
+
+
+async def _user(client: httpx.AsyncClient, index: int, results: dict, errors: list):
+    user_id, plan_id = f"load-{index}", uuid.uuid4().hex[:8]
+    for step, message in SCRIPT:
+        try:
+            results[step].append(await _turn(client, user_id, plan_id, message))
+        except Exception as e:
+            errors.append(f"{step}: {e!r}")
+            return
+
+
+async def run(url: str, users: int, ramp: float):
+    results, errors = defaultdict(list), []
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=url, timeout=300, limits=limits) as client:
+        start = time.perf_counter()
+
+        async def delayed(i):
+            await asyncio.sleep(ramp * i / max(users, 1))
+            await _user(client, i, results, errors)
+
+        await asyncio.gather(*[delayed(i) for i in range(users)])
+        wall = time.perf_counter() - start
+        server = (await client.get("/api/travel/metrics")).json()
+
+    completed = sum(len(v) for v in results.values())
+    print(f"users={users} requests={completed} errors={len(errors)} wall={wall:.1f}s rps={completed / wall:.2f}")
+    for step, _ in SCRIPT:
+        samples = results[step]
+        if not samples:
+            continue
+        line = " ".join(
+            f"{key}_p50={_pct([s[key] for s in samples], 50):.2f}s {key}_p95={_pct([s[key] for s in samples], 95):.2f}s"
+            for key in ("ttfb", "first_message", "total")
+        )
+        print(f"  [{step:<8}] n={len(samples)} {line}")
+    print("node latency (server):")
+    for name, timing in sorted(server.get("timings", {}).items()):
+        if name.startswith("node.latency.") or name.startswith("llm_scheduler.wait."):
+            print(f"  {name:<40} n={timing['count']} p50={timing['p50']:.3f}s p95={timing['p95']:.3f}s max={timing['max']:.3f}s")
+    for error in errors[:5]:
+        print(f"  error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--ramp", type=float, default=0.0, help="seconds over which users are started")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.users, args.ramp))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Compare the local merge engine with the ITINERARY_MERGE_PROMPT merge.
+
+Usage (from backend/):
+    python -m benchmarks.merge_modes --days 5 --runs 50
+    python -m benchmarks.merge_modes --days 5 --runs 3 --llm   # 需要可用的 LLM
+"""
+import os
+import sys
+import argparse
+import asyncio
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.output_parsers import PydanticOutputParser
+from benchmarks.fixtures import sample_itinerary
+from models import ItineraryPlanning
+from nodes.itinerary_merge import merge_itineraries, _score, _theme_keywords
+
+THEMES = ["美食", "文化", "自然"]
+
+
+def _check(drafts, merged):
+    # 合併後每天的時段數不得少於來源草案，也不得有空白天數
+    for i, day in enumerate(merged.days):
+        expected = min(len(d.days[i].segments) for d in drafts if i < len(d.days))
+        assert len(day.segments) >= expected, f"day {i + 1}: {len(day.segments)} of {expected} segments"
+        assert all(s.activities for s in day.segments), f"day {i + 1}: empty segment"
+
+
+def _summary(name, latencies, merged):
+    keywords = _theme_keywords(THEMES)
+    activities = [a for d in merged.days for s in d.segments for a in s.activities]
+    locations = [a.activity_location for a in activities]
+    print(f"[{name}] p50={statistics.median(latencies) * 1000:.1f}ms max={max(latencies) * 1000:.1f}ms "
+          f"days={len(merged.days)} segments={sum(len(d.segments) for d in merged.days)} activities={len(activities)} "
+          f"duplicate_locations={len(locations) - len(set(locations))} "
+          f"coverage={_score(activities, keywords):.2f}")
+
+
+async def _llm_merge(drafts, prefs):
+    from config import get_llm
+    from prompts import ITINERARY_MERGE_PROMPT
+
+    chain = ITINERARY_MERGE_PROMPT | get_llm("merge_draft") | PydanticOutputParser(pydantic_object=ItineraryPlanning)
+    text = "\n---\n".join([f"第{i}個草案:\n{item}" for i, item in enumerate(drafts, 1)])
+    return await chain.ainvoke({"prefs": prefs, "drafts": text})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--llm", action="store_true", help="also benchmark the LLM merge")
+    args = parser.parse_args()
+
+    drafts = [sample_itinerary(theme, args.days) for theme in THEMES]
+
+    latencies = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        merged = merge_itineraries(drafts, THEMES)
+        latencies.append(time.perf_counter() - start)
+    _check(drafts, merged)
+    _summary("local", latencies, merged)
+
+    if args.llm:
+        latencies = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            merged = asyncio.run(_llm_merge(drafts, {"interests": THEMES}))
+            latencies.append(time.perf_counter() - start)
+        _check(drafts, merged)
+        _summary("llm", latencies, merged)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Latency and cost of each node's prompt under different model tier layouts.
+
+Usage (from backend/):
+    python -m benchmarks.model_tiers --runs 3                   # 需要可用的 LLM (與本地端點)
+    python -m benchmarks.model_tiers --runs 3 --fake            # 以 FakeChatModel 模擬各等級延遲
+    python -m benchmarks.model_tiers --layouts single,tiered    # 只比較部分配置
+"""
+import os
+import sys
+import argparse
+import asyncio
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config as config_module
+from config import config, get_llm
+from prompts import (
+    INTENT_PROMPT, CHAT_PROMPT, PREF_PROMPT, ITINERARY_PLANNER_PROMPT,
+    ITINERARY_MERGE_PROMPT, ITINERARY_DAY_MODIFY_PROMPT, ITINERARY_REPORT_PROMPT,
+)
+from benchmarks.fixtures import sample_itinerary
+from nodes.itinerary_patch import render_overview, render_targets
+from nodes.itinerary_format import render_itinerary
+
+# 每百萬 token 的美金價格 (input, output)；未列出的模型 (本地端點) 視為 0
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+LIGHT_NODES = ["intent_router", "chat", "collect_preferences", "report_itinerary"]
+HEAVY_NODES = ["planning_draft", "merge_draft", "modify_plan"]
+LAYOUTS = {
+    "single": {**{n: "small" for n in LIGHT_NODES}, **{n: "small" for n in HEAVY_NODES}},
+    "tiered": {**{n: "small" for n in LIGHT_NODES}, **{n: "large" for n in HEAVY_NODES}},
+    "all-large": {**{n: "large" for n in LIGHT_NODES}, **{n: "large" for n in HEAVY_NODES}},
+    "local-light": {**{n: "local" for n in LIGHT_NODES}, **{n: "large" for n in HEAVY_NODES}},
+}
+FAKE_LATENCY = {"small": 0.4, "large": 1.2, "local": 0.2}
+
+
+def _scenarios():
+    prefs = "目的地: 東京, 出發地: 台北, 出發日期: 2025-03-14, 天數: 5天4夜, 人數: 2, 興趣: 美食, 文化"
+    itinerary = sample_itinerary("文化", 5)
+    drafts = "\n---\n".join(f"第{i}個草案:\n{render_itinerary(sample_itinerary(t, 5))}" for i, t in enumerate(["美食", "文化", "自然"], 1))
+    return {
+        "intent_router": (INTENT_PROMPT, {"message": "我想下個月去東京玩五天", "history": []}),
+        "chat": (CHAT_PROMPT, {"message": "東京三月的天氣如何？需要帶外套嗎？", "history": []}),
+        "collect_preferences": (PREF_PROMPT, {"prefs": "{}", "history": "3/14從台北出發去東京5天，2個人，喜歡美食和文化"}),
+        "planning_draft": (ITINERARY_PLANNER_PROMPT, {"prefs": prefs, "theme": "美食"}),
+        "merge_draft": (ITINERARY_MERGE_PROMPT, {"prefs": prefs, "drafts": drafts}),
+        "modify_plan": (ITINERARY_DAY_MODIFY_PROMPT, {
+            "overview": render_overview(itinerary),
+            "targets": render_targets(itinerary, [1], []),
+            "itinerary_changes_requested": "第二天下午想改去秋葉原",
+        }),
+        "report_itinerary": (ITINERARY_REPORT_PROMPT, {"intent": "plan_trip", "itinerary": render_itinerary(itinerary)}),
+    }
+
+
+async def _run_layout(name, layout, runs):
+    config["node_tier"].update(layout)
+    rows, total_cost, total_latency = [], 0.0, 0.0
+    for node, (prompt, inputs) in _scenarios().items():
+        llm = get_llm(node)
+        latencies, cost = [], 0.0
+        for _ in range(runs):
+            start = time.perf_counter()
+            message = await (prompt | llm).ainvoke(inputs)
+            latencies.append(time.perf_counter() - start)
+            usage = message.usage_metadata or {}
+            price_in, price_out = PRICES.get(config["llm_tiers"][layout[node]]["model"], (0, 0))
+            cost += (usage.get("input_tokens", 0) * price_in + usage.get("output_tokens", 0) * price_out) / 1e6
+        rows.append(f"  {node:<20} {layout[node]:<6} p50={statistics.median(latencies):.2f}s cost/run=${cost / runs:.5f}")
+        total_cost += cost / runs
+        total_latency += statistics.median(latencies)
+    print(f"[{name}] sum_p50={total_latency:.2f}s cost/session=${total_cost:.5f}")
+    print("\n".join(rows))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--layouts", default=",".join(LAYOUTS))
+    parser.add_argument("--fake", action="store_true", help="use FakeChatModel per tier instead of real endpoints")
+    args = parser.parse_args()
+
+    config["cache"]["llm_nodes"] = []
+    if args.fake:
+        from fake_llm import FakeChatModel
+        for tier, latency in FAKE_LATENCY.items():
+            config_module._tier_models[tier] = FakeChatModel(latency_seconds=latency, seed=0)
+
+    for name in args.layouts.split(","):
+        asyncio.run(_run_layout(name, LAYOUTS[name], args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Time to first chat token with and without speculative chat (INTENT_SPECULATIVE_CHAT),
+for messages that miss the intent fast path and need the LLM. Non-chat messages
+show the cost: speculative replies that were cancelled and the tokens they used.
+
+Usage (from backend/):
+    LLM_PROVIDER=fake LANGCHAIN_TRACING_V2=false CACHE_BACKEND=memory CHECKPOINTER_BACKEND=memory \\
+        python -m benchmarks.speculative_chat --runs 10
+"""
+import os
+import sys
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from metrics import metrics
+
+# 各節點以 import 時的設定建立模型，需在 import graph 前關閉回應快取
+config["cache"]["llm_nodes"] = []
+
+from graph import create_graph
+from models import ChatRequest
+from services.planning_service import TravelPlanningService
+
+CHAT_MESSAGES = ["東京三月的天氣如何？需要帶外套嗎？", "日本的新幹線怎麼買票？", "推薦幾本好看的小說"]
+OTHER_MESSAGES = ["下個月想到京都旅遊"]
+
+
+class _Request:
+    async def is_disconnected(self):
+        return False
+
+
+def _pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))] if samples else 0.0
+
+
+async def _turn(service: TravelPlanningService, message: str) -> float:
+    start, first = time.perf_counter(), None
+    request = ChatRequest(user_id="bench", plan_id=uuid.uuid4().hex[:8], message=message)
+    async for event in service.handle_chat_stream(request, _Request()):
+        if first is None and event.startswith("data: {"):
+            data = json.loads(event[len("data: "):])
+            if isinstance(data.get("message"), dict) and data["message"].get("content"):
+                first = time.perf_counter() - start
+    return first if first is not None else time.perf_counter() - start
+
+
+async def _run(name: str, speculative: bool, runs: int):
+    config["intent"]["speculative_chat"] = speculative
+    service = TravelPlanningService(create_graph())
+    metrics.reset()
+    chat_ttft, other_ttft = [], []
+    for _ in range(runs):
+        for message in CHAT_MESSAGES:
+            chat_ttft.append(await _turn(service, message))
+        for message in OTHER_MESSAGES:
+            other_ttft.append(await _turn(service, message))
+    counters = metrics.snapshot()["counters"]
+    print(f"[{name}] chat ttft p50={_pct(chat_ttft, 50):.3f}s p95={_pct(chat_ttft, 95):.3f}s | "
+          f"non-chat ttft p50={_pct(other_ttft, 50):.3f}s | "
+          f"speculative started={int(counters.get('chat.speculative.started', 0))} "
+          f"used={int(counters.get('chat.speculative.used', 0))} "
+          f"cancelled={int(counters.get('chat.speculative.cancelled', 0))} "
+          f"wasted_tokens={int(counters.get('chat.speculative.wasted_tokens', 0))}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(_run("sequential", False, args.runs))
+    asyncio.run(_run("speculative", True, args.runs))
+
+
+if __name__ == "__main__":
+    main()
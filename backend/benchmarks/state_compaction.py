@@ -0,0 +1,83 @@
+"""
+Checkpoint size and (de)serialization time of one planning session as it
+ages (turn 5, 25, 100 ...), with and without the compact_state node
+(STATE_COMPACTION). The session plans a trip, then alternates questions and
+itinerary changes (--changes-only: itinerary changes only, so the chat node
+never runs).
+
+Usage (from backend/):
+    LLM_PROVIDER=fake FAKE_LLM_LATENCY_SECONDS=0 LANGCHAIN_TRACING_V2=false CACHE_BACKEND=memory \\
+        CHECKPOINTER_BACKEND=memory python -m benchmarks.state_compaction --turns 5,25,100
+"""
+import os
+import sys
+import argparse
+import asyncio
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+
+# 各節點以 import 時的設定建立模型，需在 import graph 前關閉回應快取
+config["cache"]["llm_nodes"] = []
+
+from graph import create_graph
+from models import ChatRequest
+from services.planning_service import TravelPlanningService
+from benchmarks.speculative_chat import _Request
+
+SETUP = ["你好", "我想去東京玩", "從台北出發，2025-03-14出發，5天4夜，2個人，喜歡美食和文化"]
+QUESTIONS = ["東京三月的天氣如何？需要帶外套嗎？", "淺草寺附近有什麼好吃的？", "新幹線到京都要多久？"]
+CHANGES = ["第二天下午想改去秋葉原", "第三天上午想改去築地市場", "第四天晚上想改去東京鐵塔"]
+
+
+def _message(turn: int, changes_only: bool = False) -> str:
+    if turn < len(SETUP):
+        return SETUP[turn]
+    i = turn - len(SETUP)
+    if changes_only:
+        return CHANGES[i % len(CHANGES)]
+    return QUESTIONS[i // 2 % len(QUESTIONS)] if i % 2 == 0 else CHANGES[i // 2 % len(CHANGES)]
+
+
+async def _measure(graph, thread_id: str, runs: int = 50):
+    saver = graph.checkpointer
+    checkpoint = (await saver.aget_tuple({"configurable": {"thread_id": thread_id}})).checkpoint
+    start = time.perf_counter()
+    for _ in range(runs):
+        typed = saver.serde.dumps_typed(checkpoint)
+    dumps = (time.perf_counter() - start) / runs
+    start = time.perf_counter()
+    for _ in range(runs):
+        saver.serde.loads_typed(typed)
+    loads = (time.perf_counter() - start) / runs
+    return len(typed[1]), len(checkpoint["channel_values"]["messages"]), dumps, loads
+
+
+async def run(checkpoints, changes_only: bool):
+    for enabled in (False, True):
+        config["compaction"]["enabled"] = enabled
+        graph = create_graph()
+        service = TravelPlanningService(graph)
+        print(f"compaction {'on' if enabled else 'off'}:")
+        for turn in range(max(checkpoints)):
+            request = ChatRequest(user_id="bench", plan_id=f"compaction-{enabled}", message=_message(turn, changes_only))
+            async for _ in service.handle_chat_stream(request, _Request()):
+                pass
+            if turn + 1 in checkpoints:
+                size, messages, dumps, loads = await _measure(graph, f"bench@compaction-{enabled}")
+                print(f"  turn {turn + 1:>4}: {size / 1024:>7.1f} KB, {messages:>4} messages, "
+                      f"dumps {dumps * 1000:.2f} ms, loads {loads * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", default="5,25,100")
+    parser.add_argument("--changes-only", action="store_true", help="no chat turns after planning")
+    args = parser.parse_args()
+    asyncio.run(run(sorted(map(int, args.turns.split(","))), args.changes_only))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional, Any
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+from sqlalchemy import select, delete, func
+from config import config, logger
+from metrics import metrics
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class LRUStore:
+    """In-process LRU tier with per-entry expiry."""
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._data = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at < time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str, expires_at: float):
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self._max_entries:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+class SQLiteStore:
+    """
+    Persistent tier on a local SQLite file. sqlite3 is blocking, so every
+    query runs in a worker thread instead of on the event loop.
+    """
+    def __init__(self, path: str, max_entries: int):
+        self._max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed_at ON cache_entries (accessed_at)")
+        # 同一個連線在多個執行緒間共用，一次只執行一組查詢
+        self._lock = threading.Lock()
+
+    def _get(self, namespace: str, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if not row:
+                return None
+            if row[1] < time.time():
+                self._conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+                return None
+            self._conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?", (time.time(), namespace, key)
+            )
+            return row[0]
+
+    def _set(self, namespace: str, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, value, expires_at, time.time()),
+            )
+
+    def _evict(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (time.time(),))
+            removed = cur.rowcount
+            cur = self._conn.execute(
+                "DELETE FROM cache_entries WHERE rowid IN ("
+                " SELECT rowid FROM cache_entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,),
+            )
+            return removed + cur.rowcount
+
+    def _clear(self, namespace: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+
+    async def get(self, namespace: str, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get, namespace, key)
+
+    async def set(self, namespace: str, key: str, value: str, expires_at: float):
+        await asyncio.to_thread(self._set, namespace, key, value, expires_at)
+
+    async def evict(self) -> int:
+        return await asyncio.to_thread(self._evict)
+
+    async def clear(self, namespace: str):
+        await asyncio.to_thread(self._clear, namespace)
+
+
+class DatabaseStore:
+    """Persistent tier on the application database (`database.engine`)."""
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+
+    async def get(self, namespace: str, key: str) -> Optional[str]:
+        from database import AsyncSessionLocal
+        from schema import CacheEntry
+
+        async with AsyncSessionLocal() as session:
+            entry = await session.get(CacheEntry, (namespace, key))
+            if not entry:
+                return None
+            now = datetime.now(timezone.utc)
+            if entry.expires_at < now:
+                await session.delete(entry)
+                await session.commit()
+                return None
+            entry.accessed_at = now
+            await session.commit()
+            return entry.value
+
+    async def set(self, namespace: str, key: str, value: str, expires_at: float):
+        from database import AsyncSessionLocal
+        from schema import CacheEntry
+
+        async with AsyncSessionLocal() as session:
+            await session.merge(CacheEntry(
+                namespace=namespace,
+                key=key,
+                value=value,
+                expires_at=datetime.fromtimestamp(expires_at, timezone.utc),
+                accessed_at=datetime.now(timezone.utc),
+            ))
+            await session.commit()
+
+    async def evict(self) -> int:
+        from database import AsyncSessionLocal
+        from schema import CacheEntry
+
+        async with AsyncSessionLocal() as session:
+            expired = await session.execute(
+                delete(CacheEntry).where(CacheEntry.expires_at < datetime.now(timezone.utc))
+            )
+            removed = expired.rowcount
+            total = (await session.execute(select(func.count()).select_from(CacheEntry))).scalar()
+            if total > self._max_entries:
+                cutoff = (await session.execute(
+                    select(CacheEntry.accessed_at)
+                    .order_by(CacheEntry.accessed_at.desc())
+                    .offset(self._max_entries)
+                    .limit(1)
+                )).scalar()
+                overflow = await session.execute(delete(CacheEntry).where(CacheEntry.accessed_at <= cutoff))
+                removed += overflow.rowcount
+            await session.commit()
+            return removed
+
+    async def clear(self, namespace: str):
+        from database import AsyncSessionLocal
+        from schema import CacheEntry
+
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(CacheEntry).where(CacheEntry.namespace == namespace))
+            await session.commit()
+
+
+def _create_store():
+    backend = config["cache"]["backend"]
+    if backend == "sqlite":
+        return SQLiteStore(config["cache"]["sqlite_path"], config["cache"]["max_entries"])
+    if backend == "postgres":
+        return DatabaseStore(config["cache"]["max_entries"])
+    if backend == "memory":
+        return None
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+
+_store = None
+_store_created = False
+
+def get_store():
+    global _store, _store_created
+    if not _store_created:
+        _store = _create_store()
+        _store_created = True
+    return _store
+
+
+class TieredCache:
+    """
+    Two-tier key/value cache: an in-process LRU in front of the persistent
+    store selected by `config["cache"]["backend"]`. Entries expire after
+    `ttl_seconds`; the persistent tier is trimmed to `max_entries` by
+    last access every `evict_every` writes.
+    """
+    def __init__(self, namespace: str, ttl_seconds: int, lru_size: int = None, evict_every: int = 200):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self._lru = LRUStore(lru_size or config["cache"]["lru_size"])
+        self._evict_every = evict_every
+        self._writes = 0
+        metrics.register_ratio(f"cache.{namespace}.hit_ratio", f"cache.{namespace}.hits", f"cache.{namespace}.lookups")
+
+    async def get(self, key: str) -> Optional[str]:
+        metrics.incr(f"cache.{self.namespace}.lookups")
+        value = self._lru.get(key)
+        if value is not None:
+            metrics.incr(f"cache.{self.namespace}.hits")
+            return value
+
+        store = get_store()
+        if store is None:
+            return None
+        try:
+            value = await store.get(self.namespace, key)
+        except Exception as e:
+            logger.warning(f"Cache read failed ({self.namespace}): {e}")
+            return None
+        if value is not None:
+            metrics.incr(f"cache.{self.namespace}.hits")
+            # 回填記憶體層，僅保留剩餘時間的一部分以免超過持久層的到期時間
+            self._lru.set(key, value, time.time() + min(self.ttl_seconds, 300))
+        return value
+
+    async def set(self, key: str, value: str, ttl_seconds: int = None):
+        expires_at = time.time() + (ttl_seconds or self.ttl_seconds)
+        self._lru.set(key, value, expires_at)
+
+        store = get_store()
+        if store is None:
+            return
+        try:
+            await store.set(self.namespace, key, value, expires_at)
+            self._writes += 1
+            if self._writes % self._evict_every == 0:
+                removed = await store.evict()
+                if removed:
+                    logger.info(f"Cache evicted {removed} entries.")
+        except Exception as e:
+            logger.warning(f"Cache write failed ({self.namespace}): {e}")
+
+    async def clear(self):
+        self._lru.clear()
+        store = get_store()
+        if store is not None:
+            await store.clear(self.namespace)
+
+
+def _strip_ids(obj: Any):
+    # 訊息 id 每次對話都不同，不應影響快取鍵
+    if isinstance(obj, dict):
+        return {k: _strip_ids(v) for k, v in obj.items() if k not in ("id", "response_metadata", "usage_metadata")}
+    if isinstance(obj, list):
+        return [_strip_ids(v) for v in obj]
+    if isinstance(obj, str):
+        return " ".join(obj.split())
+    return obj
+
+
+def llm_cache_key(prompt: str, llm_string: str) -> str:
+    """Hash of the model parameters (name, temperature, ...) and the normalized rendered messages."""
+    try:
+        normalized = json.dumps(_strip_ids(json.loads(prompt)), ensure_ascii=False, sort_keys=True)
+    except ValueError:
+        normalized = " ".join(prompt.split())
+    return hashlib.sha256(f"{llm_string}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache(BaseCache):
+    """
+    LangChain cache attached to the chat model of a single node, so that
+    hit ratio and saved tokens are reported per node.
+    """
+    def __init__(self, node: str, ttl_seconds: int = None):
+        self.node = node
+        self._cache = TieredCache("llm", ttl_seconds or config["cache"]["llm_ttl_seconds"])
+        metrics.register_ratio(f"llm_cache.{node}.hit_ratio", f"llm_cache.{node}.hits", f"llm_cache.{node}.lookups")
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        metrics.incr(f"llm_cache.{self.node}.lookups")
+        value = await self._cache.get(llm_cache_key(prompt, llm_string))
+        if value is None:
+            return None
+
+        generations = loads(value)
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is not None:
+                usage = getattr(message, "usage_metadata", None) or {}
+                metrics.incr(f"llm_cache.{self.node}.saved_tokens", usage.get("total_tokens", 0))
+                message.id = None  # 讓 add_messages 視為新訊息
+        metrics.incr(f"llm_cache.{self.node}.hits")
+        return generations
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        await self._cache.set(llm_cache_key(prompt, llm_string), dumps(return_val))
+
+    async def aclear(self, **kwargs: Any) -> None:
+        await self._cache.clear()
+
+    # 同步介面: 節點皆為 async，只提供記憶體層
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        value = self._cache._lru.get(llm_cache_key(prompt, llm_string))
+        return loads(value) if value is not None else None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self._cache._lru.set(
+            llm_cache_key(prompt, llm_string), dumps(return_val), time.time() + self._cache.ttl_seconds
+        )
+
+    def clear(self, **kwargs: Any) -> None:
+        self._cache._lru.clear()
+
+
+_llm_caches = {}
+
+def llm_cache_for(node: str) -> LLMResponseCache:
+    if node not in _llm_caches:
+        _llm_caches[node] = LLMResponseCache(node)
+    return _llm_caches[node]
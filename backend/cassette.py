@@ -0,0 +1,84 @@
+from collections import defaultdict, deque
+from typing import Optional
+from config import config, logger
+from metrics import metrics
+import asyncio
+import json
+import os
+import time
+
+
+class CassetteMiss(KeyError):
+    """No recorded interaction matches the request being replayed."""
+
+
+class Cassette:
+    """
+    JSONL recording of LLM calls and Booking HTTP exchanges.
+
+    record: every interaction is appended as one line
+        {"kind", "key", "request", "response", "latency", ...}.
+    replay: requests are matched by `key` and answered from the file after
+        the recorded latency multiplied by `time_scale` (0 = no delay).
+        Identical requests are served in recorded order, the last one repeats.
+    """
+    def __init__(self, path: str, mode: str, time_scale: float = 1.0):
+        self.path = path
+        self.mode = mode
+        self.time_scale = time_scale
+        self._entries = defaultdict(deque)
+        if mode == "replay":
+            self._load()
+        elif mode == "record" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[(entry["kind"], entry["key"])].append(entry)
+        logger.info(f"Cassette loaded: {sum(len(q) for q in self._entries.values())} interactions from {self.path}")
+
+    def record(self, kind: str, key: str, request, response, latency: float, **extra):
+        entry = {"kind": kind, "key": key, "request": request, "response": response, "latency": round(latency, 4), **extra}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        metrics.incr(f"cassette.{kind}.recorded")
+
+    def next(self, kind: str, key: str) -> dict:
+        queue = self._entries.get((kind, key))
+        if not queue:
+            metrics.incr(f"cassette.{kind}.misses")
+            raise CassetteMiss(f"No recorded {kind} interaction for key {key[:16]}")
+        metrics.incr(f"cassette.{kind}.hits")
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    async def replay(self, kind: str, key: str):
+        entry = self.next(kind, key)
+        await asyncio.sleep(entry["latency"] * self.time_scale)
+        return entry["response"]
+
+    def delay(self, seconds: float) -> float:
+        return seconds * self.time_scale
+
+
+_cassette = None
+
+def get_cassette() -> Optional[Cassette]:
+    """The configured cassette, or None when CASSETTE_MODE is off."""
+    global _cassette
+    settings = config["cassette"]
+    if settings["mode"] not in ("record", "replay"):
+        return None
+    if _cassette is None:
+        _cassette = Cassette(settings["path"], settings["mode"], settings["time_scale"])
+    return _cassette
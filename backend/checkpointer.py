@@ -0,0 +1,97 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+from sqlalchemy import select, delete
+from config import config, logger
+from database import engine, AsyncSessionLocal
+from schema import ThreadActivity
+import asyncio
+
+
+@asynccontextmanager
+async def open_checkpointer(backend: str = None):
+    """
+    Open the checkpointer used by the graph.
+    - postgres: shares the database of `database.engine`, so any worker can resume any thread.
+    - sqlite: local file fallback for development.
+    - memory: process-local, for tests/benchmarks only.
+    """
+    backend = backend or config["checkpointer"]["backend"]
+    logger.info(f"Opening checkpointer: {backend}")
+
+    if backend == "postgres":
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        from psycopg_pool import AsyncConnectionPool
+        from psycopg.rows import dict_row
+
+        # 沿用 database.engine 的連線設定 (asyncpg -> psycopg)
+        conninfo = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        async with AsyncConnectionPool(
+            conninfo,
+            max_size=10,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+            open=False,
+        ) as pool:
+            saver = AsyncPostgresSaver(pool)
+            await saver.setup()
+            yield saver
+    elif backend == "sqlite":
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        async with AsyncSqliteSaver.from_conn_string(config["checkpointer"]["sqlite_path"]) as saver:
+            await saver.setup()
+            yield saver
+    elif backend == "memory":
+        yield MemorySaver()
+    else:
+        raise ValueError(f"Unknown checkpointer backend: {backend}")
+
+
+class ThreadEvictor:
+    """
+    Tracks the last access of each thread and deletes the checkpoints of
+    threads idle longer than `ttl_seconds`, or beyond the `max_threads`
+    most recently used ones (LRU).
+    """
+    def __init__(self, checkpointer: BaseCheckpointSaver, ttl_seconds: int = None, max_threads: int = None):
+        self._checkpointer = checkpointer
+        self._ttl = timedelta(seconds=ttl_seconds or config["checkpointer"]["thread_ttl_seconds"])
+        self._max_threads = max_threads or config["checkpointer"]["max_threads"]
+
+    async def touch(self, thread_id: str):
+        async with AsyncSessionLocal() as session:
+            await session.merge(ThreadActivity(thread_id=thread_id, last_seen=datetime.now(timezone.utc)))
+            await session.commit()
+
+    async def sweep(self) -> int:
+        cutoff = datetime.now(timezone.utc) - self._ttl
+        async with AsyncSessionLocal() as session:
+            expired = await session.execute(
+                select(ThreadActivity.thread_id).where(ThreadActivity.last_seen < cutoff)
+            )
+            overflow = await session.execute(
+                select(ThreadActivity.thread_id)
+                .order_by(ThreadActivity.last_seen.desc())
+                .offset(self._max_threads)
+            )
+            victims = set(expired.scalars().all()) | set(overflow.scalars().all())
+            if not victims:
+                return 0
+
+            for thread_id in victims:
+                await self._checkpointer.adelete_thread(thread_id)
+            await session.execute(delete(ThreadActivity).where(ThreadActivity.thread_id.in_(victims)))
+            await session.commit()
+
+        logger.info(f"Evicted {len(victims)} idle threads.")
+        return len(victims)
+
+    async def run(self, interval_seconds: int = None):
+        interval = interval_seconds or config["checkpointer"]["sweep_interval_seconds"]
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Thread eviction failed: {e}")
+            await asyncio.sleep(interval)
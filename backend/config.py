@@ -19,10 +19,176 @@ logger.add(
 
 
 config = {
+    # openai: 實際呼叫 OpenAI; fake: 本地假模型 (fake_llm.CannedChatModel)，供壓測使用，不需 API key
+    "llm_provider": os.getenv("LLM_PROVIDER", "openai"),
+    "fake": {
+        "latency_seconds": float(os.getenv("FAKE_LLM_LATENCY_SECONDS", 0.3)),
+        "latency_sigma": float(os.getenv("FAKE_LLM_LATENCY_SIGMA", 0.3)),
+        "seconds_per_token": float(os.getenv("FAKE_LLM_SECONDS_PER_TOKEN", 0.002)),
+        "seconds_per_input_token": float(os.getenv("FAKE_LLM_SECONDS_PER_INPUT_TOKEN", 0.0)),
+        "slow_rate": float(os.getenv("FAKE_LLM_SLOW_RATE", 0.0)),
+        "slow_factor": float(os.getenv("FAKE_LLM_SLOW_FACTOR", 10)),
+        "error_rate": float(os.getenv("FAKE_LLM_ERROR_RATE", 0.0)),
+    },
     "openai":{
         "model": "gpt-4o-mini",
         "temperature": 0.7,
         "api_key": os.getenv("OPENAI_API_KEY")
+    },
+    # 模型分級: 各節點依 node_tier 使用對應等級的模型 (base_url 可指向 OpenAI 相容的本地端點)
+    "llm_tiers": {
+        "small": {
+            "model": os.getenv("LLM_SMALL_MODEL", "gpt-4o-mini"),
+            "base_url": os.getenv("LLM_SMALL_BASE_URL"),
+            "api_key": os.getenv("LLM_SMALL_API_KEY") or os.getenv("OPENAI_API_KEY"),
+            "temperature": float(os.getenv("LLM_SMALL_TEMPERATURE", 0.7)),
+        },
+        "large": {
+            "model": os.getenv("LLM_LARGE_MODEL", "gpt-4o"),
+            "base_url": os.getenv("LLM_LARGE_BASE_URL"),
+            "api_key": os.getenv("LLM_LARGE_API_KEY") or os.getenv("OPENAI_API_KEY"),
+            "temperature": float(os.getenv("LLM_LARGE_TEMPERATURE", 0.7)),
+        },
+        "local": {
+            "model": os.getenv("LLM_LOCAL_MODEL", "qwen2.5:7b-instruct"),
+            "base_url": os.getenv("LLM_LOCAL_BASE_URL", "http://localhost:11434/v1"),
+            "api_key": os.getenv("LLM_LOCAL_API_KEY", "local"),
+            "temperature": float(os.getenv("LLM_LOCAL_TEMPERATURE", 0.7)),
+        },
+    },
+    # 各節點使用的模型等級，可用 LLM_TIER_<NODE> 覆寫 (例如 LLM_TIER_CHAT=local)
+    "node_tier": {
+        node: os.getenv(f"LLM_TIER_{node.upper()}", tier)
+        for node, tier in {
+            "intent_router": "small",
+            "intent_shadow": "small",
+            "chat": "small",
+            "collect_preferences": "small",
+            "planning_draft": "large",
+            "merge_draft": "large",
+            "modify_plan": "large",
+            "report_itinerary": "small",
+            "history_summary": "small",
+        }.items()
+    },
+    # 對話狀態 (checkpoint) 儲存: postgres / sqlite / memory
+    "checkpointer": {
+        "backend": os.getenv(
+            "CHECKPOINTER_BACKEND",
+            "postgres" if os.getenv("DATABASE_URL", "").startswith("postgresql") else "sqlite"
+        ),
+        "sqlite_path": os.getenv("CHECKPOINTER_SQLITE_PATH", "checkpoints.db"),
+        "thread_ttl_seconds": int(os.getenv("THREAD_TTL_SECONDS", 7 * 24 * 3600)),
+        "max_threads": int(os.getenv("MAX_THREADS", 10000)),
+        "sweep_interval_seconds": int(os.getenv("THREAD_SWEEP_INTERVAL_SECONDS", 600)),
+    },
+    # 意圖判斷快速路徑: 信心值達門檻時不呼叫 LLM
+    "intent": {
+        "fast_path_threshold": float(os.getenv("INTENT_FAST_PATH_THRESHOLD", 0.85)),
+        "model_path": os.getenv("INTENT_MODEL_PATH", "artifacts/intent_clf.pkl"),
+        "log_path": os.getenv("INTENT_LOG_PATH", os.path.join(log_dir, "intent_samples.jsonl")),
+        "shadow_rate": float(os.getenv("INTENT_SHADOW_RATE", 0.05)),
+        # 需呼叫 LLM 判斷意圖時，同時先產生聊天回覆；意圖不是 chat 則取消且不輸出
+        "speculative_chat": os.getenv("INTENT_SPECULATIVE_CHAT", "false").lower() == "true",
+    },
+    # 對話歷史視窗: 各節點在 token 上限內保留最近幾輪原文，較舊的訊息累積 fold_batch 則後折疊進摘要
+    "history": {
+        "keep_turns": int(os.getenv("HISTORY_KEEP_TURNS", 6)),
+        "fold_batch": int(os.getenv("HISTORY_FOLD_BATCH", 6)),
+        "default_budget": int(os.getenv("HISTORY_TOKEN_BUDGET", 1500)),
+        "token_budget": {
+            "intent_router": int(os.getenv("HISTORY_TOKEN_BUDGET_INTENT_ROUTER", 600)),
+            "chat": int(os.getenv("HISTORY_TOKEN_BUDGET_CHAT", 2000)),
+            "collect_preferences": int(os.getenv("HISTORY_TOKEN_BUDGET_COLLECT_PREFERENCES", 300)),
+        },
+    },
+    # 每輪結束時精簡對話狀態 (checkpoint): 移除已合併的草案、中間訊息，並限制已摘要的歷史訊息數
+    "compaction": {
+        "enabled": os.getenv("STATE_COMPACTION", "true").lower() == "true",
+        "max_messages": int(os.getenv("STATE_MAX_MESSAGES", 40)),
+    },
+    # 回應快取: 記憶體 LRU + 持久層 (sqlite / postgres / memory)
+    "cache": {
+        "backend": os.getenv("CACHE_BACKEND", "sqlite"),
+        "sqlite_path": os.getenv("CACHE_SQLITE_PATH", "cache.db"),
+        "lru_size": int(os.getenv("CACHE_LRU_SIZE", 1024)),
+        "max_entries": int(os.getenv("CACHE_MAX_ENTRIES", 50000)),
+        "llm_ttl_seconds": int(os.getenv("LLM_CACHE_TTL_SECONDS", 24 * 3600)),
+        # 啟用 LLM 快取的節點 (以逗號分隔)
+        "llm_nodes": [n for n in os.getenv("LLM_CACHE_NODES", "intent_router,report_itinerary").split(",") if n],
+    },
+    # LLM 呼叫排程: 全域並行上限、每分鐘 token 預算 (0 為不限制) 與各節點優先等級
+    "llm_scheduler": {
+        "max_concurrency": int(os.getenv("LLM_MAX_CONCURRENCY", 8)),
+        "tokens_per_minute": int(os.getenv("LLM_TOKENS_PER_MINUTE", 200000)),
+        "node_priority": {
+            "intent_router": "interactive",
+            # 快速路徑的抽樣驗證在背景執行，不與使用者請求搶排程
+            "intent_shadow": "draft",
+            "chat": "interactive",
+            "collect_preferences": "preference",
+            "planning_draft": "draft",
+            "merge_draft": "draft",
+            "modify_plan": "draft",
+            "report_itinerary": "report",
+            "history_summary": "report",
+        },
+    },
+    # LLM 呼叫的逾時、重試與對沖 (hedging) 設定
+    "llm_resilience": {
+        "timeout_seconds": float(os.getenv("LLM_TIMEOUT_SECONDS", 60)),
+        "node_timeout_seconds": {
+            "intent_router": float(os.getenv("LLM_TIMEOUT_INTENT_ROUTER", 15)),
+            "chat": float(os.getenv("LLM_TIMEOUT_CHAT", 30)),
+            "collect_preferences": float(os.getenv("LLM_TIMEOUT_COLLECT_PREFERENCES", 30)),
+            "planning_draft": float(os.getenv("LLM_TIMEOUT_PLANNING_DRAFT", 120)),
+            "merge_draft": float(os.getenv("LLM_TIMEOUT_MERGE_DRAFT", 120)),
+        },
+        "max_retries": int(os.getenv("LLM_MAX_RETRIES", 3)),
+        "backoff_seconds": float(os.getenv("LLM_BACKOFF_SECONDS", 1.0)),
+        # 延遲敏感的節點: 超過 p95 延遲仍未回應時再發一次請求，取先回來的結果
+        "hedge_nodes": [n for n in os.getenv("LLM_HEDGE_NODES", "intent_router,chat").split(",") if n],
+        "hedge_quantile": float(os.getenv("LLM_HEDGE_QUANTILE", 95)),
+        "hedge_min_samples": int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20)),
+    },
+    # 錄製/重播 LLM 與 Booking 互動 (off / record / replay)，time_scale 為重播延遲倍率 (0 為不等待)
+    "cassette": {
+        "mode": os.getenv("CASSETTE_MODE", "off"),
+        "path": os.getenv("CASSETTE_PATH", "cassettes/session.jsonl"),
+        "time_scale": float(os.getenv("CASSETTE_TIME_SCALE", 1.0)),
+    },
+    # 行程草案生成策略
+    "planning": {
+        # all: 每個興趣一份草案，不設上限; bounded: 合併相近主題、限制數量與並行度，並設定時限
+        "fanout_policy": os.getenv("PLANNING_FANOUT_POLICY", "bounded"),
+        "max_drafts": int(os.getenv("PLANNING_MAX_DRAFTS", 3)),
+        "max_concurrency": int(os.getenv("PLANNING_MAX_CONCURRENCY", 3)),
+        "draft_deadline_seconds": float(os.getenv("PLANNING_DRAFT_DEADLINE_SECONDS", 45)),
+        # local: 依日期/時段在本地合併草案; llm: 使用 ITINERARY_MERGE_PROMPT
+        "merge_mode": os.getenv("PLANNING_MERGE_MODE", "local"),
+        # 天數達此值時改為先產生大綱、再並行產生每日行程
+        "day_parallel_min_days": int(os.getenv("PLANNING_DAY_PARALLEL_MIN_DAYS", 6)),
+        "day_concurrency": int(os.getenv("PLANNING_DAY_CONCURRENCY", 8)),
+    },
+    # Booking.com (RapidAPI) 住宿查詢
+    "booking": {
+        "base_url": os.getenv("BOOKING_API_BASE", "https://booking-com15.p.rapidapi.com/api/v1"),
+        "host": "booking-com15.p.rapidapi.com",
+        "api_key": os.getenv("X_RAPIDAPI_KEY"),
+        "max_connections": int(os.getenv("BOOKING_MAX_CONNECTIONS", 20)),
+        "max_concurrency": int(os.getenv("BOOKING_MAX_CONCURRENCY", 8)),
+        "timeout_seconds": float(os.getenv("BOOKING_TIMEOUT_SECONDS", 10)),
+        "max_retries": int(os.getenv("BOOKING_MAX_RETRIES", 3)),
+        "backoff_seconds": float(os.getenv("BOOKING_BACKOFF_SECONDS", 0.5)),
+        # 查詢結果快取: 目的地 ID 幾乎不變 (長 TTL)；飯店資訊/價格依日期與人數變動 (短 TTL)
+        "destination_ttl_seconds": int(os.getenv("BOOKING_DESTINATION_TTL_SECONDS", 30 * 24 * 3600)),
+        "hotel_ttl_seconds": int(os.getenv("BOOKING_HOTEL_TTL_SECONDS", 3600)),
+        # 啟動時預先查詢的熱門地區 (以逗號分隔)
+        "popular_areas": [a for a in os.getenv("BOOKING_POPULAR_AREAS", "淺草,銀座,新宿,澀谷,上野,心齋橋,難波,京都車站,祇園,西門町,信義區").split(",") if a],
+        # 住宿候選排序: 只對前 rank_top_k 名查詢 getHotelDetails
+        "rank_top_k": int(os.getenv("BOOKING_RANK_TOP_K", 5)),
+        "rank_distance_km": float(os.getenv("BOOKING_RANK_DISTANCE_KM", 2.0)),
+        "rank_weights": {"price": 0.35, "review_score": 0.3, "review_count": 0.1, "distance": 0.25},
     }
 }
 
@@ -31,11 +197,15 @@ def initlization_llm(llm_type: str="openai"):
     try:
         logger.info(f"Initializing LLM of type: {llm_type}")
         llm_config = config[llm_type]
+        if llm_type == "fake":
+            from fake_llm import CannedChatModel
+            return CannedChatModel(**llm_config)
         llm = init_chat_model(
             model=llm_config["model"],
             model_provider=llm_type,
             temperature=llm_config["temperature"],
-            api_key=llm_config["api_key"]
+            api_key=llm_config["api_key"],
+            max_retries=0,  # 重試由 llm_middleware 統一處理
         )
         logger.info(f"LLM initialized successfully.")
 
@@ -44,4 +214,39 @@ def initlization_llm(llm_type: str="openai"):
         logger.error(f"Failed to initialize LLM of type {llm_type}. Please check your configuration.")
         raise
 
-llm = initlization_llm("openai")
\ No newline at end of file
+llm = initlization_llm(config["llm_provider"])
+
+_tier_models = {}
+
+def llm_for_tier(tier: str):
+    """Chat model of a tier in `config["llm_tiers"]`, created on first use."""
+    if config["llm_provider"] == "fake":
+        return llm
+    if tier not in _tier_models:
+        settings = config["llm_tiers"][tier]
+        logger.info(f"Initializing {tier} tier LLM: {settings['model']} ({settings['base_url'] or 'openai'})")
+        _tier_models[tier] = init_chat_model(
+            model=settings["model"],
+            model_provider="openai",
+            temperature=settings["temperature"],
+            api_key=settings["api_key"],
+            base_url=settings["base_url"],
+            max_retries=0,
+        )
+    return _tier_models[tier]
+
+
+def get_llm(node: str):
+    """
+    Chat model used by a graph node: the shared model behind the managed
+    wrapper (in-flight deduplication, priority scheduling, timeouts, retries
+    and hedging) on the model tier configured for the node, with the
+    response cache if the node opted in.
+    """
+    from llm_middleware import ManagedChatModel
+    from cache import llm_cache_for
+    cache = llm_cache_for(node) if node in config["cache"]["llm_nodes"] else None
+    priority = config["llm_scheduler"]["node_priority"].get(node, "draft")
+    tier = config["node_tier"].get(node)
+    inner = llm_for_tier(tier) if tier in config["llm_tiers"] else llm
+    return ManagedChatModel(inner=inner, node=node, priority=priority, cache=cache)
\ No newline at end of file
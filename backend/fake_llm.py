@@ -0,0 +1,338 @@
+from typing import Any, AsyncIterator, Iterator, List, Optional, Tuple
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from token_estimate import estimate_tokens
+from datetime import date, timedelta
+import asyncio
+import json
+import random
+import re
+import time
+import httpx
+
+
+class FakeAPIError(Exception):
+    """Provider-style HTTP error carrying `status_code` and a response with headers."""
+    def __init__(self, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"Fake provider HTTP {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = httpx.Response(status_code, headers=headers)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Local stand-in for the chat provider, for benchmarks.
+    Latency is log-normal around `latency_seconds` (time to first token)
+    plus `seconds_per_input_token` per prompt token and `seconds_per_token`
+    per output token; with probability
+    `slow_rate` a call takes `slow_factor` times longer, and with probability
+    `error_rate` it fails with HTTP 429 (Retry-After: `retry_after`).
+    """
+    response: str = "好的。"
+    latency_seconds: float = 0.5
+    latency_sigma: float = 0.3
+    slow_rate: float = 0.0
+    slow_factor: float = 10.0
+    error_rate: float = 0.0
+    retry_after: Optional[float] = 0.5
+    seconds_per_token: float = 0.0
+    seconds_per_input_token: float = 0.0
+    chunk_size: int = 4
+    seed: Optional[int] = None
+    calls: int = 0
+
+    def model_post_init(self, __context: Any):
+        self._random = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": "fake", "latency_seconds": self.latency_seconds}
+
+    def _latency(self, messages: List[BaseMessage]) -> float:
+        latency = self._random.lognormvariate(0, self.latency_sigma) * self.latency_seconds
+        if self._random.random() < self.slow_rate:
+            latency *= self.slow_factor
+        return latency + estimate_tokens(messages) * self.seconds_per_input_token
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        return self.response
+
+    def _message(self, messages: List[BaseMessage]) -> AIMessage:
+        text = self._reply(messages)
+        input_tokens = estimate_tokens(messages)
+        output_tokens = estimate_tokens([AIMessage(content=text)])
+        return AIMessage(content=text, usage_metadata={
+            "input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens,
+        })
+
+    def _maybe_fail(self):
+        self.calls += 1
+        if self._random.random() < self.error_rate:
+            raise FakeAPIError(429, self.retry_after)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._maybe_fail()
+        message = self._message(messages)
+        time.sleep(self._latency(messages) + message.usage_metadata["output_tokens"] * self.seconds_per_token)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._maybe_fail()
+        message = self._message(messages)
+        await asyncio.sleep(self._latency(messages) + message.usage_metadata["output_tokens"] * self.seconds_per_token)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        result = self._generate(messages, stop=stop, **kwargs)
+        text = result.generations[0].message.content
+        for i in range(0, len(text), self.chunk_size):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text[i:i + self.chunk_size]))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        # 延遲視為首個 token 前的等待時間
+        self._maybe_fail()
+        await asyncio.sleep(self._latency(messages))
+        text = self._reply(messages)
+        for i in range(0, len(text), self.chunk_size):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text[i:i + self.chunk_size]))
+            await asyncio.sleep(self.seconds_per_token * self.chunk_size)
+
+
+# 依提示詞內容辨識節點，回傳符合各節點輸出格式的固定內容
+_SLOTS = [("上午 (09:00-12:00)", "景點"), ("中午 (12:00-13:30)", "餐廳"), ("下午 (13:30-17:00)", "散策"), ("晚上 (18:00-22:00)", "夜景")]
+_REPR_STR = re.compile(r"(\w+)='([^']*)'")
+_REPR_INT = re.compile(r"(\w+)=(\d+)\b")
+_REPR_DATE = re.compile(r"(\w+)=datetime\.date\((\d+), (\d+), (\d+)\)")
+_JSON_STR = re.compile(r'"(\w+)":\s*"([^"]*)"')
+_JSON_INT = re.compile(r'"(\w+)":\s*(\d+)\b')
+# nodes.itinerary_format.render_itinerary 的表頭欄位
+_TABLE_FIELDS = {"出發地": "departure_location", "目的地": "destination", "人數": "num_peoples", "天數": "duration", "日期": "start_date"}
+_TABLE_VALUE = re.compile(r"(出發地|目的地|人數|天數|日期): ([^|\n~]+)")
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_DAY_REQUEST = re.compile(r"第 (\d+) 天 \(共 (\d+) 天\).*?日期: (\S*)，主題: (.*?)，地點: (.*)$", re.S)
+_MODIFY_WORDS = re.compile(r"改|換|調整|修改|不要|取消|刪")
+_PLAN_WORDS = re.compile(r"行程|規劃|旅遊|旅行|自由行|去|玩|\d+\s*天|[一二三四五六七八九十]+\s*天")
+
+
+def _parse_repr(text: str) -> dict:
+    """
+    First value of each field in pydantic reprs such as `UserPreferences(...)` /
+    `ItineraryPlanning(...)`, in compact JSON or in the itinerary table header.
+    """
+    info = {}
+    for key, value in _REPR_STR.findall(text):
+        info.setdefault(key, value)
+    for key, value in _REPR_INT.findall(text):
+        info.setdefault(key, int(value))
+    for key, y, m, d in _REPR_DATE.findall(text):
+        info.setdefault(key, date(int(y), int(m), int(d)))
+    for key, value in _JSON_STR.findall(text):
+        info.setdefault(key, date.fromisoformat(value) if _ISO_DATE.match(value) else value)
+    for key, value in _JSON_INT.findall(text):
+        info.setdefault(key, int(value))
+    for label, value in _TABLE_VALUE.findall(text):
+        value = value.strip()
+        key = _TABLE_FIELDS[label]
+        if key == "num_peoples":
+            value = int(value) if value.isdigit() else None
+        elif key == "start_date":
+            value = date.fromisoformat(value) if _ISO_DATE.match(value) else None
+        if value:
+            info.setdefault(key, value)
+    return info
+
+
+def _trip(info: dict) -> Tuple[str, str, date, int, int]:
+    from nodes.preference_extractor import parse_duration_days
+    destination = info.get("destination") or "東京"
+    departure = info.get("departure_location") or "台北"
+    start = info.get("departure_date") or info.get("start_date") or date.today() + timedelta(days=30)
+    num_days = parse_duration_days(info.get("duration") or "") or 3
+    return destination, departure, start, num_days, info.get("num_peoples") or 1
+
+
+def _segments(destination: str, departure: str, theme: str, index: int, num_days: int) -> list:
+    segments = []
+    for slot, kind in _SLOTS:
+        name, location = f"{destination}{theme}{kind}{index + 1}", f"{destination}{kind}區{index + 1}"
+        activity_type = "Restaurant" if kind == "餐廳" else "Attraction"
+        if index == 0 and kind == "景點":
+            name, location, activity_type = f"{departure}出發前往{destination}", f"{departure}機場", "Transportation"
+        elif index == num_days - 1 and kind == "夜景" and num_days > 1:
+            name, location, activity_type = f"{destination}返回{departure}", f"{destination}機場", "Transportation"
+        segments.append({"time_slot": slot, "activities": [{
+            "activity_name": name, "type": activity_type, "activity_location": location,
+            "description": f"{theme}主題的{kind}行程。", "estimated_duration": "2 hours", "notes": "",
+        }]})
+    return segments
+
+
+def _itinerary(info: dict, theme: str) -> dict:
+    destination, departure, start, num_days, num_peoples = _trip(info)
+    return {
+        "travel_theme": f"{destination}{theme}之旅",
+        "description": f"{num_days}天的{destination}{theme}行程。",
+        "departure_location": departure,
+        "destination": destination,
+        "num_peoples": num_peoples,
+        "duration": f"{num_days}天{num_days - 1}夜",
+        "start_date": str(start),
+        "end_date": str(start + timedelta(days=num_days - 1)),
+        "features": f"{theme}、在地體驗",
+        "days": [{
+            "daily_theme": f"第{i + 1}天 {theme}探索",
+            "itinerary_location": destination,
+            "day": str(start + timedelta(days=i)),
+            "segments": _segments(destination, departure, theme, i, num_days),
+            "transportation": "以地鐵和步行為主。",
+        } for i in range(num_days)],
+    }
+
+
+def _skeleton(info: dict, theme: str) -> dict:
+    itinerary = _itinerary(info, theme)
+    itinerary["days"] = [{k: d[k] for k in ("day", "daily_theme", "itinerary_location")} for d in itinerary["days"]]
+    return itinerary
+
+
+def _daily(info: dict, user: str, theme: str) -> dict:
+    destination, departure, start, num_days, _ = _trip(info)
+    match = _DAY_REQUEST.search(user)
+    index, num_days = (int(match.group(1)) - 1, int(match.group(2))) if match else (0, num_days)
+    return {
+        "daily_theme": match.group(4) if match else f"{theme}探索",
+        "itinerary_location": (match.group(5).strip() if match else "") or destination,
+        "day": (match.group(3) if match else "") or str(start + timedelta(days=index)),
+        "segments": _segments(destination, departure, theme, index, num_days),
+        "transportation": "以地鐵和步行為主。",
+    }
+
+
+def _patch(user: str) -> dict:
+    targets = user.split("需要修改的天數/時段:\n", 1)[-1].split("\n\n用戶調整要求", 1)[0]
+    try:
+        targets = json.loads(targets)
+    except ValueError:
+        targets = []
+    changes = []
+    for target in targets:
+        segments = target.get("segments") or [{"time_slot": "下午 (13:30-17:00)", "activities": []}]
+        for segment in segments:
+            segment["activities"] = [{
+                "activity_name": f"{target.get('itinerary_location') or ''}替代行程{target['day_index']}",
+                "type": "Attraction", "activity_location": f"替代地點{target['day_index']}",
+                "description": "依需求調整的行程。", "estimated_duration": "2 hours", "notes": "",
+            }]
+        changes.append({"day_index": target["day_index"], "segments": segments, "daily_theme": "", "transportation": ""})
+    return {"changes": changes}
+
+
+def _preferences(text: str, user: str) -> dict:
+    from nodes.preference_extractor import extract_preferences
+    known = _parse_repr(user.split("用戶輸入:", 1)[0])
+    reply = user.split("用戶輸入:", 1)[-1].strip().splitlines()[-1] if "用戶輸入:" in user else user
+    found = {k: v for k, v in extract_preferences(reply).items() if not k.startswith("_")}
+    prefs = {
+        "destination": known.get("destination"),
+        "departure_location": known.get("departure_location"),
+        "num_peoples": known.get("num_peoples") or 1,
+        "departure_date": known.get("departure_date"),
+        "return_date": known.get("return_date"),
+        "duration": known.get("duration"),
+        "interests": [],
+        **found,
+    }
+    for key in ("departure_date", "return_date"):
+        prefs[key] = str(prefs[key]) if prefs[key] else None
+    return {"preferences": prefs, "updated_field": next(iter(found), "")}
+
+
+def _intent(user: str) -> str:
+    if _MODIFY_WORDS.search(user):
+        return "modify_plan"
+    return "plan_trip" if _PLAN_WORDS.search(user) else "chat"
+
+
+def _report(info: dict, text: str) -> str:
+    destination, _, start, num_days, num_peoples = _trip(info)
+    rows = "".join(
+        f'<tr><td colspan="5" style="text-align:center;font-weight:bold;background:#d6eaf8;">Day {i + 1} - {start + timedelta(days=i)}</td></tr>'
+        for i in range(num_days)
+    )
+    intent = re.search(r"用戶意圖: (\w+)", text)
+    intro = "已為您調整新的行程：" if intent and intent.group(1) == "modify_plan" else "已為您生成行程："
+    return (f"{intro}\n```html\n<h2>{destination} {num_days}天 / {num_peoples}人</h2>"
+            f'<table style="width:100%;border-collapse:collapse;"><tr><th>時間</th><th>活動</th><th>地點</th><th>描述</th><th>備註</th></tr>{rows}</table>\n```')
+
+
+class CannedChatModel(FakeChatModel):
+    """
+    Fake provider for the graph (`LLM_PROVIDER=fake`): recognizes which prompt
+    in `prompts.py` it received and answers with schema-valid canned output
+    built from the preferences/itinerary in the prompt.
+    """
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        text = "\n".join(m.content if isinstance(m.content, str) else str(m.content) for m in messages)
+        user = next((m.content for m in reversed(messages) if m.type == "human"), text)
+        user = user if isinstance(user, str) else str(user)
+        if "\nHuman: " in user:
+            # 以 prompt.format() 轉成單一字串的提示詞
+            user = user.rsplit("\nHuman: ", 1)[-1]
+        info = _parse_repr(text)
+        theme = (re.search(r"「(.+?)」", user) or re.search(r"行程主題: (\S+)", user))
+        theme = theme.group(1) if theme else "綜合"
+
+        if "維護旅遊助理與使用者的對話摘要" in text:
+            return "- 使用者與助理閒聊旅遊相關話題"
+        if "修正格式錯誤的 JSON" in text:
+            return json.dumps(_itinerary(info, "修正"), ensure_ascii=False)
+        if "意圖識別助理" in text:
+            return _intent(user)
+        if "目前已知的旅遊偏好" in text:
+            return json.dumps(_preferences(text, user), ensure_ascii=False)
+        if "規劃**行程大綱**" in text:
+            return json.dumps(_skeleton(info, theme), ensure_ascii=False)
+        if "**指定的某一天**" in text:
+            return json.dumps(_daily(info, user, theme), ensure_ascii=False)
+        if "**指定的天數與時段**" in text:
+            return json.dumps(_patch(user), ensure_ascii=False)
+        if "精確且明智的修改" in text:
+            return json.dumps(_itinerary(info, "調整後"), ensure_ascii=False)
+        if "對以下所有行程草案" in text:
+            return json.dumps(_itinerary(info, "精選"), ensure_ascii=False)
+        if "旅遊行程草案" in text:
+            return json.dumps(_itinerary(info, theme), ensure_ascii=False)
+        if "HTML 片段" in text:
+            return _report(info, user)
+        return f"這是測試用的回覆。關於「{user[:20]}」，我可以幫你查詢景點、住宿與交通資訊，也可以直接幫你規劃一趟旅程喔！"
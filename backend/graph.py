@@ -7,23 +7,39 @@ from nodes.preference import multi_turn_collector_node
 from nodes.planner import generate_itinerary_node
 from nodes.modify import modify_itinerary_node
 from nodes.report import report_node
+from nodes.compaction import compact_state_node
+from nodes.intent_classifier import classifier, is_abandon_request
+from metrics import metrics
 from typing import Literal
 import os
 
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["LANGCHAIN_API_KEY"] = "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"
-os.environ["LANGCHAIN_PROJECT"] = "Travel Assistant"
+# LangSmith tracing: 金鑰由環境變數 (或 .env) 提供，未設定時不開啟；壓測時可設 LANGCHAIN_TRACING_V2=false
+os.environ.setdefault("LANGCHAIN_TRACING_V2", "true" if os.getenv("LANGCHAIN_API_KEY") else "false")
+os.environ.setdefault("LANGCHAIN_PROJECT", "Travel Assistant")
 
-def create_graph():
+def _timed(name: str, node):
+    """Record the node's latency as `node.latency.{name}`."""
+    async def run(state: TravelAssistantState):
+        with metrics.timer(f"node.latency.{name}"):
+            return await node(state)
+    return run
+
+def create_graph(checkpointer=None):
     builder = StateGraph(TravelAssistantState)
-    builder.add_node("intent_router", intent_node)
-    builder.add_node("collect_preferences", multi_turn_collector_node)
-    builder.add_node("generate_itinerary", generate_itinerary_node)
-    builder.add_node("modify_plan", modify_itinerary_node)
-    builder.add_node("report_itinerary", report_node)
-    builder.add_node("chat", chat_node)
+    builder.add_node("intent_router", _timed("intent_router", intent_node))
+    builder.add_node("collect_preferences", _timed("collect_preferences", multi_turn_collector_node))
+    builder.add_node("generate_itinerary", _timed("generate_itinerary", generate_itinerary_node))
+    builder.add_node("modify_plan", _timed("modify_plan", modify_itinerary_node))
+    builder.add_node("report_itinerary", _timed("report_itinerary", report_node))
+    builder.add_node("chat", _timed("chat", chat_node))
+    builder.add_node("compact_state", _timed("compact_state", compact_state_node))
 
-    builder.set_entry_point("intent_router")
+    builder.set_conditional_entry_point(_entry_router,
+        {
+            "intent_router": "intent_router",
+            "collect_preferences": "collect_preferences" # 偏好收集中，略過意圖判斷
+        }
+    )
 
     builder.add_conditional_edges("intent_router", 
         _intent_router, 
@@ -40,14 +56,34 @@ def create_graph():
                           x.get("user_preferences")["complete"] else False, 
         {
             True: "generate_itinerary",
-            False: END
+            False: "compact_state"
         }
     )
 
     builder.add_edge("generate_itinerary", "modify_plan")
     builder.add_edge("modify_plan", "report_itinerary")
 
-    return builder.compile(checkpointer=MemorySaver())
+    # 每輪結束前精簡狀態，避免 checkpoint 隨對話增長
+    builder.add_edge("report_itinerary", "compact_state")
+    builder.add_edge("chat", "compact_state")
+    builder.add_edge("compact_state", END)
+
+    return builder.compile(checkpointer=checkpointer or MemorySaver())
+
+def _entry_router(state: TravelAssistantState) -> Literal["intent_router", "collect_preferences"]:
+    if not _prefs_collect_router(state):
+        return "intent_router"
+
+    # 偏好收集中: 除非使用者放棄或明確要修改既有行程，否則直接收集偏好
+    message = state["messages"][-1].content
+    if is_abandon_request(message):
+        return "intent_router"
+    if state.get("planning"):
+        intent, confidence = classifier.predict(message, has_plan=True, collecting=True)
+        if intent == "modify_plan" and confidence >= classifier.threshold:
+            return "intent_router"
+    metrics.incr("intent.skipped_collecting")
+    return "collect_preferences"
 
 def _intent_router(state: TravelAssistantState) -> Literal["chat", "plan_trip", "modify_plan", "collect_preferences"]:
     intent = state.get("intent", "chat")
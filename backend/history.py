@@ -0,0 +1,107 @@
+from config import config, get_llm, logger
+from models import HistorySummary
+from metrics import metrics
+from prompts import HISTORY_SUMMARY_PROMPT
+from llm_scheduler import estimate_tokens
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langgraph.constants import TAG_NOSTREAM
+from typing import List, Optional
+
+llm = get_llm("history_summary")
+
+
+def _budget(node: str) -> int:
+    settings = config["history"]
+    return settings["token_budget"].get(node, settings["default_budget"])
+
+
+def _conversational(messages: List[BaseMessage]) -> List[BaseMessage]:
+    # 只保留使用者與助理的文字訊息；工具呼叫與結果拆開後會造成提示詞格式錯誤
+    return [
+        m for m in messages
+        if m.type in ("human", "ai") and m.content and not getattr(m, "tool_calls", None)
+    ]
+
+
+def _summary_text(summary) -> str:
+    if isinstance(summary, dict):
+        return summary.get("text", "")
+    return summary.text if summary else ""
+
+
+def _pending(messages: List[BaseMessage], summary) -> List[BaseMessage]:
+    """Messages after the last one already folded into the summary."""
+    last_id = summary.get("last_message_id") if isinstance(summary, dict) else getattr(summary, "last_message_id", None)
+    if last_id:
+        for i, message in enumerate(messages):
+            if message.id == last_id:
+                return messages[i + 1:]
+    return list(messages)
+
+
+def window(messages: List[BaseMessage], summary: Optional[HistorySummary], node: str) -> List[BaseMessage]:
+    """
+    Prompt history for `node`: the last `keep_turns` turns that fit the node's
+    token budget, preceded by the rolling summary when older turns were left
+    out. The current user message (the last one) is excluded, since every
+    prompt passes it separately.
+    """
+    candidates = _conversational(messages[:-1])
+    keep = config["history"]["keep_turns"] * 2
+    budget, used, recent = _budget(node), 0, []
+    for message in reversed(candidates[-keep:]):
+        cost = estimate_tokens([message])
+        if used + cost > budget:
+            break
+        recent.append(message)
+        used += cost
+    recent.reverse()
+
+    text = _summary_text(summary)
+    # 已摘要的訊息可能已被 compact_state 移除，有摘要就一併提供
+    if text:
+        recent.insert(0, SystemMessage(content=f"先前對話摘要:\n{text}"))
+        used += estimate_tokens(recent[:1])
+    metrics.observe(f"history.prompt_tokens.{node}", used)
+    return recent
+
+
+def tail(text: str, node: str) -> str:
+    """Most recent lines of an accumulated text history that fit the node's token budget."""
+    budget, used, lines = _budget(node), 0, []
+    for line in reversed((text or "").split("\n")):
+        cost = estimate_tokens([HumanMessage(content=line)])
+        if lines and used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(reversed(lines))
+
+
+async def fold(messages: List[BaseMessage], summary: Optional[HistorySummary]) -> Optional[HistorySummary]:
+    """
+    Fold the turns that have left the history window into the summary once
+    `fold_batch` of them have accumulated. Returns the updated summary, or
+    None when nothing needs folding yet.
+    """
+    settings = config["history"]
+    pending = _pending(messages, summary)
+    older = pending[:-settings["keep_turns"] * 2]
+    turns = _conversational(older)
+    if len(turns) < settings["fold_batch"]:
+        return None
+
+    conversation = "\n".join(f"{'使用者' if m.type == 'human' else '助理'}: {m.content}" for m in turns)
+    try:
+        # 摘要不屬於回覆內容，不送進 messages 串流
+        text = (await (HISTORY_SUMMARY_PROMPT | llm).ainvoke({
+            "summary": _summary_text(summary) or "(無)",
+            "conversation": conversation,
+        }, config={"tags": [TAG_NOSTREAM]})).content.strip()
+    except Exception as e:
+        logger.warning(f"History summary failed, keeping previous summary: {e}")
+        return None
+
+    metrics.incr("history.folds")
+    metrics.incr("history.folded_messages", len(turns))
+    return HistorySummary(text=text, last_message_id=older[-1].id)
@@ -0,0 +1,306 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, List, Optional
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.load import dumps, loads
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from config import config, logger
+from metrics import metrics
+from singleflight import SingleFlight
+from llm_scheduler import scheduler, estimate_tokens
+from cache import llm_cache_key
+from cassette import get_cassette
+import asyncio
+import copy
+import json
+import random
+import time
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_flights = SingleFlight("llm")
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    if getattr(error, "status_code", None) in RETRY_STATUS:
+        return True
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds from the provider's `retry-after-ms` / `retry-after` header, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    base = config["llm_resilience"]["backoff_seconds"]
+    return base * (2 ** attempt) * (0.5 + random.random())
+
+
+class ManagedChatModel(BaseChatModel):
+    """
+    Chat model wrapper used by every graph node (see `config.get_llm`).
+    Identical requests in flight at the same time share one provider call
+    (streamed requests share one stream); every provider call (streamed or not) waits for a slot
+    from the global scheduler in the node's priority class, runs under the
+    node's timeout and is retried on 429/5xx/timeouts. For hedged nodes a
+    second request is sent once the first exceeds the node's p95 latency.
+    """
+    inner: BaseChatModel
+    node: str = ""
+    priority: str = "draft"
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    @property
+    def _identifying_params(self) -> dict:
+        # 與內部模型相同，讓既有的回應快取鍵保持不變
+        return self.inner._identifying_params
+
+    @property
+    def _timeout(self) -> float:
+        settings = config["llm_resilience"]
+        return settings["node_timeout_seconds"].get(self.node, settings["timeout_seconds"])
+
+    def _hedge_delay(self, metric: str) -> Optional[float]:
+        settings = config["llm_resilience"]
+        if self.node not in settings["hedge_nodes"] or metrics.count(metric) < settings["hedge_min_samples"]:
+            return None
+        return metrics.percentile(metric, settings["hedge_quantile"])
+
+    def _flight_key(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict) -> str:
+        params = json.dumps({"stop": stop, **kwargs}, ensure_ascii=False, sort_keys=True, default=str)
+        return llm_cache_key(dumps(messages), f"{sorted(self._identifying_params.items())}{params}")
+
+    async def _with_retries(self, attempt_fn: Callable[[], Awaitable[Any]]):
+        max_retries = config["llm_resilience"]["max_retries"]
+        for attempt in range(max_retries + 1):
+            try:
+                return await attempt_fn()
+            except Exception as e:
+                if attempt == max_retries or not _retryable(e):
+                    metrics.incr(f"llm.{self.node}.failures")
+                    raise
+                delay = _retry_after(e) or _backoff(attempt)
+                metrics.incr(f"llm.{self.node}.retries")
+                logger.warning(f"LLM call for {self.node} failed ({type(e).__name__}), retry in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self.inner._generate(messages, stop=stop, **kwargs)
+
+    def _cassette_request(self, messages: List[BaseMessage]) -> dict:
+        return {
+            "node": self.node,
+            "messages": [{"role": m.type, "content": m.content, "tool_calls": getattr(m, "tool_calls", None)} for m in messages],
+        }
+
+    def _cassette_key(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict) -> str:
+        # 不使用 dumps(messages)：訊息 id 每次執行都不同，只比對角色與內容
+        params = json.dumps({"stop": stop, **kwargs}, ensure_ascii=False, sort_keys=True, default=str)
+        request = json.dumps(self._cassette_request(messages), ensure_ascii=False, sort_keys=True, default=str)
+        return llm_cache_key(request, f"{sorted(self._identifying_params.items())}{params}")
+
+    async def _call_once(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict) -> ChatResult:
+        cassette = get_cassette()
+        async with scheduler.slot(self.priority, estimate_tokens(messages)) as usage:
+            start = time.perf_counter()
+            if cassette and cassette.replaying:
+                response = await cassette.replay("llm", self._cassette_key(messages, stop, kwargs))
+                return ChatResult(generations=loads(response["generations"]), llm_output=response["llm_output"])
+
+            result = await asyncio.wait_for(self.inner._agenerate(messages, stop=stop, **kwargs), self._timeout)
+            latency = time.perf_counter() - start
+            metrics.observe(f"llm.latency.{self.node}", latency)
+            usage["total_tokens"] = ((result.llm_output or {}).get("token_usage") or {}).get("total_tokens")
+            if cassette and cassette.recording:
+                cassette.record(
+                    "llm", self._cassette_key(messages, stop, kwargs), self._cassette_request(messages),
+                    {"generations": dumps(result.generations), "llm_output": result.llm_output}, latency,
+                )
+            return result
+
+    async def _hedged_call(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict) -> ChatResult:
+        delay = self._hedge_delay(f"llm.latency.{self.node}")
+        tasks = [asyncio.ensure_future(self._call_once(messages, stop, kwargs))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                metrics.incr(f"llm.{self.node}.hedged")
+                tasks.append(asyncio.ensure_future(self._call_once(messages, stop, kwargs)))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1 and task is tasks[1]:
+                            metrics.incr(f"llm.{self.node}.hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        async def call():
+            return await self._with_retries(lambda: self._hedged_call(messages, stop, kwargs))
+
+        result, shared = await _flights.do(self._flight_key(messages, stop, kwargs), call)
+        if shared:
+            # 複製一份並清除 id，避免不同 run 共用同一個訊息物件
+            result = copy.deepcopy(result)
+            for generation in result.generations:
+                generation.message.id = None
+        return result
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        yield from self.inner._stream(messages, stop=stop, **kwargs)
+
+    async def _replay_stream(self, cassette, key: str) -> AsyncIterator[ChatGenerationChunk]:
+        start = time.perf_counter()
+        for offset, message in cassette.next("llm_stream", key)["response"]:
+            await asyncio.sleep(max(0.0, cassette.delay(offset) - (time.perf_counter() - start)))
+            yield ChatGenerationChunk(message=loads(message))
+
+    async def _stream_once(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict) -> AsyncIterator[ChatGenerationChunk]:
+        cassette = get_cassette()
+        async with scheduler.slot(self.priority, estimate_tokens(messages)) as usage:
+            if cassette and cassette.replaying:
+                async for chunk in self._replay_stream(cassette, self._cassette_key(messages, stop, kwargs)):
+                    yield chunk
+                return
+
+            start = time.perf_counter()
+            recorded = []
+            stream = self.inner._astream(messages, stop=stop, **kwargs)
+            try:
+                first = True
+                while True:
+                    # 逾時套用在每個 chunk 之間的等待時間
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), self._timeout)
+                    except StopAsyncIteration:
+                        break
+                    if first:
+                        metrics.observe(f"llm.ttft.{self.node}", time.perf_counter() - start)
+                        first = False
+                    if chunk.message.usage_metadata:
+                        usage["total_tokens"] = chunk.message.usage_metadata.get("total_tokens")
+                    # 記錄整個 chunk (含 tool_call_chunks 等)，不只文字內容
+                    recorded.append((round(time.perf_counter() - start, 4), dumps(chunk.message)))
+                    yield chunk
+                if cassette and cassette.recording:
+                    cassette.record(
+                        "llm_stream", self._cassette_key(messages, stop, kwargs), self._cassette_request(messages),
+                        recorded, time.perf_counter() - start,
+                    )
+            finally:
+                await stream.aclose()
+
+    async def _hedged_stream(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict) -> AsyncIterator[ChatGenerationChunk]:
+        """Race streams on their first chunk; the first stream to produce one is continued."""
+        delay = self._hedge_delay(f"llm.ttft.{self.node}")
+        streams = [self._stream_once(messages, stop, kwargs)]
+        tasks = {asyncio.ensure_future(streams[0].__anext__()): streams[0]}
+        winner, first = None, None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                metrics.incr(f"llm.{self.node}.hedged")
+                streams.append(self._stream_once(messages, stop, kwargs))
+                tasks[asyncio.ensure_future(streams[1].__anext__())] = streams[1]
+            error = None
+            while winner is None and tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stream = tasks.pop(task)
+                    if winner is not None:
+                        continue
+                    if task.exception() is None or isinstance(task.exception(), StopAsyncIteration):
+                        winner = stream
+                        first = task.result() if task.exception() is None else None
+                        if stream is not streams[0]:
+                            metrics.incr(f"llm.{self.node}.hedge_wins")
+                    else:
+                        error = task.exception()
+            if winner is None:
+                raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for stream in streams:
+                if stream is not winner:
+                    await stream.aclose()
+
+        if first is None:
+            return
+        yield first
+        async for chunk in winner:
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        # graph 以 messages 模式串流時所有呼叫都走這裡，同樣合併相同的進行中請求
+        key = self._flight_key(messages, stop, kwargs)
+        async for chunk, shared in _flights.stream(key, lambda: self._stream_with_retries(messages, stop, kwargs)):
+            if shared:
+                # 複製一份並清除 id，避免不同 run 共用同一個訊息物件
+                chunk = copy.deepcopy(chunk)
+                chunk.message.id = None
+            yield chunk
+
+    async def _stream_with_retries(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict) -> AsyncIterator[ChatGenerationChunk]:
+        max_retries = config["llm_resilience"]["max_retries"]
+        for attempt in range(max_retries + 1):
+            started = False
+            try:
+                async for chunk in self._hedged_stream(messages, stop, kwargs):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                # 已輸出部分內容時無法重試
+                if started or attempt == max_retries or not _retryable(e):
+                    metrics.incr(f"llm.{self.node}.failures")
+                    raise
+                delay = _retry_after(e) or _backoff(attempt)
+                metrics.incr(f"llm.{self.node}.retries")
+                logger.warning(f"LLM stream for {self.node} failed ({type(e).__name__}), retry in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def get_num_tokens_from_messages(self, messages: List[BaseMessage], tools=None) -> int:
+        return self.inner.get_num_tokens_from_messages(messages)
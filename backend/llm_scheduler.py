@@ -0,0 +1,109 @@
+from contextlib import asynccontextmanager
+from config import config
+from token_estimate import estimate_tokens
+from metrics import metrics
+import asyncio
+import heapq
+import itertools
+import time
+
+# 優先順序: 數字越小越先執行
+PRIORITY_CLASSES = {"interactive": 0, "preference": 1, "draft": 2, "report": 3}
+
+
+class LLMScheduler:
+    """
+    Global admission control in front of the chat model: at most
+    `max_concurrency` provider calls at once, a token-per-minute bucket, and
+    strict priority between classes (FIFO within a class).
+    Queue depth (`llm_scheduler.queued.{class}`) and wait time
+    (`llm_scheduler.wait.{class}`) are reported per class.
+    """
+    def __init__(self, max_concurrency: int, tokens_per_minute: int = 0):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._running = 0
+        self._queue = []
+        self._seq = itertools.count()
+        self._timer = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.tokens_per_minute, self._tokens + (now - self._refilled_at) * self.tokens_per_minute / 60)
+        self._refilled_at = now
+
+    def _cost(self, tokens: int) -> int:
+        return min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+
+    def _dispatch(self):
+        self._timer = None
+        while self._queue and self._running < self.max_concurrency:
+            _, _, future, cost = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)  # 已取消
+                continue
+            if cost:
+                self._refill()
+                if self._tokens < cost:
+                    # 等 token 補足後再放行，避免低優先的請求插隊
+                    delay = (cost - self._tokens) * 60 / self.tokens_per_minute
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                    return
+                self._tokens -= cost
+            heapq.heappop(self._queue)
+            self._running += 1
+            future.set_result(None)
+
+    async def acquire(self, priority: str, tokens: int):
+        cls = priority if priority in PRIORITY_CLASSES else "draft"
+        cost = self._cost(tokens)
+        start = time.perf_counter()
+        if not self._queue and self._running < self.max_concurrency:
+            self._refill()
+            if self._tokens >= cost:
+                self._tokens -= cost
+                self._running += 1
+                metrics.observe(f"llm_scheduler.wait.{cls}", 0.0)
+                return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (PRIORITY_CLASSES[cls], next(self._seq), future, cost))
+        metrics.incr(f"llm_scheduler.queued.{cls}")
+        try:
+            if self._timer is None:
+                self._dispatch()
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # 已放行但呼叫者被取消
+            else:
+                future.cancel()
+            raise
+        finally:
+            metrics.incr(f"llm_scheduler.queued.{cls}", -1)
+        metrics.observe(f"llm_scheduler.wait.{cls}", time.perf_counter() - start)
+
+    def release(self, estimated: int = 0, actual: int = None):
+        """Free a slot; with `actual` token usage, correct the bucket for the estimate."""
+        self._running -= 1
+        if self.tokens_per_minute and actual is not None:
+            self._tokens -= actual - self._cost(estimated)
+        if self._timer is None:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: str, tokens: int = 0):
+        await self.acquire(priority, tokens)
+        usage = {"total_tokens": None}
+        try:
+            yield usage
+        finally:
+            self.release(tokens, usage["total_tokens"])
+
+    def queued(self) -> int:
+        return sum(1 for item in self._queue if not item[2].done())
+
+
+scheduler = LLMScheduler(config["llm_scheduler"]["max_concurrency"], config["llm_scheduler"]["tokens_per_minute"])
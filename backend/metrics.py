@@ -0,0 +1,71 @@
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import time
+
+
+class Metrics:
+    """
+    In-process counters and latency samples, exposed by `GET /api/travel/metrics`.
+    Timings keep the most recent `window` samples per name.
+    """
+    def __init__(self, window: int = 2000):
+        self._window = window
+        self._counters = defaultdict(float)
+        self._timings = defaultdict(lambda: deque(maxlen=self._window))
+        self._ratios = {}
+
+    def incr(self, name: str, value: float = 1):
+        self._counters[name] += value
+
+    def counter(self, name: str) -> float:
+        return self._counters.get(name, 0)
+
+    def observe(self, name: str, value: float):
+        self._timings[name].append(value)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def count(self, name: str) -> int:
+        return len(self._timings.get(name, ()))
+
+    def percentile(self, name: str, q: float) -> float:
+        samples = sorted(self._timings.get(name, ()))
+        if not samples:
+            return 0.0
+        idx = min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))
+        return samples[idx]
+
+    def register_ratio(self, name: str, numerator: str, denominator: str):
+        """Report `numerator / denominator` as `name` in the snapshot."""
+        self._ratios[name] = (numerator, denominator)
+
+    def snapshot(self) -> dict:
+        ratios = {}
+        for name, (num, den) in self._ratios.items():
+            total = self.counter(den)
+            ratios[name] = round(self.counter(num) / total, 4) if total else None
+
+        timings = {}
+        for name, samples in self._timings.items():
+            if samples:
+                timings[name] = {
+                    "count": len(samples),
+                    "p50": round(self.percentile(name, 50), 4),
+                    "p95": round(self.percentile(name, 95), 4),
+                    "max": round(max(samples), 4),
+                }
+
+        return {"counters": dict(self._counters), "ratios": ratios, "timings": timings}
+
+    def reset(self):
+        self._counters.clear()
+        self._timings.clear()
+
+
+metrics = Metrics()
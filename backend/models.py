@@ -18,6 +18,10 @@ class UserPreferencesState(BaseModel):
     preference_history: Optional[str] = Field("", description="User input history (Preference collection phase).")
     complete: bool = Field(False, description="Preferences are complete/no missing")
 
+class HistorySummary(BaseModel):
+    text: str = Field("", description="Rolling summary of the conversation turns outside the history window.")
+    last_message_id: Optional[str] = Field(None, description="ID of the last message folded into the summary.")
+
 class CollectPreference(BaseModel):
     preferences: UserPreferences
     updated_field: str = Field(description="Updated field")
@@ -78,6 +82,38 @@ class ItineraryPlanning(BaseModel):
     class Config:
         orm_mode = True
 
+class DaySkeleton(BaseModel):
+    """Outline of a single day, generated before the detailed daily itinerary."""
+    day: Optional[date] = Field(None, description="The specific date for this day, format: YYYY-MM-DD.")
+    daily_theme: Optional[str] = Field("", description="A concise summary of the day's core activities or experience theme.")
+    itinerary_location: Optional[str] = Field("", description="The city, region, or main location of the day's activities.")
+
+class ItinerarySkeleton(BaseModel):
+    """
+    Lightweight trip outline (overall summary and one line per day), expanded day by day for long trips.
+    """
+    travel_theme: Optional[str] = Field("",description="Travel theme (e.g., 'Kenting Sunny Beaches Chill Out' or 'Kyoto Ancient City Cultural Deep Dive').")
+    description: Optional[str] = Field("",description="Trip plan description.")
+    departure_location: Optional[str] = Field("",description="Travel departure point.")
+    destination: Optional[str] = Field("",description="Country/City/Region (e.g., Japan Tokyo -> Sapporo -> Hokkaido).")
+    num_peoples: Optional[int] = Field(1, description="Number of Travelers.", ge=1)
+    duration: Optional[str] = Field("", description="Travel duration in a string format, e.g., 'n 天 n-1 夜'")
+    start_date: Optional[date] = Field(None, description="Start date of the trip (YYYY-MM-DD format)")
+    end_date: Optional[date] = Field(None, description="End date of the trip (YYYY-MM-DD format)")
+    features: Optional[str] = Field("",description="Summarize the most appealing aspects of the trip in one sentence or a few keywords.")
+    days: List[DaySkeleton] = Field(default_factory=list, description="One outline entry per day of the trip, in order.")
+
+class DayPatch(BaseModel):
+    """Replacement content for one targeted day of the current itinerary."""
+    day_index: int = Field(description="1-based index of the modified day in the itinerary.")
+    segments: List[TimeSegment] = Field(default_factory=list, description="Replacement time segments for the targeted part of the day.")
+    daily_theme: Optional[str] = Field("", description="Updated daily theme, empty if unchanged.")
+    transportation: Optional[str] = Field("", description="Updated transportation suggestion, empty if unchanged.")
+
+class ItineraryPatch(BaseModel):
+    """Changes to apply to the targeted days only."""
+    changes: List[DayPatch] = Field(default_factory=list, description="One entry per modified day.")
+
 class PlanningState(BaseModel):
     """
     Represents the state of the planning process in the graph.
@@ -93,11 +129,13 @@ class AccommodationSearchInput(BaseModel):
     """
     num_peoples: int = Field(1, description="Number of Travelers.", ge=1)
     itinerary: Optional[ItineraryPlanning] = Field(default=None, description="Used for searching accommodation, based on the last activity's address of each daily itinerary.")
+    budget_per_night: Optional[float] = Field(default=None, description="Accommodation budget per night in TWD, if the user mentioned one.", gt=0)
 
 class TravelAssistantState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
     planning: Optional[PlanningState]
     user_preferences: Optional[UserPreferencesState]
+    history_summary: Optional[HistorySummary]
     intent: Optional[str] = Literal["chat", "plan_trip", "find_hotel", "modify_plan"]
 
 ### API Request/Respose Models
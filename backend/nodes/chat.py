@@ -1,12 +1,103 @@
-from config import llm
+from config import get_llm, logger
 from models import TravelAssistantState
 from prompts import CHAT_PROMPT
+from metrics import metrics
+from llm_scheduler import estimate_tokens
+from history import window, fold
+from langchain_core.messages import HumanMessage, message_chunk_to_message
+from langgraph.config import get_config
+import asyncio
+import time
+
+llm = get_llm("chat")
+
+# 推測執行的聊天回覆會帶此 tag，服務層據此暫存 token，確認意圖為 chat 後才送出
+SPECULATIVE_TAG = "speculative_chat"
+_speculations = {}
+
+metrics.register_ratio("chat.speculative.hit_rate", "chat.speculative.used", "chat.speculative.started")
+
+
+def _prompt(state: TravelAssistantState) -> str:
+    return CHAT_PROMPT.format(
+        history=window(state['messages'], state.get('history_summary'), "chat"),
+        message=state['messages'][-1].content
+    )
+
+
+def _thread_id() -> str:
+    return get_config()["configurable"].get("thread_id", "")
+
+
+class SpeculativeChat:
+    """
+    Chat reply generated while `intent_node` is still waiting for the LLM.
+    Its tokens are streamed under `SPECULATIVE_TAG`; `chat_node` reuses the
+    reply when the intent is chat, otherwise it is cancelled and the prompt
+    plus the tokens generated so far are counted as wasted.
+    """
+    def __init__(self, state: TravelAssistantState):
+        self.prompt = _prompt(state)
+        self.content = ""
+        self.started = time.perf_counter()
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        reply = None
+        async for chunk in llm.astream(self.prompt, config={"tags": [SPECULATIVE_TAG]}):
+            self.content += chunk.content
+            reply = chunk if reply is None else reply + chunk
+        return reply
+
+    def cancel(self):
+        self.task.cancel()
+        metrics.incr("chat.speculative.cancelled")
+        wasted = estimate_tokens([HumanMessage(content=self.prompt)])
+        if self.content:
+            wasted += estimate_tokens([HumanMessage(content=self.content)])
+        metrics.incr("chat.speculative.wasted_tokens", wasted)
+
+
+def start_speculative_chat(state: TravelAssistantState) -> SpeculativeChat:
+    thread_id = _thread_id()
+    previous = _speculations.pop(thread_id, None)
+    if previous:
+        previous.cancel()
+    metrics.incr("chat.speculative.started")
+    speculation = _speculations[thread_id] = SpeculativeChat(state)
+    return speculation
+
+
+def discard_speculative_chat(speculation: SpeculativeChat):
+    if _speculations.get(_thread_id()) is speculation:
+        _speculations.pop(_thread_id())
+    speculation.cancel()
+
+
+async def _reply(state: TravelAssistantState):
+    prompt = _prompt(state)
+    speculation = _speculations.pop(_thread_id(), None)
+    if speculation and speculation.prompt != prompt:
+        # 前一輪遺留的推測回覆 (例如該輪被中斷)，不是這一輪的回答
+        speculation.cancel()
+        speculation = None
+    if speculation:
+        metrics.observe("chat.speculative.head_start", time.perf_counter() - speculation.started)
+        try:
+            reply = await speculation.task
+            metrics.incr("chat.speculative.used")
+            # 保留串流時的 message id，避免 messages 串流重複送出整段回覆
+            return message_chunk_to_message(reply)
+        except Exception as e:
+            logger.warning(f"Speculative chat failed, generating again: {e}")
+
+    return await llm.ainvoke(prompt)
 
 
 async def chat_node(state: TravelAssistantState):
-    return {'messages': [await llm.ainvoke(
-        CHAT_PROMPT.format(
-            history=state['messages'],
-            message=state['messages'][-1].content
-        )
-    )]}
\ No newline at end of file
+    update = {'messages': [await _reply(state)]}
+    # 回覆已串流給使用者後才更新對話摘要
+    summary = await fold(state['messages'], state.get('history_summary'))
+    if summary:
+        update['history_summary'] = summary
+    return update
@@ -0,0 +1,101 @@
+from langchain_core.messages import AIMessage, BaseMessage, BaseMessageChunk, HumanMessage, RemoveMessage
+from langchain_core.messages.utils import message_chunk_to_message
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.config import get_config
+from models import TravelAssistantState
+from history import fold
+from metrics import metrics
+from config import config, logger
+from typing import List, Optional
+
+# 與 checkpointer 相同的序列化方式，用來估算每個 thread 的 checkpoint 大小
+_serde = JsonPlusSerializer()
+
+
+def _boundary_id(summary) -> Optional[str]:
+    # history.fold 以這則訊息判斷摘要涵蓋到哪裡，不能移除
+    return summary.get("last_message_id") if isinstance(summary, dict) else getattr(summary, "last_message_id", None)
+
+
+def _intermediate(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Tool calls/results, and AI messages of a turn before its final reply (e.g. "即將完成行程規劃。")."""
+    drop, turn = [], []
+    for message in messages + [HumanMessage(content="")]:
+        if message.type == "human":
+            replies = [m for m in turn if m.type == "ai"]
+            earlier = {id(m) for m in replies[:-1]}
+            drop.extend(m for m in turn if m.type == "tool" or getattr(m, "tool_calls", None) or id(m) in earlier)
+            turn = []
+        else:
+            turn.append(message)
+    return drop
+
+
+def _slim(message: BaseMessage) -> Optional[BaseMessage]:
+    """Plain message without streaming/provider metadata, or None when already slim."""
+    slim = message_chunk_to_message(message) if isinstance(message, BaseMessageChunk) else message
+    if isinstance(slim, AIMessage) and (slim.response_metadata or slim.usage_metadata):
+        slim = slim.model_copy(update={"response_metadata": {}, "usage_metadata": None})
+    return slim if slim is not message else None
+
+
+def state_size(values: dict) -> int:
+    """Serialized size of the state channels in bytes."""
+    return sum(len(_serde.dumps_typed(v)[1]) for v in values.values() if v is not None)
+
+
+async def compact_state_node(state: TravelAssistantState):
+    """
+    Runs at the end of every turn so the checkpoint does not grow with the
+    session: drops drafts already merged into current_itinerary, collapses
+    streamed chunks and strips provider metadata, removes tool and other
+    intermediate messages, and caps the messages already folded into the
+    history summary at `max_messages` (folding them first when the chat node
+    has not, e.g. in sessions of planning and modify turns only).
+    """
+    settings = config["compaction"]
+    update = {}
+    messages = list(state["messages"])
+    planning = state.get("planning")
+
+    if settings["enabled"]:
+        if planning and planning.planning_options and getattr(planning.current_itinerary, "days", None):
+            update["planning"] = planning.model_copy(update={"planning_options": []})
+            metrics.incr("state.compaction.drafts_dropped", len(planning.planning_options))
+
+        summary = state.get("history_summary")
+        boundary = _boundary_id(summary)
+        removed = {m.id for m in _intermediate(messages) if m.id != boundary}
+        kept = [m for m in messages if m.id not in removed]
+
+        if len(kept) > settings["max_messages"]:
+            # 摘要只在 chat 節點更新；超過上限時在此折疊，才能移除較舊的訊息
+            folded_summary = await fold(kept, summary)
+            if folded_summary:
+                update["history_summary"] = folded_summary
+                boundary = folded_summary.last_message_id
+
+        # 已折疊進摘要 (boundary 之前) 的訊息才移除，摘要仍涵蓋其內容
+        folded = next((i for i, m in enumerate(kept) if m.id == boundary), 0)
+        excess = min(folded, len(kept) - settings["max_messages"])
+        if excess > 0:
+            removed.update(m.id for m in kept[:excess])
+            kept = kept[excess:]
+
+        slimmed = [m for m in map(_slim, kept) if m is not None]
+        if removed or slimmed:
+            update["messages"] = [RemoveMessage(id=i) for i in removed] + slimmed
+            metrics.incr("state.compaction.messages_removed", len(removed))
+            metrics.incr("state.compaction.messages_slimmed", len(slimmed))
+        slim_ids = {m.id: m for m in slimmed}
+        messages = [slim_ids.get(m.id, m) for m in kept]
+
+    size = state_size({
+        **state,
+        **update,
+        "messages": messages,
+    })
+    metrics.observe("state.size_bytes", size)
+    metrics.observe("state.messages", len(messages))
+    logger.debug(f"State of thread {get_config()['configurable'].get('thread_id')}: {size} bytes, {len(messages)} messages.")
+    return update
@@ -0,0 +1,74 @@
+from typing import List, Optional, Tuple
+from config import config
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def _column(hotels: List[dict], *path) -> np.ndarray:
+    values = []
+    for hotel in hotels:
+        value = hotel.get("property", hotel)
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        try:
+            values.append(float(value))
+        except (TypeError, ValueError):
+            values.append(np.nan)
+    return np.array(values, dtype=float)
+
+
+def haversine_km(lat: np.ndarray, lon: np.ndarray, anchor: Tuple[float, float]) -> np.ndarray:
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(anchor[0]), np.radians(anchor[1])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def score_hotels(
+    hotels: List[dict],
+    nights: int = 1,
+    budget_per_night: Optional[float] = None,
+    anchor: Optional[Tuple[float, float]] = None,
+    weights: dict = None,
+) -> np.ndarray:
+    """
+    Score searchHotels candidates in [0, 1] on price vs. budget, review score,
+    review count and distance to `anchor` (lat, lon), computed over all
+    candidates at once. Missing values score a neutral 0.5.
+    """
+    weights = weights or config["booking"]["rank_weights"]
+    price = _column(hotels, "priceBreakdown", "grossPrice", "value") / max(nights, 1)
+    review_score = _column(hotels, "reviewScore")
+    review_count = _column(hotels, "reviewCount")
+
+    if budget_per_night:
+        # 預算內越便宜越好；超出預算依超出比例扣分
+        over = np.clip((price - budget_per_night) / budget_per_night, 0, None)
+        price_score = np.where(over > 0, np.clip(0.7 - over, 0, 0.7), 1 - 0.3 * price / budget_per_night)
+    else:
+        low, high = np.nanmin(price, initial=np.inf), np.nanmax(price, initial=-np.inf)
+        price_score = 1 - (price - low) / (high - low) if high > low else np.ones_like(price)
+
+    review_score = review_score / 10
+    review_count = np.log1p(review_count) / np.log1p(np.nanmax(review_count, initial=0) or 1)
+
+    if anchor:
+        distance = haversine_km(_column(hotels, "latitude"), _column(hotels, "longitude"), anchor)
+        distance_score = np.exp(-distance / config["booking"]["rank_distance_km"])
+    else:
+        distance_score = np.full(len(hotels), np.nan)
+
+    features = np.vstack([price_score, review_score, review_count, distance_score])
+    features = np.nan_to_num(np.clip(features, 0, 1), nan=0.5)
+    w = np.array([weights["price"], weights["review_score"], weights["review_count"], weights["distance"]], dtype=float)
+    return w @ features / w.sum()
+
+
+def top_k_hotels(hotels: List[dict], k: int = None, **kwargs) -> List[dict]:
+    """The `k` best candidates, best first."""
+    if not hotels:
+        return []
+    k = k or config["booking"]["rank_top_k"]
+    scores = score_hotels(hotels, **kwargs)
+    return [hotels[i] for i in np.argsort(-scores, kind="stable")[:k]]
@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+from config import config, logger
+from metrics import metrics
+from typing import List, Optional, Tuple
+import json
+import os
+import pickle
+import re
+
+INTENTS = ("chat", "plan_trip", "modify_plan")
+
+# 訓練樣本由單一背景執行緒依序寫入，不阻塞請求
+_sample_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="intent-samples")
+
+_NUM = r"(?:\d+|[一二兩三四五六七八九十]+)"
+
+# (intent, pattern, confidence)
+_RULES = [
+    # 打招呼、道謝、簡短回覆
+    ("chat", re.compile(
+        r"^\s*(hi|hello|hey|嗨|哈囉|你好|您好|謝謝|謝啦|感謝|thanks?|thank you|ok|okay|好|好的|好喔|嗯|了解|掰掰|再見|bye)"
+        r"[\s!！。.~～?？]*$", re.I), 0.97),
+    # 修改既有行程
+    ("modify_plan", re.compile(
+        r"(改|換|調整|修改|更換|替換|刪除|刪掉|移除|拿掉|加入|新增|增加|延後|提前)"
+        r".{0,12}(行程|第\s*" + _NUM + r"\s*天|景點|住宿|飯店|旅館|餐廳|早餐|午餐|晚餐|活動|時段|上午|下午|晚上)"
+        r"|(第\s*" + _NUM + r"\s*天|day\s*\d+).{0,12}(改|換|調整|不要|刪|加)", re.I), 0.92),
+    # 建立新行程
+    ("plan_trip", re.compile(
+        r"(規劃|安排|計畫|計劃|排).{0,8}(行程|旅遊|旅行|自由行)"
+        r"|(想去|要去|打算去|帶.{0,4}去).{0,12}(玩|旅遊|旅行|度假)"
+        r"|" + _NUM + r"\s*天\s*" + _NUM + r"\s*夜.{0,6}(行程|旅遊|旅行|自由行)"
+        r"|plan (a|my) trip", re.I), 0.9),
+]
+
+# 偏好收集中的簡答 (日期、天數、人數)，交給偏好收集流程處理
+_PREFERENCE_ANSWER = re.compile(
+    r"^\s*(\d{4}[-/.年]\d{1,2}[-/.月]\d{1,2}日?|\d{1,2}[/月]\d{1,2}日?|"
+    + _NUM + r"\s*(天|日)\s*(" + _NUM + r"\s*夜)?|" + _NUM + r"\s*(個)?人)\s*$"
+)
+
+# 使用者放棄偏好收集流程
+_ABANDON = re.compile(
+    r"(不用了|不要了|算了|先不要|不想(去|規劃|排)了|取消(規劃|行程|旅遊)?|停止|重新開始|換個話題|"
+    r"\b(cancel|stop|never ?mind|forget it)\b)", re.I)
+
+
+class IntentClassifier:
+    """
+    Local intent classifier placed in front of the INTENT_PROMPT call.
+    Keyword rules run first; an optional TF-IDF + linear model (trained from
+    the messages labelled by the LLM fallback) handles the rest.
+    """
+    def __init__(self, model_path: str = None, threshold: float = None):
+        self.threshold = threshold if threshold is not None else config["intent"]["fast_path_threshold"]
+        self._model = None
+        model_path = model_path or config["intent"]["model_path"]
+        if model_path and os.path.exists(model_path):
+            try:
+                with open(model_path, "rb") as f:
+                    self._model = pickle.load(f)
+                logger.info(f"Intent model loaded from {model_path}")
+            except Exception as e:
+                logger.warning(f"Failed to load intent model {model_path}: {e}")
+
+    def predict(self, message: str, has_plan: bool = False, collecting: bool = False) -> Tuple[Optional[str], float]:
+        """Return (intent, confidence); intent is None when nothing matched."""
+        text = (message or "").strip()
+        if not text:
+            return "chat", 1.0
+
+        if _PREFERENCE_ANSWER.match(text):
+            return "chat", 0.95 if collecting else 0.6
+
+        for intent, pattern, confidence in _RULES:
+            if pattern.search(text):
+                if intent == "modify_plan" and not has_plan:
+                    confidence = 0.5  # 尚無行程時，「修改」多半是新規劃的一部分
+                return intent, confidence
+
+        if self._model is not None:
+            proba = self._model.predict_proba([text])[0]
+            best = proba.argmax()
+            return self._model.classes_[best], float(proba[best])
+
+        return None, 0.0
+
+
+def is_abandon_request(message: str) -> bool:
+    """Whether the user wants to leave the preference collection flow."""
+    return bool(_ABANDON.search(message or ""))
+
+
+def normalize_intent(raw: str) -> str:
+    """Map the free-text LLM answer to one of INTENTS."""
+    for intent in ("modify_plan", "plan_trip", "chat"):
+        if intent in (raw or ""):
+            return intent
+    return "chat"
+
+
+def _append_sample(path: str, message: str, intent: str):
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"message": message, "intent": intent}, ensure_ascii=False) + "\n")
+    except OSError as e:
+        logger.warning(f"Failed to log intent sample: {e}")
+
+
+def log_labelled_sample(message: str, intent: str):
+    """Queue an LLM-labelled message for appending to the training log (written in a background thread)."""
+    _sample_writer.submit(_append_sample, config["intent"]["log_path"], message, intent)
+
+
+def train_intent_model(samples: List[Tuple[str, str]], model_path: str = None):
+    """Train the TF-IDF + logistic regression model (requires scikit-learn)."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+
+    texts, labels = zip(*samples)
+    model = make_pipeline(
+        TfidfVectorizer(analyzer="char_wb", ngram_range=(1, 3), min_df=1),
+        LogisticRegression(max_iter=1000, class_weight="balanced"),
+    )
+    model.fit(texts, labels)
+
+    model_path = model_path or config["intent"]["model_path"]
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    with open(model_path, "wb") as f:
+        pickle.dump(model, f)
+    logger.info(f"Intent model trained on {len(texts)} samples -> {model_path}")
+    return model
+
+
+metrics.register_ratio("intent.fast_path.hit_rate", "intent.fast_path.hits", "intent.requests")
+metrics.register_ratio("intent.fast_path.accuracy", "intent.shadow.agree", "intent.shadow.total")
+metrics.register_ratio("intent.below_threshold.accuracy", "intent.below_threshold.agree", "intent.below_threshold.total")
+
+classifier = IntentClassifier()
+
+
+# Train from logged samples: python -m nodes.intent_classifier
+if __name__ == "__main__":
+    with open(config["intent"]["log_path"], encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    train_intent_model([(r["message"], r["intent"]) for r in rows])
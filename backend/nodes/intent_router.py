@@ -1,20 +1,83 @@
-from config import llm
+from config import get_llm
 from prompts import INTENT_PROMPT
 from models import TravelAssistantState
-from config import logger
+from config import config, logger
+from metrics import metrics
+from nodes.intent_classifier import classifier, normalize_intent, log_labelled_sample, is_abandon_request
+from nodes.chat import start_speculative_chat, discard_speculative_chat
+from history import window
+import asyncio
+import random
 
+llm = get_llm("intent_router")
+shadow_llm = get_llm("intent_shadow")
+_shadow_tasks = set()
 
-async def intent_node(state: TravelAssistantState):
-    logger.info("Intent user input.")
-    history = state["messages"]
-    message = state["messages"][-1].content
 
+async def _llm_intent(message: str, history, model=llm) -> str:
     intent_chain = (
-        INTENT_PROMPT 
-        | llm 
+        INTENT_PROMPT
+        | model
         | (lambda x: x.content.strip())
     )
+    return await intent_chain.ainvoke({"message": message, "history": history})
+
+
+async def _shadow_check(message: str, history, predicted: str):
+    # 抽樣以 LLM 驗證快速路徑的判斷，用於估計準確率
+    try:
+        intent = normalize_intent(await _llm_intent(message, history, shadow_llm))
+        metrics.incr("intent.shadow.total")
+        metrics.incr("intent.shadow.agree", intent == predicted)
+        log_labelled_sample(message, intent)
+    except Exception as e:
+        logger.warning(f"Intent shadow check failed: {e}")
+
+
+async def intent_node(state: TravelAssistantState):
+    logger.info("Intent user input.")
+    history = window(state["messages"], state.get("history_summary"), "intent_router")
+    message = state["messages"][-1].content
+    metrics.incr("intent.requests")
+
+    prefs = state.get("user_preferences")
+    collecting = bool(prefs and prefs["preference_history"] and not prefs["complete"])
+
+    if collecting and is_abandon_request(message):
+        # 放棄偏好收集: 清空收集歷史，後續回到一般對話
+        logger.info("User abandoned preference collection.")
+        metrics.incr("intent.collection_abandoned")
+        return {
+            "intent": "chat",
+            "user_preferences": {**prefs, "preference_history": ""},
+        }
+
+    predicted, confidence = classifier.predict(message, has_plan=bool(state.get("planning")), collecting=collecting)
+
+    if predicted and confidence >= classifier.threshold:
+        metrics.incr("intent.fast_path.hits")
+        logger.info(f"Intent (fast path): {predicted} ({confidence:.2f})")
+        if random.random() < config["intent"]["shadow_rate"]:
+            task = asyncio.create_task(_shadow_check(message, history, predicted))
+            _shadow_tasks.add(task)
+            task.add_done_callback(_shadow_tasks.discard)
+        return {"intent": predicted}
 
-    intent = await intent_chain.ainvoke({"message": message, "history": history})
+    metrics.incr("intent.llm_fallbacks")
+    # 偏好收集中 chat 意圖會轉去收集偏好，不推測執行
+    speculation = start_speculative_chat(state) if config["intent"]["speculative_chat"] and not collecting else None
+    try:
+        intent = await _llm_intent(message, history)
+    except BaseException:
+        # 包含用戶斷線造成的 CancelledError，避免推測回覆留到下一輪
+        if speculation:
+            discard_speculative_chat(speculation)
+        raise
+    if speculation and normalize_intent(intent) != "chat":
+        discard_speculative_chat(speculation)
+    if predicted:
+        metrics.incr("intent.below_threshold.total")
+        metrics.incr("intent.below_threshold.agree", normalize_intent(intent) == predicted)
+    log_labelled_sample(message, normalize_intent(intent))
     logger.info(f"Intent: {intent}")
-    return {"intent": intent}
\ No newline at end of file
+    return {"intent": intent}
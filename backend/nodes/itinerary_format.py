@@ -0,0 +1,63 @@
+from pydantic import BaseModel
+from models import ItineraryPlanning, Accommodation
+import json
+
+# 提示詞中的行程表示法:
+# - compact_json: LLM 需要沿用完整結構時 (修改行程、住宿工具的參數與結果)，省略空值並去除多餘空白，可還原成原物件
+# - render_itinerary: LLM 只需閱讀內容時 (合併草案、行程報告)，以每天/每時段一行的表格呈現
+
+
+def prune(value):
+    """Drop None, empty strings and empty containers from dict values, recursively (list items are kept)."""
+    if isinstance(value, dict):
+        pruned = {k: prune(v) for k, v in value.items()}
+        return {k: v for k, v in pruned.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [prune(v) for v in value]
+    return value
+
+
+def compact_json(model: BaseModel) -> str:
+    """Minified JSON without empty fields; `type(model).model_validate_json` restores it."""
+    return json.dumps(prune(model.model_dump(mode="json")), ensure_ascii=False, separators=(",", ":"))
+
+
+def _cells(*values) -> str:
+    return " | ".join(str(v).replace("\n", " ") for v in values if v not in (None, ""))
+
+
+def _accommodation(hotel: Accommodation) -> str:
+    price = f"{hotel.price:g} {hotel.currency or ''}".strip() if isinstance(hotel.price, (int, float)) else ""
+    score = f"評分 {hotel.review_score:g}" if isinstance(hotel.review_score, (int, float)) else ""
+    return _cells(hotel.name, hotel.address, price, score, hotel.url)
+
+
+def render_itinerary(itinerary: ItineraryPlanning) -> str:
+    """Plain-text table of the itinerary: header lines, then one line per day and per time segment."""
+    dates = " ~ ".join(str(d) for d in (itinerary.start_date, itinerary.end_date) if d)
+    lines = [
+        f"主題: {itinerary.travel_theme}" if itinerary.travel_theme else "",
+        _cells(
+            f"出發地: {itinerary.departure_location}" if itinerary.departure_location else "",
+            f"目的地: {itinerary.destination}" if itinerary.destination else "",
+            f"人數: {itinerary.num_peoples}" if itinerary.num_peoples else "",
+            f"天數: {itinerary.duration}" if itinerary.duration else "",
+            f"日期: {dates}" if dates else "",
+        ),
+    ]
+    if itinerary.features:
+        lines.append(f"特色: {itinerary.features}")
+    if itinerary.description:
+        lines.append(f"說明: {itinerary.description}")
+
+    for i, daily in enumerate(itinerary.days, 1):
+        day = " ".join(str(v) for v in (f"第{i}天", daily.day, daily.itinerary_location) if v)
+        lines.append(f"[{day}] " + _cells(daily.daily_theme, f"交通: {daily.transportation}" if daily.transportation else ""))
+        for segment in daily.segments:
+            for activity in segment.activities:
+                name = f"{activity.activity_name} ({activity.type})" if activity.type else activity.activity_name
+                location = f"@{activity.activity_location}" if activity.activity_location else ""
+                lines.append(f"- {segment.time_slot}: " + _cells(name, location, activity.estimated_duration, activity.description, activity.notes))
+        if daily.accommodation and daily.accommodation.name:
+            lines.append(f"  住宿: {_accommodation(daily.accommodation)}")
+    return "\n".join(line for line in lines if line)
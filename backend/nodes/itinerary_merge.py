@@ -0,0 +1,112 @@
+from collections import Counter
+from typing import List, Optional, Tuple
+from models import ItineraryPlanning, TimeSegment, Activity
+from nodes.preference_extractor import INTEREST_KEYWORDS
+import re
+
+# 時段分類，用來對齊不同草案的 TimeSegment
+_SLOT_PATTERNS = [
+    ("morning", re.compile(r"morning|早上|上午|清晨|早晨|早餐", re.I)),
+    ("noon", re.compile(r"noon|lunch|中午|午餐", re.I)),
+    ("afternoon", re.compile(r"afternoon|下午", re.I)),
+    ("evening", re.compile(r"evening|dinner|傍晚|晚上|晚餐", re.I)),
+    ("night", re.compile(r"night|深夜|夜間|宵夜", re.I)),
+]
+_SLOT_ORDER = [name for name, _ in _SLOT_PATTERNS]
+
+
+def slot_of(segment: TimeSegment) -> str:
+    for name, pattern in _SLOT_PATTERNS:
+        if pattern.search(segment.time_slot or ""):
+            return name
+    return segment.time_slot or "other"
+
+
+def _theme_keywords(interests: List[str]) -> dict:
+    keywords = {}
+    for theme in interests:
+        words = {theme} | {k for k, v in INTEREST_KEYWORDS.items() if v == INTEREST_KEYWORDS.get(theme, theme)}
+        keywords[theme] = words
+    return keywords
+
+
+def _activity_text(activity: Activity) -> str:
+    return " ".join(filter(None, [activity.activity_name, activity.type, activity.activity_location, activity.description]))
+
+
+def _score(activities: List[Activity], keywords: dict) -> float:
+    """Theme coverage: distinct interests covered, then keyword hits, then activity count."""
+    text = " ".join(_activity_text(a) for a in activities)
+    covered = [theme for theme, words in keywords.items() if any(w in text for w in words)]
+    hits = sum(text.count(w) for words in keywords.values() for w in words)
+    return len(covered) + 0.1 * hits + 0.01 * len(activities)
+
+
+def _location_key(activity: Activity) -> Optional[str]:
+    if (activity.type or "").lower() == "transportation":
+        return None  # 交通安排 (去回程) 不去重
+    key = re.sub(r"\s+", "", (activity.activity_location or activity.activity_name or "")).lower()
+    return key or None
+
+
+def _pick_segment(candidates: List[Tuple[int, TimeSegment]], keywords: dict, seen: set) -> Tuple[Optional[int], Optional[TimeSegment]]:
+    best, best_score = (None, None), None
+    fallback, fallback_score = (None, None), None
+    for idx, segment in candidates:
+        if segment.activities:
+            score = _score(segment.activities, keywords)
+            if fallback_score is None or score > fallback_score:
+                fallback, fallback_score = (idx, segment), score
+        activities = [a for a in segment.activities if _location_key(a) is None or _location_key(a) not in seen]
+        if not activities:
+            continue
+        score = _score(activities, keywords)
+        if best_score is None or score > best_score:
+            best, best_score = (idx, segment.model_copy(update={"activities": activities})), score
+    # 所有候選地點都已出現過: 保留分數最高的時段 (允許重複)，不留空時段
+    return best if best[1] else fallback
+
+
+def merge_itineraries(drafts: List[ItineraryPlanning], interests: List[str] = None) -> ItineraryPlanning:
+    """
+    Merge structured drafts without an LLM: align days by index and segments
+    by time slot, keep the segment with the best theme coverage and drop
+    activities whose `activity_location` already appears earlier in the trip.
+    """
+    if not drafts:
+        raise ValueError("No drafts to merge.")
+    if len(drafts) == 1:
+        return drafts[0]
+
+    keywords = _theme_keywords(interests or [])
+    num_days = Counter(len(d.days) for d in drafts).most_common(1)[0][0]
+    base = max(drafts, key=lambda d: _score([a for day in d.days for s in day.segments for a in s.activities], keywords))
+
+    seen = set()
+    days = []
+    for i in range(num_days):
+        candidates = [d.days[i] for d in drafts if i < len(d.days)]
+        slots = {}
+        for idx, day in enumerate(candidates):
+            for segment in day.segments:
+                slots.setdefault(slot_of(segment), []).append((idx, segment))
+
+        segments, sources = [], Counter()
+        for slot in sorted(slots, key=lambda s: _SLOT_ORDER.index(s) if s in _SLOT_ORDER else len(_SLOT_ORDER)):
+            idx, segment = _pick_segment(slots[slot], keywords, seen)
+            if not segment:
+                continue
+            segments.append(segment)
+            seen.update(k for k in map(_location_key, segment.activities) if k)
+            sources[idx] += 1
+
+        source = candidates[sources.most_common(1)[0][0]] if sources else candidates[0]
+        base_day = base.days[i] if i < len(base.days) else candidates[0]
+        if len(segments) < min(len(day.segments) for day in candidates):
+            # 時段對齊失敗 (例如草案內同一時段有多段): 沿用主要草案當天的安排
+            days.append(base_day)
+            continue
+        days.append(source.model_copy(update={"segments": segments}))
+
+    features = "；".join(dict.fromkeys(d.features for d in drafts if d.features))
+    return base.model_copy(update={"days": days, "features": features or base.features})
@@ -0,0 +1,106 @@
+from datetime import date
+from typing import List, Optional, Tuple
+from models import ItineraryPlanning, ItineraryPatch
+from nodes.itinerary_merge import slot_of, _SLOT_PATTERNS
+from nodes.preference_extractor import cn_to_int
+from nodes.itinerary_format import prune
+import json
+import re
+
+_DAY_INDEX = re.compile(r"第\s*(\d+|[一二兩三四五六七八九十]+)\s*(?:天|日)|day\s*(\d+)", re.I)
+_DATE = re.compile(r"(\d{1,2})\s*[/月]\s*(\d{1,2})\s*[日號]?")
+_FIRST_LAST = re.compile(r"(第一天|首日|最後一天|最後1天|末日)")
+# 需要整份行程或工具 (住宿搜尋) 的要求，不做局部修改
+_WHOLE_TRIP = re.compile(r"(整個|整趟|全部|所有|每天|每一天|天數|延長|縮短|住宿|飯店|旅館|酒店|hotel)", re.I)
+
+
+def detect_scope(request: str, itinerary: ItineraryPlanning) -> Optional[Tuple[List[int], List[str]]]:
+    """
+    Find which days (0-based indices) and time slots a modification request touches.
+    Returns None when the request is not clearly limited to some days.
+    """
+    if not itinerary or not itinerary.days or _WHOLE_TRIP.search(request or ""):
+        return None
+
+    days = set()
+    for match in _DAY_INDEX.finditer(request):
+        index = cn_to_int(match.group(1) or match.group(2))
+        if index and 1 <= index <= len(itinerary.days):
+            days.add(index - 1)
+    for match in _FIRST_LAST.finditer(request):
+        days.add(0 if match.group(1) in ("第一天", "首日") else len(itinerary.days) - 1)
+    for match in _DATE.finditer(request):
+        month, day = map(int, match.groups())
+        days.update(i for i, d in enumerate(itinerary.days) if isinstance(d.day, date) and (d.day.month, d.day.day) == (month, day))
+
+    if not days:
+        # 以活動名稱/地點定位，例如「把淺草寺換掉」
+        for i, daily in enumerate(itinerary.days):
+            for segment in daily.segments:
+                for activity in segment.activities:
+                    names = [activity.activity_name, activity.activity_location]
+                    if any(name and len(name) >= 2 and name in request for name in names):
+                        days.add(i)
+    if not days:
+        return None
+
+    slots = [name for name, pattern in _SLOT_PATTERNS if pattern.search(request)]
+    return sorted(days), slots
+
+
+def render_targets(itinerary: ItineraryPlanning, days: List[int], slots: List[str]) -> str:
+    """JSON of the targeted days (only the targeted segments when slots are given)."""
+    targets = []
+    for i in days:
+        daily = itinerary.days[i]
+        segments = [s for s in daily.segments if not slots or slot_of(s) in slots]
+        targets.append({
+            "day_index": i + 1,
+            "day": str(daily.day) if daily.day else "",
+            "daily_theme": daily.daily_theme,
+            "itinerary_location": daily.itinerary_location,
+            "transportation": daily.transportation,
+            "segments": [s.model_dump() for s in segments],
+        })
+    return json.dumps(prune(targets), ensure_ascii=False, separators=(",", ":"))
+
+
+def render_overview(itinerary: ItineraryPlanning) -> str:
+    return "\n".join(
+        f"第{i}天 {d.day or ''} {d.itinerary_location}: {d.daily_theme}" for i, d in enumerate(itinerary.days, 1)
+    )
+
+
+def apply_patch(itinerary: ItineraryPlanning, patch: ItineraryPatch, days: List[int], slots: List[str]) -> ItineraryPlanning:
+    """
+    Apply the patch to the targeted days only; all other days keep the
+    original objects. With `slots`, only the segments in those slots are replaced.
+    Raises ValueError when the patch changes none of the targeted days or
+    would leave a day (or one of its segments) empty.
+    """
+    new_days = list(itinerary.days)
+    applied = 0
+    for change in patch.changes:
+        i = change.day_index - 1
+        if i not in days:
+            continue
+        daily = new_days[i]
+        if slots:
+            kept = [s for s in daily.segments if slot_of(s) not in slots]
+            position = next((n for n, s in enumerate(daily.segments) if slot_of(s) in slots), len(kept))
+            position = sum(1 for s in daily.segments[:position] if slot_of(s) not in slots)
+            segments = kept[:position] + change.segments + kept[position:]
+        else:
+            segments = change.segments
+        if not segments or any(not s.activities for s in segments):
+            raise ValueError(f"Patch would leave day {change.day_index} or one of its segments empty.")
+        update = {"segments": segments}
+        if change.daily_theme:
+            update["daily_theme"] = change.daily_theme
+        if change.transportation:
+            update["transportation"] = change.transportation
+        new_days[i] = daily.model_copy(update=update)
+        applied += 1
+    if not applied:
+        raise ValueError("Patch does not change any of the targeted days.")
+    return itinerary.model_copy(update={"days": new_days})
@@ -0,0 +1,110 @@
+from langchain_core.output_parsers import PydanticOutputParser
+from nodes.json_repair import coerce
+from langgraph.config import get_stream_writer
+from pydantic import BaseModel, ValidationError
+from models import DailyItinerary
+from metrics import metrics
+from config import logger
+from typing import Callable, List, Optional
+import json
+import time
+
+
+class DayStreamParser:
+    """
+    Incremental scanner over a streamed ItineraryPlanning JSON: `feed()` the
+    text chunks and get back one entry per object of the top-level `days`
+    array that has just closed: the DailyItinerary, or None when it could
+    not be parsed. Text around the JSON (e.g. markdown fences) is ignored.
+    """
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None
+        self._in_days = False
+        self._day_start = None
+
+    def feed(self, chunk: str) -> List[Optional[DailyItinerary]]:
+        self._text += chunk
+        days = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        # 頂層物件中的字串: 記錄最後一個 key，用來辨識 "days"
+                        self._last_key = text[self._string_start + 1:i]
+                continue
+
+            if ch == '"':
+                if self._stack:
+                    self._in_string, self._string_start = True, i
+            elif ch in "{[":
+                if ch == "[" and self._stack == ["{"] and self._last_key == "days":
+                    self._in_days = True
+                elif ch == "{" and self._in_days and len(self._stack) == 2:
+                    self._day_start = i
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if ch == "}" and self._in_days and len(self._stack) == 2 and self._day_start is not None:
+                    days.append(self._parse_day(text[self._day_start:i + 1]))
+                    self._day_start = None
+                elif ch == "]" and self._in_days and len(self._stack) == 1:
+                    self._in_days = False
+        self._pos = len(text)
+        return days
+
+    @staticmethod
+    def _parse_day(raw: str) -> Optional[DailyItinerary]:
+        try:
+            return DailyItinerary.model_validate(coerce(json.loads(raw), DailyItinerary))
+        except (ValueError, ValidationError) as e:
+            logger.debug(f"Skip unparsable streamed day: {e}")
+            return None
+
+
+def day_emitter(stage: str, draft: Optional[str] = None) -> Callable[[int, DailyItinerary], None]:
+    """Send each finished day to the graph's custom stream as an `itinerary_day` event."""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        # 不在 graph 中執行 (例如 benchmark)，不輸出事件
+        return lambda index, day: None
+
+    def emit(index: int, day: DailyItinerary):
+        writer({"itinerary_day": {"stage": stage, "draft": draft, "day_index": index, "day": day.model_dump(mode="json")}})
+    return emit
+
+
+async def stream_structured(chain, inputs: dict, parser: PydanticOutputParser, on_day: Callable[[int, DailyItinerary], None], stage: str) -> BaseModel:
+    """
+    Stream `chain` (prompt | llm), report each completed day through `on_day`
+    as soon as its object closes, and parse the full output with `parser`.
+    """
+    scanner, text, index = DayStreamParser(), "", 0
+    start, first = time.perf_counter(), None
+    async for chunk in chain.astream(inputs):
+        content = chunk.content if isinstance(chunk.content, str) else ""
+        text += content
+        for day in scanner.feed(content):
+            # 無法解析的天數仍佔一個位置，day_index 才能對應完整行程中的天數
+            index += 1
+            if day is None:
+                continue
+            if first is None:
+                first = time.perf_counter() - start
+                metrics.observe(f"planner.first_day_latency.{stage}", first)
+            on_day(index, day)
+    metrics.observe(f"planner.stream_latency.{stage}", time.perf_counter() - start)
+    return await parser.ainvoke(text)
@@ -0,0 +1,253 @@
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.outputs import Generation
+from langgraph.constants import TAG_NOSTREAM
+from pydantic import BaseModel, ValidationError
+from typing import Any, List, Optional, Union, get_args, get_origin
+from datetime import date
+from metrics import metrics
+from prompts import JSON_REPAIR_PROMPT
+from config import logger
+import json
+import re
+
+# LLM 輸出的 JSON 常見小錯誤在本地修正，修不好才請 LLM 重新輸出:
+# 1. repair_json: 去除前後文字與 markdown 區塊、多餘逗號、Python 常數，補齊被截斷的字串與括號
+# 2. coerce: 依 models.py 的欄位型別修正值 (數值欄位的 ""、帶單位的數字、非 ISO 日期、缺少的必填欄位)
+
+_LITERALS = {"None": "null", "True": "true", "False": "false", "null": "null", "true": "true", "false": "false"}
+_NUMBER = re.compile(r"-?\d[\d,]*(?:\.\d+)?")
+_DATE = re.compile(r"(\d{4})[-/.年](\d{1,2})[-/.月](\d{1,2})")
+# 字串外不加引號的值或 key (例如 Restaurant、東京、NT$5200、-Infinity)
+_BARE = re.compile(r"[^\s,:\[\]{}\"]+")
+_JSON_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
+
+
+def _close(stack: List[str]) -> str:
+    return "".join("}" if b == "{" else "]" for b in reversed(stack))
+
+
+def _strip_tail(out: List[str]):
+    while out and (out[-1].isspace() or out[-1] in ",:"):
+        out.pop()
+
+
+def repair_json(text: str) -> str:
+    """
+    Best-effort syntactic fix of near-valid JSON: drop text around the first
+    object/array, trailing commas and comments, map Python literals, and
+    when the output was truncated cut back to the last complete value and
+    close the open brackets.
+    """
+    start = next((i for i, ch in enumerate(text) if ch in "{["), None)
+    if start is None:
+        return text
+
+    out, stack, safe = [], [], (0, [])
+    in_string = escape = is_value = False
+    prev = ""  # 字串外最後一個有意義的字元
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if is_value:
+                    safe = (len(out) + 1, list(stack))
+            elif ch == "\n":
+                ch = "\\n"
+            out.append(ch)
+            i += 1
+            continue
+
+        if ch == '"':
+            in_string = True
+            # 物件中 "{" 或 "," 之後的字串是 key，其餘是值
+            is_value = not (stack and stack[-1] == "{" and prev in "{,")
+            out.append(ch)
+        elif ch in "{[":
+            stack.append(ch)
+            out.append(ch)
+            safe = (len(out), list(stack))
+        elif ch in "}]":
+            if not stack:
+                break
+            _strip_tail(out)
+            out.append("}" if stack.pop() == "{" else "]")
+            safe = (len(out), list(stack))
+            if not stack:
+                break
+        elif ch == "/" and text.startswith("//", i):
+            i = text.find("\n", i)
+            i = len(text) if i < 0 else i
+            continue
+        elif ch == "," and prev not in ",:{[":
+            # 逗號前的值 (含數字、常數) 已完整
+            safe = (len(out), list(stack))
+            out.append(ch)
+        elif not ch.isspace() and ch not in ",:":
+            # 合法的數字與常數照抄，其餘整段視為字串
+            token = _BARE.match(text, i).group(0)
+            if token in _LITERALS:
+                out.append(_LITERALS[token])
+            elif _JSON_NUMBER.fullmatch(token):
+                out.append(token)
+            else:
+                out.append(json.dumps(token, ensure_ascii=False))
+            i += len(token)
+            prev = "w"
+            continue
+        else:
+            out.append(ch)
+        if not ch.isspace():
+            prev = ch
+        i += 1
+
+    if stack:
+        # 輸出被截斷: 回到最後一個完整的值，移除未填內容的容器後補齊括號
+        length, stack = safe
+        out = out[:length]
+        _strip_tail(out)
+        while len(stack) > 1 and out and out[-1] == stack[-1]:
+            out.pop()
+            stack.pop()
+            _strip_tail(out)
+        out.append(_close(stack))
+    return "".join(out)
+
+
+def _unwrap(annotation):
+    """Strip Optional[...] and return (type, allows_none)."""
+    if get_origin(annotation) is Union:
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        return (args[0] if len(args) == 1 else annotation), len(args) < len(get_args(annotation))
+    return annotation, False
+
+
+def _coerce_value(value: Any, annotation) -> Any:
+    target, _ = _unwrap(annotation)
+    origin = get_origin(target)
+    if origin in (list, List):
+        (item,) = get_args(target) or (Any,)
+        if value in (None, ""):
+            return []
+        if not isinstance(value, list):
+            value = [value]
+        return [_coerce_value(v, item) for v in value]
+    if isinstance(target, type) and issubclass(target, BaseModel):
+        return coerce(value, target) if isinstance(value, dict) else (None if value in ("", []) else value)
+    if target in (int, float):
+        if isinstance(value, str):
+            match = _NUMBER.search(value)
+            if not match:
+                return None
+            value = float(match.group(0).replace(",", ""))
+        if target is int and isinstance(value, float):
+            return int(round(value))
+        return value
+    if target is date and isinstance(value, str):
+        match = _DATE.search(value)
+        return date(*map(int, match.groups())).isoformat() if match else None
+    if target is str:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return f"{value:g}" if isinstance(value, float) else str(value)
+        if isinstance(value, list):
+            return "、".join(str(v) for v in value if v not in (None, ""))
+    return value
+
+
+def coerce(data: dict, model: type) -> dict:
+    """Fit parsed JSON to `model`'s field types so that `model.model_validate` accepts it."""
+    result = dict(data)
+    for name, field in model.model_fields.items():
+        _, allows_none = _unwrap(field.annotation)
+        if name not in result:
+            if field.is_required():
+                # 必填但缺少: 可為 None 的欄位補 None
+                if allows_none:
+                    result[name] = None
+            continue
+        value = _coerce_value(result[name], field.annotation)
+        ge = next((m.ge for m in field.metadata if getattr(m, "ge", None) is not None), None)
+        if value is None and not allows_none or (ge is not None and isinstance(value, (int, float)) and value < ge):
+            # 無法轉換或超出範圍: 改用預設值
+            result.pop(name)
+            continue
+        result[name] = value
+    return result
+
+
+class RepairingOutputParser(PydanticOutputParser):
+    """
+    PydanticOutputParser that repairs malformed output locally (repair_json +
+    coerce) before failing, and, when `llm` is set, asks it once to fix the
+    output with the parse error as a last resort.
+    Counters: json_repair.{node}.malformed (strict parse failed), .repaired
+    (fixed locally), .reasked / .reask_repaired (LLM asked to fix / succeeded).
+    """
+    node: str = "default"
+    llm: Optional[BaseChatModel] = None
+
+    def model_post_init(self, __context: Any):
+        super().model_post_init(__context)
+        prefix = f"json_repair.{self.node}"
+        metrics.register_ratio(f"{prefix}.repair_rate", f"{prefix}.repaired", f"{prefix}.malformed")
+        metrics.register_ratio(f"{prefix}.reask_success_rate", f"{prefix}.reask_repaired", f"{prefix}.reasked")
+
+    def _repair(self, text: str) -> BaseModel:
+        data = json.loads(repair_json(text))
+        return self.pydantic_object.model_validate(coerce(data, self.pydantic_object))
+
+    def parse_result(self, result: List[Generation], *, partial: bool = False) -> Any:
+        if partial:
+            return super().parse_result(result, partial=True)
+        text = result[0].text
+        fenced = _FENCE.search(text)
+        try:
+            return self.pydantic_object.model_validate_json((fenced.group(1) if fenced else text).strip())
+        except ValidationError:
+            pass
+
+        # 不經過 PydanticOutputParser 的 parse_partial_json: 對格式錯誤的長輸出逐字元重試，單次可達秒級
+        metrics.incr(f"json_repair.{self.node}.malformed")
+        try:
+            parsed = self._repair(text)
+        except Exception as e:
+            # 任何修復失敗都以 OutputParserException 回報，aparse_result 才會改請 LLM 修正
+            logger.warning(f"[{self.node}] Local JSON repair failed: {e}")
+            raise OutputParserException(
+                f"Failed to parse {self.pydantic_object.__name__} from completion {text[:200]}. Got: {e}", llm_output=text,
+            )
+        metrics.incr(f"json_repair.{self.node}.repaired")
+        logger.info(f"[{self.node}] Repaired malformed JSON output locally.")
+        return parsed
+
+    async def aparse_result(self, result: List[Generation], *, partial: bool = False) -> Any:
+        try:
+            return self.parse_result(result, partial=partial)
+        except OutputParserException as e:
+            if self.llm is None:
+                raise
+            error = e
+
+        # 最後手段: 附上錯誤訊息請 LLM 重新輸出，不送進 messages 串流
+        metrics.incr(f"json_repair.{self.node}.reasked")
+        try:
+            fixed = await (JSON_REPAIR_PROMPT | self.llm).ainvoke({
+                "schema": self.pydantic_object.model_json_schema(),
+                "error": str(error).split("\n")[0],
+                "output": result[0].text,
+            }, config={"tags": [TAG_NOSTREAM]})
+            text = fixed.content if isinstance(fixed.content, str) else str(fixed.content)
+            parsed = self._repair(text)
+        except Exception as reask_error:
+            logger.warning(f"[{self.node}] JSON re-ask failed: {reask_error}")
+            raise error
+        metrics.incr(f"json_repair.{self.node}.reask_repaired")
+        return parsed
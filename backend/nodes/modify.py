@@ -1,12 +1,28 @@
 from langchain.agents import initialize_agent, AgentType
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_core.messages import AIMessage
-from config import llm, logger
-from models import TravelAssistantState, ItineraryPlanning
-from prompts import ITINERARY_MODIFY_PROMPT
+from langchain_core.messages import AIMessage, HumanMessage
+from config import get_llm, logger
+from metrics import metrics
+from models import TravelAssistantState, ItineraryPlanning, ItineraryPatch
+from prompts import ITINERARY_MODIFY_PROMPT, ITINERARY_DAY_MODIFY_PROMPT
 from nodes.tools import ALL_TOOLS
+from nodes.itinerary_patch import detect_scope, render_targets, render_overview, apply_patch
+from nodes.itinerary_format import compact_json
+from nodes.json_repair import RepairingOutputParser
 
+llm = get_llm("modify_plan")
 agent = initialize_agent(ALL_TOOLS, llm, agent=AgentType.OPENAI_MULTI_FUNCTIONS, verbose=False)
+patch_parser = RepairingOutputParser(pydantic_object=ItineraryPatch, node="modify_plan.scoped", llm=llm)
+itinerary_parser = RepairingOutputParser(pydantic_object=ItineraryPlanning, node="modify_plan", llm=llm)
+
+async def _modify_days(itinerary: ItineraryPlanning, request: str, days, slots) -> ItineraryPlanning:
+    """Send only the targeted days/segments to the LLM and patch them into the itinerary."""
+    chain = ITINERARY_DAY_MODIFY_PROMPT | llm | patch_parser
+    patch = await chain.ainvoke({
+        "overview": render_overview(itinerary),
+        "targets": render_targets(itinerary, days, slots),
+        "itinerary_changes_requested": request,
+    })
+    return apply_patch(itinerary, patch, days, slots)
 
 async def modify_itinerary_node(state: TravelAssistantState):
     logger.info("Modify current itinerary.")
@@ -14,14 +30,32 @@ async def modify_itinerary_node(state: TravelAssistantState):
     if not state.get("planning"):
         state["messages"].append(AIMessage(content="很抱歉無法完成您的需求，請生成規劃再嘗試。"))
         return state
+
+    itinerary = state["planning"].current_itinerary
+    if "modify_plan" in (state.get("intent") or ""):
+        user_request = next((m.content for m in reversed(state["messages"]) if isinstance(m, HumanMessage)), "")
+        scope = detect_scope(user_request, itinerary)
+        if scope:
+            # 只修改受影響的天數/時段，其餘天數維持原樣
+            days, slots = scope
+            logger.info(f"Modify days {[d + 1 for d in days]} slots {slots or 'all'}.")
+            try:
+                state["planning"].current_itinerary = await _modify_days(itinerary, user_request, days, slots)
+                metrics.incr("modify.scoped")
+                state["messages"].append(AIMessage(content="即將完成行程規劃。"))
+                return state
+            except Exception as e:
+                logger.warning(f"局部修改失敗，改為整份行程修改: {e}")
+    else:
+        user_request = None
+    metrics.incr("modify.full")
     state["messages"].append(AIMessage(content="即將完成行程規劃。"))
 
     try:
-        itinerary = state["planning"].current_itinerary
-        changed_request = state["messages"][-1].content
+        changed_request = user_request or state["messages"][-1].content
 
         prompt = ITINERARY_MODIFY_PROMPT.invoke({
-            "current_itinerary": itinerary,
+            "current_itinerary": compact_json(itinerary),
             "itinerary_changes_requested": changed_request
         })
 
@@ -29,7 +63,7 @@ async def modify_itinerary_node(state: TravelAssistantState):
         # resp: {"input": input_value, "output": output_value}
         # agent.arun(prompt) => 
         resp = await agent.arun(prompt)
-        new_itinerary = PydanticOutputParser(pydantic_object=ItineraryPlanning).invoke(resp)
+        new_itinerary = await itinerary_parser.ainvoke(resp)
         state["planning"].current_itinerary = new_itinerary
     except Exception as e:
         logger.error(f"行程格式錯誤: {e}")
@@ -1,10 +1,146 @@
-from langchain_core.runnables import RunnableParallel
-from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.runnables import RunnableLambda
 from langchain_core.messages import AIMessage
-from config import llm, logger
-from models import TravelAssistantState, PlanningState, ItineraryPlanning
-from prompts import ITINERARY_PLANNER_PROMPT, ITINERARY_MERGE_PROMPT
-import operator
+from config import config, get_llm, logger
+from metrics import metrics
+from models import TravelAssistantState, PlanningState, ItineraryPlanning, ItinerarySkeleton, DailyItinerary, UserPreferences
+from prompts import ITINERARY_PLANNER_PROMPT, ITINERARY_MERGE_PROMPT, ITINERARY_SKELETON_PROMPT, DAILY_ITINERARY_PROMPT
+from nodes.preference_extractor import INTEREST_KEYWORDS, parse_duration_days
+from nodes.itinerary_merge import merge_itineraries
+from nodes.itinerary_format import render_itinerary
+from nodes.itinerary_stream import stream_structured, day_emitter
+from nodes.json_repair import RepairingOutputParser
+from typing import List
+import asyncio
+import time
+
+draft_llm = get_llm("planning_draft")
+merge_llm = get_llm("merge_draft")
+draft_parser = RepairingOutputParser(pydantic_object=ItineraryPlanning, node="planning_draft", llm=draft_llm)
+merge_parser = RepairingOutputParser(pydantic_object=ItineraryPlanning, node="merge_draft", llm=merge_llm)
+
+def cluster_themes(themes: List[str], max_drafts: int) -> List[str]:
+    """
+    Merge similar interests (e.g. '小吃', '夜市' -> '美食') and fold the rest
+    into at most `max_drafts` combined themes, so every interest stays covered.
+    """
+    canonical = []
+    for theme in themes:
+        theme = INTEREST_KEYWORDS.get(theme.strip(), theme.strip())
+        if theme and theme not in canonical:
+            canonical.append(theme)
+
+    if len(canonical) <= max_drafts:
+        return canonical
+    groups = [[] for _ in range(max_drafts)]
+    for i, theme in enumerate(canonical):
+        groups[i % max_drafts].append(theme)
+    return ["、".join(group) for group in groups]
+
+async def _run_drafts(chain, inputs: List[dict], max_concurrency: int, deadline: float) -> List[ItineraryPlanning]:
+    """
+    Generate drafts with bounded concurrency and keep the ones finished within
+    `deadline` seconds; stragglers are cancelled. If nothing finished in time,
+    the first draft to complete is used.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _draft(item):
+        async with semaphore:
+            start = time.perf_counter()
+            draft = await chain.ainvoke(item)
+            metrics.observe("planner.draft_latency", time.perf_counter() - start)
+            return draft
+
+    tasks = [asyncio.create_task(_draft(item)) for item in inputs]
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    while pending and all(t.exception() for t in done):
+        # 時限內沒有可用草案，等待第一個成功完成的
+        finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        done |= finished
+
+    for task in pending:
+        task.cancel()
+    metrics.incr("planner.drafts_cancelled", len(pending))
+
+    drafts = []
+    for task in tasks:
+        if task in done:
+            if task.exception():
+                logger.error(f"Draft generation failed: {task.exception()}")
+            else:
+                drafts.append(task.result())
+    if not drafts:
+        raise next(t.exception() for t in done if t.exception())
+    return drafts
+
+def trip_days(prefs: UserPreferences) -> int:
+    if not prefs:
+        return 0
+    if prefs.departure_date and prefs.return_date:
+        return (prefs.return_date - prefs.departure_date).days + 1
+    return parse_duration_days(prefs.duration) or 0
+
+async def _plan_streaming(item: dict) -> ItineraryPlanning:
+    """Single-call draft, streamed so each day is shown as soon as its JSON object is complete."""
+    return await stream_structured(
+        ITINERARY_PLANNER_PROMPT | draft_llm,
+        {"prefs": item["prefs"], "theme": item["theme"]},
+        draft_parser, day_emitter("draft", item["theme"]), "draft",
+    )
+
+async def _plan_by_day(item: dict) -> ItineraryPlanning:
+    """
+    Map-reduce planning for long trips: generate a skeleton (theme + location
+    per day), then every DailyItinerary concurrently, and reassemble them.
+    """
+    prefs, theme = item["prefs"], item["theme"]
+    start_all = time.perf_counter()
+    skeleton = await (
+        ITINERARY_SKELETON_PROMPT
+        | draft_llm
+        | RepairingOutputParser(pydantic_object=ItinerarySkeleton, node="planning_draft.skeleton", llm=draft_llm)
+    ).ainvoke({"prefs": prefs, "theme": theme})
+
+    day_chain = DAILY_ITINERARY_PROMPT | draft_llm | RepairingOutputParser(pydantic_object=DailyItinerary, node="planning_draft.day", llm=draft_llm)
+    outline = "\n".join(
+        f"第{i}天 {d.day or ''} {d.itinerary_location}: {d.daily_theme}" for i, d in enumerate(skeleton.days, 1)
+    )
+    semaphore = asyncio.Semaphore(config["planning"]["day_concurrency"])
+    emit, emitted = day_emitter("draft", theme), []
+
+    async def _day(index: int, outline_day):
+        async with semaphore:
+            start = time.perf_counter()
+            daily = await day_chain.ainvoke({
+                "prefs": prefs,
+                "theme": theme,
+                "skeleton": outline,
+                "day_index": index,
+                "num_days": len(skeleton.days),
+                "day": outline_day.day or "",
+                "daily_theme": outline_day.daily_theme,
+                "itinerary_location": outline_day.itinerary_location,
+            })
+            metrics.observe("planner.day_latency", time.perf_counter() - start)
+            daily = daily.model_copy(update={
+                "day": outline_day.day or daily.day,
+                "itinerary_location": daily.itinerary_location or outline_day.itinerary_location,
+            })
+            if not emitted:
+                metrics.observe("planner.first_day_latency.draft", time.perf_counter() - start_all)
+            emitted.append(index)
+            emit(index, daily)
+            return daily
+
+    tasks = [asyncio.create_task(_day(i, d)) for i, d in enumerate(skeleton.days, 1)]
+    try:
+        days = await asyncio.gather(*tasks)
+    except BaseException:
+        # 任一天失敗時整份草案作廢，其餘天數不再佔用排程與 token
+        for task in tasks:
+            task.cancel()
+        raise
+    return ItineraryPlanning(**skeleton.model_dump(exclude={"days"}), days=list(days))
 
 async def planning_draft(state: TravelAssistantState):
     """
@@ -14,23 +150,33 @@ async def planning_draft(state: TravelAssistantState):
     
     prefs = state.get("user_preferences")["prefs"]
 
-    chain = (
-        RunnableParallel(
-            prefs=operator.itemgetter("prefs"),
-            theme=operator.itemgetter("theme")
-        )
-        | ITINERARY_PLANNER_PROMPT
-        | llm
-        | PydanticOutputParser(pydantic_object=ItineraryPlanning)
-    )
+    if trip_days(prefs) >= config["planning"]["day_parallel_min_days"]:
+        # 長天數: 先產生大綱，再並行產生每日行程
+        logger.info("Planning long trip day by day.")
+        chain = RunnableLambda(_plan_by_day)
+    else:
+        chain = RunnableLambda(_plan_streaming)
 
     default_themes = ["美食", "文化", "自然"]
     themes = prefs.interests if prefs and prefs.interests else default_themes
-    inputs = []
-    for theme in themes:
-        inputs.append({"prefs": prefs, "theme": theme})
 
-    drafts = await chain.abatch(inputs)
+    policy = config["planning"]["fanout_policy"]
+    start = time.perf_counter()
+    if policy == "bounded":
+        themes = cluster_themes(themes, config["planning"]["max_drafts"])
+        inputs = [{"prefs": prefs, "theme": theme} for theme in themes]
+        drafts = await _run_drafts(
+            chain, inputs,
+            max_concurrency=config["planning"]["max_concurrency"],
+            deadline=config["planning"]["draft_deadline_seconds"],
+        )
+    else:
+        inputs = []
+        for theme in themes:
+            inputs.append({"prefs": prefs, "theme": theme})
+
+        drafts = await chain.abatch(inputs)
+    metrics.observe(f"planner.latency.{policy}", time.perf_counter() - start)
 
     if not state.get("planning", None):
         state["planning"] = PlanningState()
@@ -52,18 +198,21 @@ async def merge_draft(state: TravelAssistantState):
         return state
     
     merged_draf = None
-    if len(options) > 1:        
-        drafts = "\n---\n".join([f"第{i}個草案:\n{item}" for i, item in enumerate(options, 1)])
+    mode = config["planning"]["merge_mode"]
+    start = time.perf_counter()
+    if len(options) > 1 and mode == "local":
+        merged_draf = merge_itineraries(options, prefs.interests if prefs else [])
+    elif len(options) > 1:
+        drafts = "\n---\n".join([f"第{i}個草案:\n{render_itinerary(item)}" for i, item in enumerate(options, 1)])
 
-        chain =  (
-            ITINERARY_MERGE_PROMPT
-            | llm
-            | PydanticOutputParser(pydantic_object=ItineraryPlanning)
+        merged_draf = await stream_structured(
+            ITINERARY_MERGE_PROMPT | merge_llm,
+            {"prefs": prefs, "drafts": drafts},
+            merge_parser, day_emitter("merge"), "merge",
         )
-        
-        merged_draf = await chain.ainvoke({"prefs": prefs, "drafts": drafts})
     else:
         merged_draf = options[0]
+    metrics.observe(f"planner.merge_latency.{mode}", time.perf_counter() - start)
 
     state["planning"].current_itinerary = merged_draf
     state["messages"].append(AIMessage(content="調整行程住宿"))
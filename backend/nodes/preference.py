@@ -1,10 +1,15 @@
-from config import llm
+from config import get_llm
 from models import UserPreferencesState, UserPreferences, TravelAssistantState, CollectPreference
 from prompts import PREF_PROMPT
 from config import logger
-from langchain_core.output_parsers import PydanticOutputParser
+from metrics import metrics
+from nodes.preference_extractor import extract_preferences, return_date_for
+from nodes.json_repair import RepairingOutputParser
+from history import tail
 from langchain_core.messages import AIMessage
 
+llm = get_llm("collect_preferences")
+
 
 # 必要的欄位的詢問回覆
 REQUIRED_FIELDS = [
@@ -29,19 +34,40 @@ async def multi_turn_collector_node(state:TravelAssistantState):
         
     user_input = user_input.content
     history += "\n" + user_input
-    
-    chain = PREF_PROMPT | llm | PydanticOutputParser(pydantic_object=CollectPreference)
-    resp = await chain.ainvoke({
-        "prefs": prefs,
-        "history": history
-    })
 
-    updated = resp.preferences
-    updated_field = resp.updated_field
+    # 先以規則解析本輪輸入，無法完整解析時才交給 LLM
+    if not isinstance(prefs, UserPreferences):
+        prefs = UserPreferences(destination=None, departure_location=None)
+    asked = next((f for f, _ in REQUIRED_FIELDS if not getattr(prefs, f)), None)
+    extracted = extract_preferences(user_input, asked_field=asked)
+    consumed = extracted.pop("_consumed")
+    if "interests" in extracted:
+        # 興趣是累加的，保留先前收集到的
+        extracted["interests"] = list(dict.fromkeys((prefs.interests or []) + extracted["interests"]))
+    prefs = prefs.model_copy(update=extracted)
+
+    if consumed:
+        metrics.incr("preference.local_turns")
+        updated = prefs
+        updated_field = ",".join(extracted)
+    else:
+        metrics.incr("preference.llm_turns")
+        chain = PREF_PROMPT | llm | RepairingOutputParser(pydantic_object=CollectPreference, node="collect_preferences", llm=llm)
+        # 較早的輸入已反映在 prefs 中，只需送出最近幾行
+        resp = await chain.ainvoke({
+            "prefs": prefs,
+            "history": tail(history, "collect_preferences")
+        })
+
+        updated = resp.preferences
+        updated_field = resp.updated_field
+
+    if updated.departure_date and updated.duration and not updated.return_date:
+        updated.return_date = return_date_for(updated.departure_date, updated.duration)
 
     # 進節點前有缺失，檢查經過LLM後是否所有欄位都有值
     if updated_field:
-        missing = [f for f, _ in REQUIRED_FIELDS if getattr(updated, f) is None]
+        missing = [f for f, _ in REQUIRED_FIELDS if not getattr(updated, f)]
         if missing:
             # 追問下一個缺失欄
             ask = dict(REQUIRED_FIELDS)[missing[0]]
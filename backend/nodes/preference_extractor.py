@@ -0,0 +1,184 @@
+from datetime import date, timedelta
+from typing import Optional
+import re
+
+_CN_DIGITS = {"零": 0, "一": 1, "二": 2, "兩": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_NUM = r"(\d+|[零一二兩三四五六七八九十]+)"
+
+# 常見目的地/出發城市
+GAZETTEER = [
+    # 台灣
+    "台北", "臺北", "新北", "桃園", "新竹", "台中", "臺中", "台南", "臺南", "高雄", "基隆", "宜蘭", "花蓮", "台東", "臺東",
+    "屏東", "墾丁", "南投", "日月潭", "阿里山", "嘉義", "彰化", "苗栗", "雲林", "澎湖", "金門", "馬祖", "綠島", "蘭嶼",
+    # 日本
+    "日本", "東京", "大阪", "京都", "奈良", "神戶", "名古屋", "橫濱", "北海道", "札幌", "函館", "小樽", "沖繩", "福岡",
+    "九州", "廣島", "仙台", "金澤", "箱根", "富士山", "鎌倉", "輕井澤", "四國", "熊本", "鹿兒島",
+    # 其他亞洲
+    "韓國", "首爾", "釜山", "濟州島", "香港", "澳門", "上海", "北京", "泰國", "曼谷", "清邁", "普吉島", "新加坡",
+    "馬來西亞", "吉隆坡", "越南", "河內", "胡志明市", "峴港", "菲律賓", "宿霧", "長灘島", "印尼", "峇里島", "柬埔寨", "吳哥窟",
+    # 歐美澳
+    "巴黎", "倫敦", "羅馬", "米蘭", "威尼斯", "佛羅倫斯", "巴塞隆納", "馬德里", "阿姆斯特丹", "柏林", "慕尼黑", "維也納",
+    "布拉格", "蘇黎世", "瑞士", "冰島", "紐約", "洛杉磯", "舊金山", "西雅圖", "溫哥華", "多倫多", "雪梨", "墨爾本", "紐西蘭",
+]
+_GAZETTEER_RE = re.compile("|".join(sorted(map(re.escape, GAZETTEER), key=len, reverse=True)))
+
+# 興趣關鍵字 -> 標準主題
+INTEREST_KEYWORDS = {
+    "美食": "美食", "吃": "美食", "小吃": "美食", "餐廳": "美食", "夜市": "美食",
+    "文化": "文化", "歷史": "文化", "古蹟": "文化", "寺廟": "文化", "神社": "文化", "博物館": "文化",
+    "自然": "自然", "風景": "自然", "登山": "自然", "健行": "自然", "海邊": "自然", "海灘": "自然", "賞花": "自然",
+    "購物": "購物", "逛街": "購物", "血拼": "購物",
+    "動漫": "動漫", "溫泉": "溫泉", "藝術": "藝術", "美術館": "藝術", "夜景": "夜景", "親子": "親子", "主題樂園": "親子",
+}
+_INTEREST_RE = re.compile("|".join(sorted(map(re.escape, INTEREST_KEYWORDS), key=len, reverse=True)))
+
+_ISO_DATE = re.compile(r"(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*[日號]?")
+_MONTH_DAY = re.compile(r"(\d{1,2})\s*[月/]\s*(\d{1,2})\s*[日號]?")
+_DURATION = re.compile(_NUM + r"\s*(?:天|日)\s*(?:" + _NUM + r"\s*夜)?|" + _NUM + r"\s*夜|(一|1)\s*(?:週|周|星期)")
+_PEOPLE = re.compile(_NUM + r"\s*(?:個人|人|位|大人)")
+_SOLO = re.compile(r"(一個人|自己|獨旅|單人)")
+_COUPLE = re.compile(r"(情侶|夫妻|兩人世界|跟(男|女)朋友|跟老(公|婆))")
+# 出發地線索: 地名前的「從/由」，或地名後的「出發/起飛」
+_DEPARTURE_BEFORE = re.compile(r"(從|由)\s*$")
+_DEPARTURE_AFTER = re.compile(r"^\s*(出發|起飛)")
+_DESTINATION_CUE = re.compile(r"(去|到|往|玩|前往|飛)\s*$")
+# 否定的地名 (「不要東京」) 不填入偏好
+_NEGATION = re.compile(r"(不要|不去|不想去|不想|別去|不考慮)\s*$")
+
+# 扣除已解析片段後可忽略的字詞，用來判斷輸入是否已完整解析
+_FILLERS = re.compile(
+    r"我們|我|想要|想|要|打算|預計|大概|大約|左右|的|是|在|從|由|去|到|往|出發|回來|玩|規劃|安排|行程|旅遊|旅行|"
+    r"自由行|日期|時間|號|人數|共|總共|和|跟|與|還有|以及|喜歡|看|吃|逛|體驗|一下|吧|喔|呢|啊|囉|好|可以|謝謝|請|幫|幫我|"
+    r"[\s,，.。!！?？、~～:：]"
+)
+
+
+def cn_to_int(text: str) -> Optional[int]:
+    """Parse '3', '三', '十二', '二十' into an int."""
+    if text.isdigit():
+        return int(text)
+    if "十" in text:
+        tens, _, ones = text.partition("十")
+        return (_CN_DIGITS.get(tens, 1) if tens else 1) * 10 + (_CN_DIGITS.get(ones, 0) if ones else 0)
+    value = 0
+    for ch in text:
+        if ch not in _CN_DIGITS:
+            return None
+        value = value * 10 + _CN_DIGITS[ch]
+    return value
+
+
+def parse_duration_days(text: str) -> Optional[int]:
+    """Number of days in a duration string such as '5天4夜', '3日', '4夜' or '一週'."""
+    match = _DURATION.search(text or "")
+    if not match:
+        return None
+    days, nights, only_nights, week = match.groups()
+    if week:
+        return 7
+    if days:
+        return cn_to_int(days)
+    nights = cn_to_int(only_nights)
+    return nights + 1 if nights is not None else None
+
+
+def _parse_date(text: str, today: date):
+    """(date, span) of the first date in `text`; the date is None when it does not exist (e.g. 2月30日)."""
+    match = _ISO_DATE.search(text)
+    if match:
+        y, m, d = map(int, match.groups())
+    else:
+        match = _MONTH_DAY.search(text)
+        if not match:
+            return None, None
+        m, d = map(int, match.groups())
+        y = today.year
+        try:
+            if date(y, m, d) < today:
+                y += 1  # 沒寫年份且日期已過，視為明年
+        except ValueError:
+            return None, match.span()
+    try:
+        return date(y, m, d), match.span()
+    except ValueError:
+        return None, match.span()
+
+
+def extract_preferences(text: str, asked_field: str = None, today: date = None) -> dict:
+    """
+    Extract UserPreferences fields from a single user reply without an LLM.
+
+    Returns a dict with the resolved fields plus `_consumed` (True when the
+    reply contains nothing beyond the recognized values, so the LLM is not needed).
+    """
+    today = today or date.today()
+    text = text or ""
+    found = {}
+    spans = []
+
+    departure_date, date_span = _parse_date(text, today)
+    if departure_date:
+        found["departure_date"] = departure_date
+        spans.append(date_span)
+
+    for match in _DURATION.finditer(text):
+        # 不存在的日期 (例如 2月30日) 也不能當成天數
+        if any(s <= match.start() < e for s, e in spans + ([date_span] if date_span else [])):
+            continue
+        days = parse_duration_days(match.group(0))
+        if days:
+            found["duration"] = f"{days}天{max(days - 1, 0)}夜"
+            spans.append(match.span())
+            break
+
+    people = _PEOPLE.search(text)
+    if people and not any(s <= people.start() < e for s, e in spans):
+        count = cn_to_int(people.group(1))
+        if count:
+            found["num_peoples"] = count
+            spans.append(people.span())
+    elif _SOLO.search(text):
+        found["num_peoples"] = 1
+        spans.append(_SOLO.search(text).span())
+    elif _COUPLE.search(text):
+        found["num_peoples"] = 2
+        spans.append(_COUPLE.search(text).span())
+
+    places = list(_GAZETTEER_RE.finditer(text))
+    for match in places:
+        before, after = text[:match.start()], text[match.end():]
+        if _NEGATION.search(before):
+            continue
+        to_place = _DESTINATION_CUE.search(before)
+        # 緊接在前的「去/到」比地名後的「出發」更近，以目的地為準
+        if _DEPARTURE_BEFORE.search(before) or (_DEPARTURE_AFTER.search(after) and not to_place):
+            found.setdefault("departure_location", match.group(0))
+        elif to_place:
+            found.setdefault("destination", match.group(0))
+        elif len(places) == 1 and asked_field in ("destination", "departure_location"):
+            found.setdefault(asked_field, match.group(0))
+        elif "destination" not in found and asked_field != "departure_location":
+            found["destination"] = match.group(0)
+        else:
+            continue
+        spans.append(match.span())
+
+    interests = []
+    for match in _INTEREST_RE.finditer(text):
+        theme = INTEREST_KEYWORDS[match.group(0)]
+        if theme not in interests:
+            interests.append(theme)
+        spans.append(match.span())
+    if interests:
+        found["interests"] = interests
+
+    residual = "".join(ch for i, ch in enumerate(text) if not any(s <= i < e for s, e in spans))
+    found["_consumed"] = bool(found) and not _FILLERS.sub("", residual)
+    return found
+
+
+def return_date_for(departure_date: date, duration: str) -> Optional[date]:
+    days = parse_duration_days(duration)
+    if not departure_date or not days:
+        return None
+    return departure_date + timedelta(days=days - 1)
@@ -1,7 +1,10 @@
 from langchain_core.messages import AIMessage
 from prompts import ITINERARY_REPORT_PROMPT
 from models import TravelAssistantState
-from config import llm, logger
+from config import get_llm, logger
+from nodes.itinerary_format import render_itinerary
+
+llm = get_llm("report_itinerary")
 
 async def report_node(state: TravelAssistantState):
     logger.info("Report itinerary.")
@@ -13,7 +16,7 @@ async def report_node(state: TravelAssistantState):
     report = await llm.ainvoke(
         ITINERARY_REPORT_PROMPT.format(
             intent=state["intent"],
-            itinerary=itinerary
+            itinerary=render_itinerary(itinerary)
         )
     )
     logger.info(f"Report: \n{report}")
@@ -1,26 +1,137 @@
-from models import AccommodationSearchInput, Accommodation
+from models import AccommodationSearchInput, Accommodation, ItineraryPlanning
 from config import logger
+from services.booking_client import get_booking_client
+from nodes.hotel_ranking import top_k_hotels
+from nodes.itinerary_format import compact_json
 from langchain_core.tools import tool
+from collections import Counter
+from datetime import timedelta
 from typing import List
-import requests
-import os
+import asyncio
 
 
-RAPIDAPI_KEY = os.getenv("X_RAPIDAPI_KEY")
-HEADERS = {
-    "x-rapidapi-key": RAPIDAPI_KEY,
-    "x-rapidapi-host": "booking-com15.p.rapidapi.com"
-}
+def _get_destination(items):
+    """
+    From destination search results, take the first item that has a dest_id,
+    and extract its dest_id, dest_type and coordinates (if any).
+    """
+    for item in items:
+        if item.get("dest_id"):
+            anchor = None
+            if item.get("latitude") is not None and item.get("longitude") is not None:
+                anchor = (float(item["latitude"]), float(item["longitude"]))
+            return {"dest_id": item.get("dest_id"), "dest_type": item.get("search_type") or item.get("dest_type"), "anchor": anchor}
+
+def _mean_position(results: list):
+    """Mean coordinates over searchDestination results (first located item of each), or None."""
+    points = []
+    for items in results:
+        item = next((i for i in items if i.get("latitude") is not None and i.get("longitude") is not None), None)
+        if item:
+            points.append((float(item["latitude"]), float(item["longitude"])))
+    if not points:
+        return None
+    return sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points)
+
+def _parse_hotel_detail(hotel_id, detail: dict) -> Accommodation:
+    """Parse the getHotelDetails response into the Accommodation data structure."""
+    price = (detail.get("composite_price_breakdown") or {}).get("gross_amount_hotel_currency") or {}
+    address = ", ".join(filter(None, [detail.get("address"), detail.get("city"), detail.get("country_trans")]))
+    return Accommodation(
+        hotel_id=hotel_id,
+        name=detail.get("hotel_name"),
+        url=detail.get("url"),
+        address=address,
+        price=float(price.get("value") or 0.0),
+        currency=price.get("currency") or "TWD",
+        review_score=float(detail.get("review_score") or 0.0),
+        review_count=int(detail.get("review_nr") or 0),
+        arrival_date=detail.get("arrival_date"),
+        departure_date=detail.get("departure_date"),
+    )
+
+async def _search_location(location: str, num_peoples: int, arrival_date=None, departure_date=None, budget_per_night=None, landmarks: List[str] = None) -> List[Accommodation]:
+    client = get_booking_client()
+
+    # 獲取dest_id和dest_type，並同時定位每晚最後一個活動的地點 (距離以其平均位置計算)
+    landmarks = landmarks or []
+    queries = list(dict.fromkeys([location, *landmarks]))
+    results = await asyncio.gather(*[client.search_destination(q) for q in queries], return_exceptions=True)
+    if isinstance(results[0], Exception):
+        raise results[0]
+    destination = _get_destination(results[0])
+    if not destination:
+        return []
+    located = [r for q, r in zip(queries, results) if q in landmarks and not isinstance(r, Exception)]
+    anchor = _mean_position(located) or destination["anchor"]
+
+    # 搜尋符合條件的住宿
+    hotels = await client.search_hotels(
+        destination["dest_id"], destination["dest_type"], num_peoples, arrival_date, departure_date
+    )
+    # 先以列表資料 (價格/評分/距離) 排序，只查詢前幾名的詳細資料
+    nights = (departure_date - arrival_date).days if arrival_date and departure_date else 1
+    ranked = top_k_hotels(
+        [hotel for hotel in hotels if hotel.get("hotel_id")],
+        nights=nights,
+        budget_per_night=budget_per_night,
+        anchor=anchor,
+    )
+    hotel_ids = [hotel["hotel_id"] for hotel in ranked]
+    details = await asyncio.gather(
+        *[client.get_hotel_details(hotel_id, num_peoples, arrival_date, departure_date) for hotel_id in hotel_ids],
+        return_exceptions=True,
+    )
+
+    accommodations = []
+    for hotel_id, detail in zip(hotel_ids, details):
+        if isinstance(detail, Exception):
+            logger.warning(f"Hotel detail {hotel_id} failed: {detail}")
+            continue
+        accommodations.append(_parse_hotel_detail(hotel_id, detail))
+    return accommodations
+
+def group_stays(itinerary: ItineraryPlanning) -> List[dict]:
+    """
+    Group consecutive nights in the same itinerary_location into stays.
+    Each stay searches around the most frequent final-activity location of its
+    nights, from the first night's date to the morning after the last one.
+    The last day of a multi-day trip is the return trip and needs no room.
+    """
+    nights = itinerary.days[:-1] if len(itinerary.days) > 1 else itinerary.days
+    stays = []
+    for index, daily in enumerate(nights):
+        last_location = None
+        if daily.segments and daily.segments[-1].activities:
+            last_location = daily.segments[-1].activities[-1].activity_location
+        area = (daily.itinerary_location or last_location or "").strip()
+        if not area and not last_location:
+            continue
+
+        if stays and stays[-1]["area"] == area and stays[-1]["days"][-1] == index - 1:
+            stays[-1]["days"].append(index)
+            stays[-1]["locations"].append(last_location or area)
+        else:
+            stays.append({"area": area, "days": [index], "locations": [last_location or area]})
+
+    for stay in stays:
+        stay["location"] = Counter(stay["locations"]).most_common(1)[0][0]
+        first, last = itinerary.days[stay["days"][0]].day, itinerary.days[stay["days"][-1]].day
+        stay["arrival_date"] = first
+        stay["departure_date"] = last + timedelta(days=1) if last else None
+    return stays
 
 @tool
-def accommodation_search(input: AccommodationSearchInput) -> List[Accommodation]:
+async def accommodation_search(input: AccommodationSearchInput) -> str:
     """
     Tool for searching hotels based on user preferences.
     It queries Booking.com APIs via RapidAPI to:
-    1. Get the destination ID and type.
-    2. Search for hotels in that destination.
-    3. Retrieve detailed hotel information for each hotel.
-    4. Parse the hotel detail into the Accommodation format.
+    1. Group consecutive nights in the same area into stays.
+    2. Get the destination ID and type, and search for hotels once per stay.
+    3. Rank the hotels by price vs. budget, reviews and distance to the last
+       activity of each night, and retrieve detailed information for the best
+       few only.
+    4. Assign the best Accommodation to every day of each stay.
 
     Parameters:
     - input (AccommodationSearchInput):
@@ -28,86 +139,47 @@ def accommodation_search(input: AccommodationSearchInput) -> List[Accommodation]
         It includes prefs, itinerary, and destinations.
         - num_peoples: Number of travelers.
         - itinerary: Used for searching accommodation, based on the last activity's address of each daily itinerary.
+        - budget_per_night: Optional accommodation budget per night (TWD).
             
     Returns:
-    - List[Accommodation]: A list of structured accommodation results matching user preferences.
+    - str: The itinerary as JSON, with `accommodation` filled for each night.
     """
-    def getDestination(items):
-        """
-        From destination search results, find the one with 'dest' in its name,
-        and extract its dest_id and dest_type.
-        """
-        for item in items:
-            name = item.get("name", "")  
-            if "dest" in name.lower():
-                dest_id = item.get("dest_id")
-                dest_type = item.get("type")
-                return {"dest_id": dest_id, "dest_type": dest_type}
-            
-    def getHotelDetail(hotel_id):
-        """
-        Given a hotel_id, query the hotel detail endpoint and parse required fields
-        into the Accommodation data structure. (Currently incomplete)
-        """
-        url = "https://booking-com15.p.rapidapi.com/api/v1/hotels/getHotelDetails"
-        querystring = {"hotel_id":"hotel_id","units":"metric","temperature_unit":"c","languagecode":"zh-tw","currency_code":"TWD"}
-        response = requests.get(url, headers=HEADERS, params=querystring).json()
-
-        name=response.get("hotel_name"),
-        hotel_url=response.get("url"),
-        address=response.get("address", "") + ", " + response.get("city", "") + ", " + response.get("country_trans", ""),
-        price=float(response.get("composite_price_breakdown", {}).get("gross_amount_hotel_currency", {}).get("value", 0.0)),
-        currency=response.get("composite_price_breakdown", {}).get("gross_amount_hotel_currency", {}).get("currency", "TWD"),
-        review_score=float(response.get("review_score", 0.0)),
-        review_count=int(response.get("review_nr", 0)),
-        arrival_date=response.get("arrival_date"),
-        departure_date=response.get("departure_date")
-
-
     logger.info("Use tool 'accomodation_searh'.")
+    if isinstance(input, dict):
+        input = AccommodationSearchInput(**input)
     itinerary = input.itinerary
-    destinations = []
-    accommodations = []
-
-    # 住宿地點: 每日行程的最後一個活動地點(區域)
-    if not destinations and itinerary:
-        destinations = [daily_itinerary.segments[-1].activities[-1].activity_location for daily_itinerary in itinerary.days]
 
-    if not destinations:
+    # 住宿地點: 同一地區的連續住宿合併為一次查詢
+    stays = group_stays(itinerary) if itinerary else []
+    if not stays:
         logger.error("No destination specified and no itinerary available to infer destinations.")
         raise ValueError("No destination specified and no itinerary available to infer destinations.")
 
-    print("===Accommodation search with location===\n", destinations)
-    get_destId_url = "https://booking-com15.p.rapidapi.com/api/v1/hotels/searchDestination"
-    search_hotels_url = "https://booking-com15.p.rapidapi.com/api/v1/hotels/searchHotels"
-
-    for dest in destinations:
-        # 獲取dest_id和dest_type
-        params = {"query": dest}
-        dest_response = requests.get(get_destId_url, headers=HEADERS, params=params)
-        items = dest_response.json().get("data", [])
-        destination = getDestination(items)
+    logger.info(f"Accommodation search with stays: {[(s['location'], len(s['days'])) for s in stays]}")
+    results = await asyncio.gather(
+        *[_search_location(s["location"], input.num_peoples, s["arrival_date"], s["departure_date"], input.budget_per_night, s["locations"]) for s in stays],
+        return_exceptions=True,
+    )
 
-        if not destination:
+    days = list(itinerary.days)
+    for stay, result in zip(stays, results):
+        if isinstance(result, Exception):
+            logger.error(f"Accommodation search for {stay['location']} failed: {result}")
             continue
+        if not result:
+            continue
+        chosen = result[0].model_copy(update={
+            "arrival_date": stay["arrival_date"],
+            "departure_date": stay["departure_date"],
+        })
+        for index in stay["days"]:
+            days[index] = days[index].model_copy(update={"accommodation": chosen})
 
-        # 搜尋符合條件的住宿
-        params = {
-            "dest_id": destination["dest_id"],
-            "search_type": destination["dest_type"],
-            "adults": input.num_peoples,
-            "units": "metric",
-            "temperature_unit": "c",
-            "languagecode": "zh-tw",
-            "currency_code": "TWD"
-        }
-        hotels_response = requests.get(search_hotels_url, headers=HEADERS, params=params)
-        hotels = hotels_response.json().get("data", {}).get("hotels", [])
-        accommodations = [getHotelDetail(hotel.get("hotel_id")) for hotel in hotels]
-
-    logger.log("Accommodations:\n {accommodations}")
+    itinerary = itinerary.model_copy(update={"days": days})
+    logger.info(f"Accommodations:\n {[d.accommodation for d in itinerary.days]}")
 
-    return accommodations
+    # 工具結果會交給 agent 作為文字，與提示詞中的行程同樣使用精簡 JSON
+    return compact_json(itinerary)
 
 ALL_TOOLS = [accommodation_search]
 TOOL_MAP = {tool.name: tool for tool in ALL_TOOLS}
@@ -122,5 +194,5 @@ if __name__ == "__main__":
 
     # # 從 TOOL_MAP 取工具
     tool = TOOL_MAP["accommodation_search"]
-    result = tool.invoke(input=data)
+    result = asyncio.run(tool.ainvoke({"input": data}))
     print(result)
\ No newline at end of file
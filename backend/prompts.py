@@ -1,5 +1,5 @@
 from langchain_core.prompts import ChatPromptTemplate
-from models import ItineraryPlanning, CollectPreference
+from models import ItineraryPlanning, CollectPreference, ItinerarySkeleton, DailyItinerary, ItineraryPatch
 from langchain_core.output_parsers import PydanticOutputParser
 
 itinerary_parser = PydanticOutputParser(pydantic_object=ItineraryPlanning)
@@ -31,6 +31,15 @@ CHAT_PROMPT = ChatPromptTemplate.from_messages([
     ("user", "{message}")
 ])
 
+# 對話摘要: 將移出歷史視窗的對話併入既有摘要
+HISTORY_SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "你負責維護旅遊助理與使用者的對話摘要。請將「新的對話」併入「既有摘要」，輸出更新後的對話摘要。\n"
+     "保留使用者提過的目的地、日期、人數、預算、喜好與已確認的決定，省略寒暄與重複內容。\n"
+     "請以繁體中文條列，不超過 200 字，只輸出摘要本身。"),
+    ("user", "既有摘要:\n{summary}\n\n新的對話:\n{conversation}")
+])
+
 # 旅遊偏好解析提示詞
 PREF_PROMPT = ChatPromptTemplate.from_messages([
     ("system",
@@ -67,6 +76,43 @@ ITINERARY_PLANNER_PROMPT = ChatPromptTemplate.from_messages([
     ("user", "用戶偏好:\n\n {prefs}\n\n 請圍繞「{theme}」這個主題生成一個初步的旅遊草案"),
 ]).partial(schema=ItineraryPlanning.model_json_schema())
 
+# 長天數行程: 先產生每日大綱
+ITINERARY_SKELETON_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+        "你是一位資深的旅遊規劃師。這是一趟天數較長的旅程，請先規劃**行程大綱**，每日細節將在後續步驟分別產生。"
+        "在這個階段，請**不要調用任何工具**，也不要提出需要外部資訊的要求。\n\n"
+        "請參考下方結構格式產出內容，並請以JSON格式輸出:"
+        "\n\n{schema}\n\n"
+        "**規劃原則：**\n"
+        "1.  **每日一筆：** 行程的每一天都必須有一筆大綱，包含日期、每日主題與主要地點。\n"
+        "2.  **動線合理：** 相鄰天數的地點安排應考慮交通距離，避免來回奔波。\n"
+        "3.  **首末日：** 第一天為從出發地前往目的地，最後一天為返回出發地。\n"
+        "4.  **中文呈現：** 所有規劃內容必須是中文。\n\n"
+    ),
+    ("user", "用戶偏好:\n\n {prefs}\n\n 請圍繞「{theme}」這個主題規劃行程大綱"),
+]).partial(schema=ItinerarySkeleton.model_json_schema())
+
+# 長天數行程: 依大綱產生單日細節
+DAILY_ITINERARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+        "你是一位資深的旅遊規劃師。請根據行程大綱，為**指定的某一天**產生詳細的每日行程。"
+        "在這個階段，請**不要調用任何工具**，也不要提出需要外部資訊的要求。\n\n"
+        "請參考下方結構格式產出內容，並請以JSON格式輸出:"
+        "\n\n{schema}\n\n"
+        "**規劃原則：**\n"
+        "1.  **只規劃指定日：** 僅輸出這一天的行程，主題與地點須符合大綱。\n"
+        "2.  **內容完整性：** 從早上到晚上 (上午、中午、下午、晚上等時段) 排滿活動，並安排晚上住宿，除了最後一天的返程時段。\n"
+        "3.  **交通安排：** 若為第一天，上午安排從出發地前往目的地的交通；若為最後一天，下午或晚上安排返回出發地的交通。\n"
+        "4.  **避免重複：** 不要安排大綱中其他天數的主要景點。\n"
+        "5.  **不提供預訂建議：** 請**不要提供**任何預訂連結、預估價格或預訂方式的建議。\n"
+        "6.  **中文呈現：** 所有規劃內容必須是中文。\n\n"
+    ),
+    ("user",
+        "用戶偏好:\n\n {prefs}\n\n行程主題: {theme}\n\n行程大綱:\n{skeleton}\n\n"
+        "請產生第 {day_index} 天 (共 {num_days} 天) 的詳細行程，日期: {day}，主題: {daily_theme}，地點: {itinerary_location}"
+    ),
+]).partial(schema=DailyItinerary.model_json_schema())
+
 # 合併行程草案提示
 ITINERARY_MERGE_PROMPT = ChatPromptTemplate.from_messages([
     ("system",
@@ -114,6 +160,23 @@ ITINERARY_MODIFY_PROMPT = ChatPromptTemplate.from_messages([
     ("user", "當前行程: \n{current_itinerary}\n\n用戶調整要求: \n{itinerary_changes_requested}\n\n"),
 ]).partial(format_instructions=itinerary_parser.get_format_instructions())
 
+# 局部修改: 只提供受影響的天數/時段
+ITINERARY_DAY_MODIFY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+        "你是一位頂尖的旅遊規劃優化師。你的任務是根據用戶的調整要求，只修改行程中**指定的天數與時段**。"
+        "在這個階段，請**不要調用任何工具**。\n\n"
+        "請參考下方結構格式產出內容，並請以JSON格式輸出:"
+        "\n\n{schema}\n\n"
+        "**修改原則：**\n"
+        "1.  **只輸出指定部分：** 每個指定天數輸出一筆 change，day_index 與輸入相同；segments 為這些時段修改後的完整內容。\n"
+        "2.  **保留未要求修改的內容：** 指定時段中未被要求修改的活動請原樣保留。\n"
+        "3.  **考量可行性：** 修改後的活動需與當天其他行程及地點相互配合，並避免與其他天的景點重複。\n"
+        "4.  **中文呈現：** 所有規劃內容必須是中文。\n\n"
+        "請確保輸出是有效的 JSON，且不包含額外的文字或 Markdown 程式碼塊以外的內容。"
+    ),
+    ("user", "行程總覽:\n{overview}\n\n需要修改的天數/時段:\n{targets}\n\n用戶調整要求: \n{itinerary_changes_requested}\n\n"),
+]).partial(schema=ItineraryPatch.model_json_schema())
+
 # 行程報告
 ITINERARY_REPORT_PROMPT = ChatPromptTemplate.from_messages([
     ("system",
@@ -140,4 +203,14 @@ ITINERARY_REPORT_PROMPT = ChatPromptTemplate.from_messages([
         "- 請確保整體 HTML 排版清楚、語意清晰、無多餘敘述。\n"
     ),
     ("user", "用戶意圖: {intent}\n旅遊行程: {itinerary}")
-])
\ No newline at end of file
+])
+
+# 輸出格式修正: 本地修復失敗時，附上錯誤請 LLM 重新輸出
+JSON_REPAIR_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+        "你負責修正格式錯誤的 JSON 輸出。請依照下方結構，將原始輸出修正為符合結構的 JSON，"
+        "保留原本的內容，不要新增或刪減行程資訊。\n\n{schema}\n\n"
+        "只輸出修正後的 JSON，不要包含額外的文字或 Markdown 程式碼塊。"
+    ),
+    ("user", "解析錯誤: {error}\n\n原始輸出:\n{output}")
+])
@@ -3,28 +3,44 @@ from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
 from models import ChatRequest, ItineraryPlanning, PlanResponse, PlanUpdate
 from graph import create_graph
+from checkpointer import open_checkpointer, ThreadEvictor
+from services.booking_client import get_booking_client, close_booking_client
 from services.planning_service import TravelPlanningService
-from config import logger
+from config import config, logger
+from metrics import metrics
 from schema import Plan, PlanDay, PlanSegment, Activity, Accommodation
 from database import get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
 from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List
+import asyncio
 
 _travel_agent = None
+_thread_evictor = None
 
 @asynccontextmanager
 async def lifespan(app: APIRouter):
-    global _travel_agent
+    global _travel_agent, _thread_evictor
     logger.info("[Planning Router Lifespan] 啟動中: 初始化 TravelPlannerAgnet...")
+    sweeper = prewarm = None
     try:
-        _travel_agent = create_graph()
-        logger.info("[Planning Router Lifespan] TravelPlannerAgnet 初始化完成。")
-        yield
+        async with open_checkpointer() as checkpointer:
+            _travel_agent = create_graph(checkpointer)
+            _thread_evictor = ThreadEvictor(checkpointer)
+            sweeper = asyncio.create_task(_thread_evictor.run())
+            if config["booking"]["api_key"]:
+                prewarm = asyncio.create_task(get_booking_client().prewarm_destinations())
+            logger.info("[Planning Router Lifespan] TravelPlannerAgnet 初始化完成。")
+            yield
     finally:
         logger.info("[Planning Router Lifespan] 關閉中：清理 TravelPlannerAgent 資源...")
+        for task in (sweeper, prewarm):
+            if task:
+                task.cancel()
+        await close_booking_client()
         _travel_agent = None
+        _thread_evictor = None
         logger.info("[Planning Router Lifespan] TravelPlannerAgent 資源清理完成。")
 
 router = APIRouter(lifespan=lifespan)
@@ -35,7 +51,7 @@ async def get_travel_agent():
     return _travel_agent
 
 async def get_travel_service(agent = Depends(get_travel_agent)):
-    return TravelPlanningService(agent)
+    return TravelPlanningService(agent, _thread_evictor)
 
 @router.post("/chat/stream")
 async def chat(
@@ -50,6 +66,11 @@ async def chat(
         logger.error(f"API 路由 /api/travel/chat/stream 發生錯誤: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
+@router.get("/metrics")
+async def get_metrics():
+    """回傳後端效能指標 (計數器、比率與延遲分位數)。"""
+    return metrics.snapshot()
+
 @router.post("/plans", response_model=PlanResponse, status_code=201)
 async def create_plan(plan_data: ItineraryPlanning, db: Session = Depends(get_db)):
     """創建一個新的旅遊計畫及其所有相關的每日行程、時間段、活動和住宿。"""
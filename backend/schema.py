@@ -80,4 +80,22 @@ class Accommodation(Base):
     arrival_date = Column(Date)
     departure_date = Column(Date)
 
-    day = relationship("PlanDay", back_populates="accommodation")
\ No newline at end of file
+    day = relationship("PlanDay", back_populates="accommodation")
+
+class ThreadActivity(Base):
+    """Last access time of each conversation thread (used for checkpoint eviction)."""
+    __tablename__ = "thread_activity"
+
+    thread_id = Column(String, primary_key=True)
+    last_seen = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+
+class CacheEntry(Base):
+    """Persistent tier of the response caches (LLM responses, hotel lookups)."""
+    __tablename__ = "cache_entries"
+
+    namespace = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    value = Column(Text, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    accessed_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,179 @@
+from config import config, logger
+from metrics import metrics
+from cache import TieredCache
+from singleflight import SingleFlight
+from cassette import get_cassette
+from typing import List
+import asyncio
+import json
+import random
+import time
+import httpx
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+_flights = SingleFlight("booking")
+
+
+class BookingClient:
+    """
+    Async client for the Booking.com RapidAPI endpoints.
+    Shares one keep-alive connection pool, bounds concurrent requests,
+    coalesces identical in-flight requests and retries transient failures
+    with exponential backoff (honouring Retry-After).
+    """
+    def __init__(
+        self,
+        base_url: str = None,
+        api_key: str = None,
+        max_concurrency: int = None,
+        timeout: float = None,
+        max_retries: int = None,
+    ):
+        settings = config["booking"]
+        self._client = httpx.AsyncClient(
+            base_url=base_url or settings["base_url"],
+            headers={
+                "x-rapidapi-key": api_key or settings["api_key"] or "",
+                "x-rapidapi-host": settings["host"],
+            },
+            timeout=timeout or settings["timeout_seconds"],
+            limits=httpx.Limits(max_connections=settings["max_connections"], max_keepalive_connections=settings["max_connections"]),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency or settings["max_concurrency"])
+        self._max_retries = settings["max_retries"] if max_retries is None else max_retries
+        self._destinations = TieredCache("booking.destination", settings["destination_ttl_seconds"])
+        self._hotels = TieredCache("booking.hotels", settings["hotel_ttl_seconds"])
+        self._hotel_details = TieredCache("booking.hotel_details", settings["hotel_ttl_seconds"])
+
+    async def get(self, path: str, params: dict) -> dict:
+        """GET with retries; identical requests already in flight share one response."""
+        key = f"{path}?{json.dumps(params, sort_keys=True, default=str)}"
+        result, _ = await _flights.do(key, lambda: self._get(path, params, key))
+        return result
+
+    async def _get(self, path: str, params: dict, key: str) -> dict:
+        cassette = get_cassette()
+        if cassette and cassette.replaying:
+            async with self._semaphore:
+                data = await cassette.replay("http", key)
+            if isinstance(data, dict) and "cassette_error" in data:
+                raise httpx.HTTPError(data["cassette_error"])
+            return data
+
+        for attempt in range(self._max_retries + 1):
+            try:
+                async with self._semaphore:
+                    metrics.incr("booking.requests")
+                    start = time.perf_counter()
+                    with metrics.timer(f"booking.latency.{path.rsplit('/', 1)[-1]}"):
+                        response = await self._client.get(path, params=params)
+                if response.status_code not in RETRY_STATUS:
+                    if response.is_error and cassette and cassette.recording:
+                        cassette.record("http", key, {"path": path, "params": params}, {"cassette_error": f"HTTP {response.status_code}"}, 0.0)
+                    response.raise_for_status()
+                    data = response.json()
+                    if cassette and cassette.recording:
+                        cassette.record("http", key, {"path": path, "params": params}, data, time.perf_counter() - start)
+                    return data
+                delay = _retry_after(response) or _backoff(attempt)
+                error = f"HTTP {response.status_code}"
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                delay, error = _backoff(attempt), repr(e)
+
+            if attempt == self._max_retries:
+                message = f"Booking API {path} failed after {attempt + 1} attempts: {error}"
+                if cassette and cassette.recording:
+                    # 失敗也錄下來，重播時以相同錯誤結束
+                    cassette.record("http", key, {"path": path, "params": params}, {"cassette_error": message}, 0.0)
+                raise httpx.HTTPError(message)
+            metrics.incr("booking.retries")
+            logger.warning(f"Booking API {path} {error}, retry in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _cached(self, cache: TieredCache, key: str, fetch):
+        value = await cache.get(key)
+        if value is not None:
+            return json.loads(value)
+        result = await fetch()
+        if result:
+            await cache.set(key, json.dumps(result, ensure_ascii=False))
+        return result
+
+    async def search_destination(self, query: str) -> list:
+        async def fetch():
+            data = await self.get("/hotels/searchDestination", {"query": query})
+            return data.get("data", []) or []
+        return await self._cached(self._destinations, query.strip(), fetch)
+
+    async def search_hotels(self, dest_id, search_type: str, adults: int, arrival_date=None, departure_date=None) -> list:
+        params = {
+            "dest_id": dest_id,
+            "search_type": search_type,
+            "adults": adults,
+            "units": "metric",
+            "temperature_unit": "c",
+            "languagecode": "zh-tw",
+            "currency_code": "TWD",
+        }
+        if arrival_date and departure_date:
+            params.update(arrival_date=str(arrival_date), departure_date=str(departure_date))
+
+        async def fetch():
+            data = await self.get("/hotels/searchHotels", params)
+            return (data.get("data") or {}).get("hotels", []) or []
+        return await self._cached(self._hotels, f"{dest_id}|{search_type}|{arrival_date}|{departure_date}|{adults}", fetch)
+
+    async def get_hotel_details(self, hotel_id, adults: int, arrival_date=None, departure_date=None) -> dict:
+        params = {
+            "hotel_id": hotel_id,
+            "adults": adults,
+            "units": "metric",
+            "temperature_unit": "c",
+            "languagecode": "zh-tw",
+            "currency_code": "TWD",
+        }
+        if arrival_date and departure_date:
+            params.update(arrival_date=str(arrival_date), departure_date=str(departure_date))
+
+        async def fetch():
+            data = await self.get("/hotels/getHotelDetails", params)
+            return data.get("data", data) or {}
+        return await self._cached(self._hotel_details, f"{hotel_id}|{arrival_date}|{departure_date}|{adults}", fetch)
+
+    async def prewarm_destinations(self, areas: List[str] = None) -> int:
+        """Resolve popular areas into the destination cache ahead of time."""
+        areas = areas if areas is not None else config["booking"]["popular_areas"]
+        results = await asyncio.gather(*[self.search_destination(area) for area in areas], return_exceptions=True)
+        warmed = sum(1 for r in results if r and not isinstance(r, Exception))
+        logger.info(f"Destination cache pre-warmed: {warmed}/{len(areas)} areas.")
+        return warmed
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def _retry_after(response: httpx.Response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    base = config["booking"]["backoff_seconds"]
+    return base * (2 ** attempt) * (0.5 + random.random())
+
+
+_booking_client = None
+
+def get_booking_client() -> BookingClient:
+    global _booking_client
+    if _booking_client is None:
+        _booking_client = BookingClient()
+    return _booking_client
+
+async def close_booking_client():
+    global _booking_client
+    if _booking_client is not None:
+        await _booking_client.aclose()
+        _booking_client = None
@@ -1,34 +1,55 @@
 from fastapi import Request
 from models import ChatRequest
 from config import logger
+from nodes.chat import SPECULATIVE_TAG
+from nodes.intent_classifier import normalize_intent
 import json
 
 class TravelPlanningService:
-    def __init__(self, agent):
+    def __init__(self, agent, thread_evictor=None):
         self._travel_agent = agent
+        self._thread_evictor = thread_evictor
 
     async def handle_chat_stream(self, input: ChatRequest, request: Request):
-        config = {"configurable": {"thread_id": input.user_id+"@"+input.plan_id}, "recursion_limit": 15}
+        thread_id = input.user_id+"@"+input.plan_id
+        config = {"configurable": {"thread_id": thread_id}, "recursion_limit": 15}
+        if self._thread_evictor:
+            await self._thread_evictor.touch(thread_id)
         yield f"data: {json.dumps({'status': 'AI 正在思考中...'}, ensure_ascii=False)}\n\n"
+        # 推測執行的聊天 token: 意圖確定前先暫存，是 chat 才送出
+        speculative, speculative_chat = [], None
         try:
             async for chunk in self._travel_agent.astream(
                 {"messages": [input.message]},
                 config=config,
-                stream_mode=["updates", "messages"],
+                stream_mode=["updates", "messages", "custom"],
             ):
                 if await request.is_disconnected():
                     logger.warning("客戶端斷開連接，停止服務層串流。")
                     break
 
                 # chunk: (stream_mode, output)
-                if chunk[0] == "messages":
+                if chunk[0] == "custom":
+                    # ("custom", {"itinerary_day": {...}}): 行程生成中每完成一天就先送出
+                    if "itinerary_day" in chunk[1]:
+                        yield f'event: itinerary_day\ndata: {json.dumps(chunk[1]["itinerary_day"], ensure_ascii=False)}\n\n'
+                elif chunk[0] == "messages":
                     # ("messages", (AIMessageChunk, dict))
-                    if chunk[1][1]["langgraph_node"] in ["chat", "report_itinerary"]:
-                        data = {"message": {"type": "ai", "content": chunk[1][0].content}}
+                    if SPECULATIVE_TAG in chunk[1][1].get("tags", ()):
+                        if speculative_chat is None:
+                            speculative.append(chunk[1][0].content)
+                        elif speculative_chat:
+                            yield self._message_event(chunk[1][0].content)
+                    elif chunk[1][1]["langgraph_node"] in ["chat", "report_itinerary"]:
                         # logger.info(f'==>\n{chunk}')
-                        yield f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+                        yield self._message_event(chunk[1][0].content)
                 else:
                     # ("updates", dict)
+                    if chunk[1] and "intent_router" in chunk[1]:
+                        speculative_chat = normalize_intent((chunk[1]["intent_router"] or {}).get("intent", "chat")) == "chat"
+                        if speculative_chat and speculative:
+                            yield self._message_event("".join(speculative))
+                        speculative.clear()
                     data = self._get_chunk_data(chunk[1])                
                     logger.info(f'data: {json.dumps(data, ensure_ascii=False)}\n\n')
                     yield f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
@@ -38,6 +59,10 @@ class TravelPlanningService:
         finally:
             yield "data: [DONE]\n\n"
 
+    def _message_event(self, content: str) -> str:
+        data = {"message": {"type": "ai", "content": content}}
+        return f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+
     # 從chunk獲取data
     def _get_chunk_data(self, chunk: dict):
         if not chunk: return
@@ -0,0 +1,127 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from metrics import metrics
+import asyncio
+
+
+class _Broadcast:
+    """One stream pumped by a background task; every reader gets all chunks from the start."""
+    def __init__(self, source: AsyncIterator):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.readers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _pump(self, source: AsyncIterator):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+            await source.aclose()
+
+    async def read(self) -> AsyncIterator[Any]:
+        i = 0
+        while True:
+            changed = self._changed
+            if i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            elif self.done:
+                if self.error:
+                    raise self.error
+                return
+            else:
+                await changed.wait()
+
+
+class SingleFlight:
+    """
+    Coalesce identical in-flight async calls: the first caller for a key runs
+    `fn`, callers arriving before it finishes await the same result.
+    Streams are shared the same way through `stream()`.
+    Coalesced calls are counted as `singleflight.{name}.coalesced`.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        metrics.register_ratio(f"singleflight.{name}.coalesced_ratio", f"singleflight.{name}.coalesced", f"singleflight.{name}.calls")
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return `(result, shared)`; `shared` is True when the result came from another caller."""
+        metrics.incr(f"singleflight.{self.name}.calls")
+        future = self._inflight.get(key)
+        if future is not None:
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    # 領頭的請求被取消，由自己重新發送
+                    metrics.incr(f"singleflight.{self.name}.coalesced", -1)
+                    metrics.incr(f"singleflight.{self.name}.calls", -1)
+                    return await self.do(key, fn)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 沒有跟隨者時避免 "exception was never retrieved"
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def stream(self, key: str, fn: Callable[[], AsyncIterator]) -> AsyncIterator[Tuple[Any, bool]]:
+        """
+        Yield `(chunk, shared)` from a single stream per key: the first caller
+        starts `fn()` in a background task, later callers replay the chunks
+        received so far and then follow it live. The stream is cancelled only
+        when every reader has stopped.
+        """
+        metrics.incr(f"singleflight.{self.name}.calls")
+        broadcast = self._streams.get(key)
+        shared = broadcast is not None
+        if shared:
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+        else:
+            broadcast = _Broadcast(fn())
+            self._streams[key] = broadcast
+            broadcast.task.add_done_callback(lambda _: self._release(key, broadcast))
+
+        broadcast.readers += 1
+        try:
+            async for chunk in broadcast.read():
+                yield chunk, shared
+        finally:
+            broadcast.readers -= 1
+            if broadcast.readers == 0 and not broadcast.task.done():
+                # 沒有人在讀了: 停止串流，之後的相同請求重新發送
+                self._release(key, broadcast)
+                broadcast.task.cancel()
+
+    def _release(self, key: str, broadcast: _Broadcast):
+        if self._streams.get(key) is broadcast:
+            del self._streams[key]
+
+    def inflight(self) -> int:
+        return len(self._inflight) + len(self._streams)
@@ -0,0 +1,12 @@
+from typing import List
+from langchain_core.messages import BaseMessage
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """Rough prompt size: ~1 token per CJK character, ~4 characters per token otherwise."""
+    total = 0
+    for message in messages:
+        text = message.content if isinstance(message.content, str) else str(message.content)
+        cjk = sum(1 for ch in text if ord(ch) > 0x2E80)
+        total += cjk + (len(text) - cjk) // 4 + 4
+    return total
@@ -129,6 +129,15 @@ async function sendMessage() {
             buffer = events.pop(); // 保留最後一個可能不完整的事件在緩衝區
 
             for (const eventString of events) {
+                if (eventString.startsWith("event: itinerary_day\n")) {
+                    // 行程生成中，每完成一天就先顯示
+                    try {
+                        renderStreamedDay(JSON.parse(eventString.split("\ndata: ")[1]));
+                    } catch (parseErr) {
+                        console.error("❌ JSON parse error for itinerary_day:", parseErr, eventString);
+                    }
+                    continue;
+                }
                 if (!eventString.startsWith("data: ")) continue; // 忽略非數據行
 
                 const jsonString = eventString.substring(6); // 移除 "data: "
@@ -161,6 +170,7 @@ async function sendMessage() {
                     }
 
                     if (data.itinerary) {
+                        streamedDays = null;
                         hideItineraryLoading();
                         renderItineraryTab(JSON.parse(data.itinerary)); // 更新右側行程卡片
                     }
@@ -354,24 +364,26 @@ function hideItineraryLoading() {
 }
 
 let currentItinerary = null
+let streamedDays = null // 生成中先顯示的每日行程: {key, days}
 
-// 更新行程面板資訊
-function renderItineraryTab(itinerary) {
+// 顯示串流中完成的一天；只預覽第一個草案，合併結果出現後改顯示合併結果
+function renderStreamedDay(event) {
+    const key = `${event.stage}:${event.draft ?? ""}`;
+    if (!streamedDays || (event.stage === "merge" && !streamedDays.key.startsWith("merge"))) {
+        streamedDays = { key, days: [] };
+    }
+    if (streamedDays.key !== key) return;
+    streamedDays.days[event.day_index - 1] = event.day;
+
+    hideItineraryLoading();
     const contentBox = document.getElementById('itinerary-content');
-    if (!contentBox || !itinerary.days) return;
     contentBox.style.display = "block";
-    currentItinerary = itinerary;
-    console.log(currentItinerary);
-    const summaryHTML = `
-        <div><strong>出發地:</strong> ${itinerary.departure_location}</div>
-        <div><strong>目的地:</strong> ${itinerary.destination}</div>
-        <div><strong>出發日:</strong> ${itinerary.start_date}</div>
-        <div><strong>天數:</strong> ${itinerary.duration}</div>
-        <div><strong>旅遊特色:</strong> ${itinerary.features}</div>
-        <hr>
-    `;
+    contentBox.innerHTML = `<div><strong>行程生成中...</strong></div><hr>` + renderDays(streamedDays.days);
+}
 
-    const daysHTML = itinerary.days.map((day, i) => {
+function renderDays(days) {
+    return days.map((day, i) => {
+        if (!day) return "";
         const activitiesHTML = day.segments.map(segment => {
             const acts = segment.activities.map(act => `
                 <br>
@@ -403,8 +415,25 @@ function renderItineraryTab(itinerary) {
             </div>
         `;
     }).join("");
+}
+
+// 更新行程面板資訊
+function renderItineraryTab(itinerary) {
+    const contentBox = document.getElementById('itinerary-content');
+    if (!contentBox || !itinerary.days) return;
+    contentBox.style.display = "block";
+    currentItinerary = itinerary;
+    console.log(currentItinerary);
+    const summaryHTML = `
+        <div><strong>出發地:</strong> ${itinerary.departure_location}</div>
+        <div><strong>目的地:</strong> ${itinerary.destination}</div>
+        <div><strong>出發日:</strong> ${itinerary.start_date}</div>
+        <div><strong>天數:</strong> ${itinerary.duration}</div>
+        <div><strong>旅遊特色:</strong> ${itinerary.features}</div>
+        <hr>
+    `;
 
-    contentBox.innerHTML = summaryHTML + daysHTML;
+    contentBox.innerHTML = summaryHTML + renderDays(itinerary.days);
 }
 
 async function savePlan(planId) {